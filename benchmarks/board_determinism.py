@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8
+"""
+
+* --------------------- *
+|                       |
+|   Coding Game Server  |
+|                       |
+* --------------------- *
+
+
+Authors: T. Hilaire, J. Brajard
+Licence: GPL
+
+File: board_determinism.py
+	Check (and benchmark): the same seed gives the same game, even when the games are created at the same time
+	-> the games are first created one by one (reference), then again by several threads at the same time; the board
+	(game data), who starts, and the first moves of two random training players should be the same for each seed
+	(each game draws from its own random generator, see Game.initRandom)
+	-> gives the number of games created per second, and exits with an error if a game differs from its reference
+
+Copyright 2016-2017 T. Hilaire, J. Brajard
+"""
+
+import sys
+import time
+from importlib import import_module
+from os.path import abspath, dirname
+from threading import Thread
+
+from docopt import docopt
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+from server.Constants import NORMAL_MOVE
+from server.Game import Game
+from server.Logger import configureSimulationLogger
+
+usage = """
+Board determinism check
+Create games from seeds, one by one and then with several threads at the same time, and check that each seed gives
+the same game (board, who starts and first moves of random training players)
+
+Usage:
+  board_determinism.py -h | --help
+  board_determinism.py <gameName> [options]
+
+Options:
+  -h --help                Show this screen.
+  -n N --games=N           Number of games (seeds 0 to N-1) [default: 1000].
+  -t N --threads=N         Number of threads that create the games at the same time [default: 8].
+  -m N --moves=N           Number of moves played in each game [default: 20].
+  -p NAME --player=NAME    Training player that plays both sides (a random player of the game by default)
+"""
+
+# random training players of each game (used by default)
+randomPlayers = {'Labyrinth': 'PLAY_RANDOM', 'Networks': 'ALICE_RANDOM'}
+
+
+def fingerprint(gameClass, player, seed, nbMoves):
+	"""
+	Create the game of a seed (between two training players), play its first moves and returns its fingerprint
+	(game data, number of the player who starts, and moves)
+	"""
+	players = [gameClass.type_dict[player](), gameClass.type_dict[player]()]
+	game = gameClass(*players, seed=seed)
+	data, start = game.getData(), game.players.index(players[0])
+	moves = []
+	for _ in range(nbMoves):
+		move, return_code = game.getLastMove()
+		moves.append(move)
+		if return_code != NORMAL_MOVE:
+			break
+	Game.removeInstance(game.name)
+	return data, start, moves
+
+
+def createGames(gameClass, player, seeds, nbMoves, results):
+	"""Create the games of some seeds (in a thread), and store their fingerprint in results (dictionary)"""
+	for seed in seeds:
+		results[seed] = fingerprint(gameClass, player, seed, nbMoves)
+
+
+if __name__ == "__main__":
+	args = docopt(usage)
+	gameName = args['<gameName>']
+	player = args['--player'] or randomPlayers.get(gameName, 'DO_NOTHING')
+	nbGames, nbThreads, nbMoves = int(args['--games']), int(args['--threads']), int(args['--moves'])
+
+	configureSimulationLogger()
+	gameClass = getattr(import_module('games.' + gameName + '.server.' + gameName), gameName)
+	# switch between the threads as often as possible, so that the creations of the games interleave
+	sys.setswitchinterval(1e-6)
+
+	# reference: one game after the other
+	t0 = time.perf_counter()
+	reference = {}
+	createGames(gameClass, player, range(nbGames), nbMoves, reference)
+	serial = time.perf_counter() - t0
+	print("%s, %s against %s: %d games created one by one in %.2fs (%.0f games/s)" %
+	      (gameName, player, player, nbGames, serial, nbGames / serial))
+
+	# the same games, created by several threads at the same time
+	results = {}
+	threads = [Thread(target=createGames, args=(gameClass, player, range(i, nbGames, nbThreads), nbMoves, results))
+	           for i in range(nbThreads)]
+	t0 = time.perf_counter()
+	for t in threads:
+		t.start()
+	for t in threads:
+		t.join()
+	concurrent = time.perf_counter() - t0
+	print("%d games created by %d threads in %.2fs (%.0f games/s)" %
+	      (nbGames, nbThreads, concurrent, nbGames / concurrent))
+
+	different = [seed for seed in range(nbGames) if results.get(seed) != reference[seed]]
+	if different:
+		print("%d games differ from their reference (seeds %s)" %
+		      (len(different), ", ".join(str(s) for s in different[:10]) + (", ..." if len(different) > 10 else "")))
+		sys.exit(1)
+	print("All the games are identical to their reference")
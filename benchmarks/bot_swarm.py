@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8
+"""
+
+* --------------------- *
+|                       |
+|   Coding Game Server  |
+|                       |
+* --------------------- *
+
+
+Authors: T. Hilaire, J. Brajard
+Licence: GPL
+
+File: bot_swarm.py
+	Benchmark: end-to-end throughput of the server with N regular players (Labyrinth)
+	-> run the server (runCGS.py), and connect N bots (Python client, in one event loop) that play random legal moves,
+	against training players, in games created through the web server (`/create_new_game.html`), or in a tournament
+	(created with `/create_new_tournament.html` and run phase by phase with `/run_tournament/<name>`)
+	-> measure the moves per second, the round-trip time of a move (PLAY_MOVE), and the CPU and the memory (RSS) used by
+	the server (and its worker processes) as N grows; the results can be saved in a JSON file, to compare releases
+
+Copyright 2016-2017 T. Hilaire, J. Brajard
+"""
+
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from http.client import HTTPConnection
+from os.path import abspath, dirname, join
+from random import choice, randrange
+from urllib.parse import urlencode
+
+from docopt import docopt
+
+root = dirname(dirname(abspath(__file__)))
+sys.path.insert(0, root)
+sys.path.insert(0, join(root, 'clientAPI', 'Python'))
+from games.Labyrinth.server.Constants import INITIAL_ENERGY_SECOND, ROTATE_ENERGY
+from cgsclient import LabyrinthClient, NORMAL_MOVE
+from cgsclient.labyrinth import Move, MoveType
+
+usage = """
+Bot swarm benchmark
+Run the game server and N bots that play random legal moves (Labyrinth), and measure the throughput of the server
+
+Usage:
+  bot_swarm.py -h | --help
+  bot_swarm.py [options]
+
+Options:
+  -h --help                Show this screen.
+  -n LIST --nb=LIST        Numbers of bots (one run of the server for each) [default: 10,50,100,200].
+  -m MODE --mode=MODE      How the games are created: `training` (each bot plays against a training player), `regular`
+                           (the bots are paired through /create_new_game.html) or `tournament` (League) [default: training].
+  -t NAME --training=NAME  Training player (training mode) [default: PLAY_RANDOM]
+  -d DUR --duration=DUR    Time (in seconds) the bots play (training and regular modes) [default: 20].
+  --phases=N               Number of phases of the tournament played (tournament mode) [default: 3].
+  --moves=N                Number of moves played by a bot in a game (it then ends the game) [default: 100].
+  -p PORT --port=PORT      Game server port [default: 12345].
+  -w PORT --web=PORT       Web server port [default: 18088].
+  --async                  Use the asyncio game server
+  --workers=N              Number of worker processes of the server (see runCGS.py)
+  --protocol=P             Version of the protocol used by the bots (1: text, 2: binary) [default: 1].
+  --compress               The bots ask the server to compress the game data and the displays
+  -o FILE --output=FILE    Save the results in a JSON file
+"""
+
+# move that ends a game (its type is not valid, so the bot looses)
+END_MOVE = "9 0"
+
+
+
+def waitForPort(port, timeout=30):
+	"""Wait until the server listens on the port"""
+	t0 = time.time()
+	while time.time() - t0 < timeout:
+		try:
+			socket.create_connection(('localhost', port)).close()
+			return
+		except ConnectionRefusedError:
+			time.sleep(0.2)
+	raise RuntimeError("The server does not start")
+
+
+def processTree(pid):
+	"""Returns the list of the pid of the process and of its children (the worker processes), from /proc"""
+	pids = [pid]
+	for entry in os.listdir('/proc'):
+		if entry.isdigit():
+			try:
+				with open('/proc/%s/stat' % entry) as f:
+					if int(f.read().rpartition(')')[2].split()[1]) == pid:
+						pids.append(int(entry))
+			except OSError:
+				pass
+	return pids
+
+
+def serverUsage(pid):
+	"""Returns the CPU time (in s) and the RSS (in Mo) of the server and its workers (from /proc)"""
+	cpu = rss = 0
+	for p in processTree(pid):
+		try:
+			with open('/proc/%d/stat' % p) as f:
+				fields = f.read().rpartition(')')[2].split()
+			cpu += (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+			with open('/proc/%d/status' % p) as f:
+				rss += next(int(line.split()[1]) for line in f if line.startswith('VmRSS')) / 1024
+		except (OSError, StopIteration):
+			pass
+	return cpu, rss
+
+
+def postForm(webPort, path, fields=None):
+	"""
+	Post a form to the web server
+	Returns the HTTP status and the body of the answer (the forms accepted are answered by a redirection)
+	"""
+	conn = HTTPConnection('localhost', webPort, timeout=30)
+	try:
+		conn.request('POST', path, urlencode(fields or {}), {'Content-Type': 'application/x-www-form-urlencoded'})
+		response = conn.getresponse()
+		return response.status, response.read().decode('utf-8', 'replace')
+	finally:
+		conn.close()
+
+
+def percentile(times, p):
+	"""Returns the percentile p (in ms) of a sorted list of times (in s)"""
+	return 1000 * times[min(len(times) - 1, int(len(times) * p))] if times else 0
+
+
+
+class Swarm:
+	"""
+	State of the bots of a run, shared with the function that creates their games
+	- mode: (string) `training`, `regular` or `tournament`
+	- gameType: (string) type of game asked by the bots with WAIT_GAME
+	- maxGames: (int) number of games played by each bot (None to play until `stop`)
+	- nbMoves: (int) number of moves played by a bot before it ends the game
+	- waiting: (Queue) names of the bots waiting for a regular game
+	- acks: (int) number of WAIT_GAME acknowledged by the server (the bot can then be put in a game)
+	- started, ended: (int) number of games started and ended (counted by each bot, so twice per regular game)
+	- times: (list) round-trip time of the moves (in s), played before the end of the measure
+	- stop: (bool) True when the bots should stop (at the end of their current game)
+	"""
+
+	def __init__(self, mode, gameType, maxGames, nbMoves):
+		self.mode = mode
+		self.gameType = gameType
+		self.maxGames = maxGames
+		self.nbMoves = nbMoves
+		self.waiting = asyncio.Queue()
+		self.acks = self.started = self.ended = 0
+		self.times = []
+		self.stop = False
+
+
+
+class SwarmBot(LabyrinthClient):
+	"""
+	A bot of the swarm: plays random legal moves (nothing, or a rotation when it has enough energy; moving would need
+	to follow the positions through the rotations), and ends the game after `nbMoves` moves
+	(the moves of the opponent are kept as strings, since the last one is not a valid Move)
+	"""
+
+	Move = None
+
+	def __init__(self, name, swarm, protocol, compression):
+		super().__init__(name, protocol, compression)
+		self.swarm = swarm
+		self.games = 0
+
+
+	async def sendCommand(self, cmd):
+		"""Send a command, and tell the swarm when the bot waits for a game (the server has registered it)"""
+		await super().sendCommand(cmd)
+		if cmd.startswith("WAIT_GAME"):
+			self.swarm.acks += 1
+			if self.swarm.mode == 'regular':
+				self.swarm.waiting.put_nowait(self.name)
+
+
+	def randomMove(self, energy):
+		"""Returns a random legal move, given the energy of the bot"""
+		if energy < ROTATE_ENERGY or choice((True, False)):
+			return Move(MoveType.DO_NOTHING)
+		moveType = MoveType(randrange(MoveType.ROTATE_LINE_LEFT, MoveType.ROTATE_COLUMN_DOWN + 1))
+		if moveType <= MoveType.ROTATE_LINE_RIGHT:
+			return Move(moveType, randrange(self.sizeY))
+		return Move(moveType, randrange(self.sizeX))
+
+
+	async def playGame(self):
+		"""Play a game (the round-trip time of our moves is measured)"""
+		_, player = await self.getLabyrinth()
+		ret = NORMAL_MOVE
+		if player == 1:
+			_, ret = await self.getMove()
+		energy = INITIAL_ENERGY_SECOND
+		nbMoves = 0
+		while ret == NORMAL_MOVE:
+			move = self.randomMove(energy) if nbMoves < self.swarm.nbMoves else END_MOVE
+			t0 = time.perf_counter()
+			ret, _ = await self.sendMove(move)
+			if not self.swarm.stop:
+				self.swarm.times.append(time.perf_counter() - t0)
+			nbMoves += 1
+			energy += 1 if move == Move(MoveType.DO_NOTHING) else -ROTATE_ENERGY
+			if ret == NORMAL_MOVE:
+				_, ret = await self.getMove()
+
+
+	async def run(self):
+		"""Play games until the swarm stops (or until maxGames games have been played)"""
+		try:
+			while not self.swarm.stop and self.games != self.swarm.maxGames:
+				await self.waitForLabyrinth(self.swarm.gameType)
+				self.swarm.started += 1
+				await self.playGame()
+				self.games += 1
+				self.swarm.ended += 1
+		finally:
+			await self.close()
+
+
+
+async def pairBots(swarm, webPort):
+	"""Create the regular games (through the web server) between the bots waiting for a game, two by two"""
+	while True:
+		players = [await swarm.waiting.get(), await swarm.waiting.get()]
+		status, _ = await asyncio.to_thread(postForm, webPort, '/create_new_game.html',
+		                                    {'player1': players[0], 'player2': players[1]})
+		if status not in (302, 303):
+			# the server may not have ended the previous game of a player yet
+			await asyncio.sleep(0.05)
+			for p in players:
+				swarm.waiting.put_nowait(p)
+
+
+async def runTournament(swarm, webPort, name, nbBots, nbPhases):
+	"""
+	Run the phases of a League (through the web server)
+	Each bot plays one game per phase (nbRounds4Victory=1, even number of bots), so the next phase is asked when all
+	the bots have ended their game and are waiting again (the tournament may still be ending the phase, so it is asked
+	until it starts)
+	"""
+	for phase in range(nbPhases):
+		while swarm.ended < phase * nbBots or swarm.acks < (phase + 1) * nbBots:
+			await asyncio.sleep(0.05)
+		while swarm.started <= phase * nbBots:
+			await asyncio.to_thread(postForm, webPort, '/run_tournament/' + name)
+			for _ in range(10):
+				if swarm.started > phase * nbBots:
+					break
+				await asyncio.sleep(0.05)
+
+
+async def runBots(nbBots, args, pid):
+	"""Connect the bots, let them play, and measure the server; returns the results (dict)"""
+	mode = args['--mode']
+	webPort = int(args['--web'])
+	if mode == 'training':
+		swarm = Swarm(mode, "TRAINING " + args['--training'], None, int(args['--moves']))
+	elif mode == 'regular':
+		swarm = Swarm(mode, "", None, int(args['--moves']))
+	else:
+		name = "swarm%d" % nbBots
+		status, body = await asyncio.to_thread(postForm, webPort, '/create_new_tournament.html', {
+			'mode': 'League', 'name': name, 'nbMaxPlayers': nbBots, 'nbRounds4Victory': 1})
+		if status not in (302, 303):
+			raise RuntimeError("The tournament cannot be created (%s)" % body)
+		swarm = Swarm(mode, "TOURNAMENT " + name, int(args['--phases']), int(args['--moves']))
+
+	bots = [SwarmBot("swarm_%d" % i, swarm, int(args['--protocol']), args['--compress']) for i in range(nbBots)]
+	await asyncio.gather(*[b.connect('localhost', int(args['--port'])) for b in bots])
+	cpu0, rss = serverUsage(pid)
+	t0 = time.perf_counter()
+	tasks = [asyncio.ensure_future(b.run()) for b in bots]
+
+	# create the games, and measure the memory used every second (until the end of the measure)
+	if mode == 'regular':
+		driver = asyncio.ensure_future(pairBots(swarm, webPort))
+	elif mode == 'tournament':
+		driver = asyncio.ensure_future(runTournament(swarm, webPort, name, nbBots, swarm.maxGames))
+	else:
+		driver = None
+	while not (swarm.stop or (mode == 'tournament' and all(t.done() for t in tasks))):
+		await asyncio.sleep(1)
+		rss = max(rss, serverUsage(pid)[1])
+		swarm.stop = mode != 'tournament' and time.perf_counter() - t0 >= float(args['--duration'])
+	duration = time.perf_counter() - t0
+	cpu = serverUsage(pid)[0] - cpu0
+	swarm.stop = True
+
+	# the bots end their game (the bots still waiting for a game are stopped)
+	if driver:
+		driver.cancel()
+	_, pending = await asyncio.wait(tasks, timeout=60)
+	for t in pending:
+		t.cancel()
+	results = await asyncio.gather(*tasks, return_exceptions=True)
+	errors = [r for r in results if isinstance(r, Exception) and not isinstance(r, asyncio.CancelledError)]
+	if errors:
+		print("Warning: %d bots have failed (%s)" % (len(errors), errors[0]))
+
+	times = sorted(swarm.times)
+	return {'bots': nbBots, 'games': swarm.ended, 'moves': len(times), 'duration': round(duration, 3),
+	        'movesPerSecond': round(len(times) / duration, 1),
+	        'latency': {'mean': round(1000 * sum(times) / len(times), 3) if times else 0,
+	                    'p50': round(percentile(times, 0.5), 3), 'p99': round(percentile(times, 0.99), 3),
+	                    'max': round(percentile(times, 1), 3)},
+	        'cpu': round(100 * cpu / duration, 1), 'rss': round(rss, 1), 'errors': len(errors)}
+
+
+def runBenchmark(nbBots, args):
+	"""Run the server, and the bots"""
+	cmd = [sys.executable, 'runCGS.py', 'Labyrinth', '--dev', '--no-email',
+	       '-p', args['--port'], '-w', args['--web'], '--log=logs/bench/']
+	if args['--async']:
+		cmd.append('--async')
+	if args['--workers']:
+		cmd.append('--workers=' + args['--workers'])
+	server = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+	try:
+		waitForPort(int(args['--port']))
+		waitForPort(int(args['--web']))
+		return asyncio.run(runBots(nbBots, args, server.pid))
+	finally:
+		server.terminate()
+		server.wait()
+
+
+def gitCommit():
+	"""Returns the current commit of the server (or None)"""
+	try:
+		return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+
+if __name__ == "__main__":
+	args = docopt(usage)
+	if args['--mode'] not in ('training', 'regular', 'tournament'):
+		sys.exit("The mode should be `training`, `regular` or `tournament`")
+	nbs = [int(n) for n in args['--nb'].split(',')]
+	if args['--mode'] != 'training' and any(n % 2 for n in nbs):
+		sys.exit("The numbers of bots should be even (the bots play against each other)")
+
+	server = "async" if args['--async'] else "threads"
+	if args['--workers']:
+		server += ", %s workers" % args['--workers']
+	print("Labyrinth, %s mode (%s server, protocol %s%s)" % (args['--mode'], server, args['--protocol'],
+	                                                          ", compressed" if args['--compress'] else ""))
+	print("%6s %8s %8s %10s %9s %9s %8s %9s" % ("bots", "games", "moves", "moves/s", "p50 (ms)", "p99 (ms)",
+	                                             "CPU (%)", "RSS (Mo)"))
+	runs = []
+	for n in nbs:
+		r = runBenchmark(n, args)
+		runs.append(r)
+		print("%6d %8d %8d %10.1f %9.3f %9.3f %8.1f %9.1f" % (r['bots'], r['games'], r['moves'], r['movesPerSecond'],
+		                                                     r['latency']['p50'], r['latency']['p99'], r['cpu'],
+		                                                     r['rss']))
+
+	if args['--output']:
+		options = {k.lstrip('-'): v for k, v in args.items() if k not in ('--help', '--output')}
+		with open(args['--output'], 'w') as f:
+			json.dump({'commit': gitCommit(), 'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+			           'python': platform.python_version(), 'cpus': os.cpu_count(), 'options': options,
+			           'runs': runs}, f, indent=2)
+		print("Results saved in %s" % args['--output'])
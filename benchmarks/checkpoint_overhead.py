@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8
+"""
+
+* --------------------- *
+|                       |
+|   Coding Game Server  |
+|                       |
+* --------------------- *
+
+
+Authors: T. Hilaire, J. Brajard
+Licence: GPL
+
+File: checkpoint_overhead.py
+	Benchmark: overhead of the snapshots of the running games (see server/Checkpoint.py), per move
+	-> plays some games at the same time (between two training players), and runs a checkpoint (in a temporary folder)
+	each time every game has played some moves; compares the time of the checkpoints to the time to play the moves
+	-> a game is saved at most once per checkpoint, so the cost per move is bounded by the time of a snapshot divided by
+	the number of moves played between two checkpoints; also gives the time the game is locked during a snapshot, the
+	time of a checkpoint when no game has changed, and the size of the snapshots
+	-> the games are then restored from the snapshots of the first checkpoint, and must give the same data
+
+Copyright 2016-2017 T. Hilaire, J. Brajard
+"""
+
+import pickle
+import sys
+import time
+from importlib import import_module
+from os import listdir
+from os.path import abspath, dirname, join
+from tempfile import TemporaryDirectory
+
+from docopt import docopt
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+from server.Checkpoint import checkpointer
+from server.Constants import NORMAL_MOVE
+from server.Game import Game
+from server.Logger import configureSimulationLogger
+
+usage = """
+Checkpoint overhead benchmark
+Play games between two training players, save their snapshots regularly, and measure the overhead (per move) of the
+snapshots
+
+Usage:
+  checkpoint_overhead.py -h | --help
+  checkpoint_overhead.py [options]
+
+Options:
+  -h --help                Show this screen.
+  -g GAME --game=GAME      Name of the game [default: Labyrinth]
+  -n N --games=N           Number of games played at the same time [default: 100].
+  -m N --moves=N           Maximum number of moves per game [default: 200].
+  -c N --changes=N         Number of moves of each game between two checkpoints [default: 10].
+  -t NAME --training=NAME  Training player that plays both sides (a random player of the game by default)
+"""
+
+# random training players of each game (used by default)
+randomPlayers = {'Labyrinth': 'PLAY_RANDOM', 'Networks': 'ALICE_RANDOM'}
+
+
+if __name__ == "__main__":
+	args = docopt(usage)
+	gameName = args['--game']
+	training = args['--training'] or randomPlayers.get(gameName, 'DO_NOTHING')
+	nbGames, maxMoves, changes = int(args['--games']), int(args['--moves']), int(args['--changes'])
+
+	configureSimulationLogger()
+	gameClass = getattr(import_module('games.' + gameName + '.server.' + gameName), gameName)
+	Game.setTheGameClass(gameClass)
+
+	with TemporaryDirectory() as path:
+		checkpointer.open(path)
+		games = [gameClass(gameClass.type_dict[training](), gameClass.type_dict[training](), seed=seed, start=0)
+		         for seed in range(nbGames)]
+		running = list(games)
+		nbMoves = nbCheckpoints = 0
+		playing = checkpointing = 0.0
+		while running:
+			# each game plays some moves (the games that are over are removed)
+			t0 = time.perf_counter()
+			for game in running:
+				for _ in range(changes):
+					_, return_code = game.getLastMove()
+					nbMoves += 1
+					if return_code != NORMAL_MOVE or len(game.moves) >= maxMoves:
+						break
+			t1 = time.perf_counter()
+			playing += t1 - t0
+			checkpointer.checkpoint()
+			checkpointing += time.perf_counter() - t1
+			nbCheckpoints += 1
+			for game in running:
+				if not game.isOver and len(game.moves) >= maxMoves:
+					game.endOfGame(0, "Too long")
+			running = [game for game in running if not game.isOver]
+
+			# the file of the first checkpoint (and the data of the games at that time) is kept, to be restored
+			if nbCheckpoints == 1:
+				with open(join(path, listdir(path)[0]), 'rb') as f:
+					saved = pickle.load(f)
+				data = {game.name: game.getData() for game in games if game.name in saved}
+
+		perMove = 1e6 * playing / nbMoves
+		info = checkpointer.getDictInformations()
+		print("%s, %s against %s: %d games at the same time, %d moves, %.2f µs per move" %
+		      (gameName, training, training, nbGames, nbMoves, perMove))
+		print("%d checkpoints (one every %d moves per game): %d snapshots, %.1f µs per snapshot (taken and written)" %
+		      (nbCheckpoints, changes, info['snapshots'], info['timePerSnapshot']))
+		print("size of a snapshot: %.0f octets (%.0f octets per file, written %d times)" %
+		      (sum(len(data) for _, data in saved.values()) / len(saved), info['size'] / info['files'], info['files']))
+		print("overhead: %.3f µs per move (%.2f%% of the time per move)" %
+		      (1e6 * checkpointing / nbMoves, 100 * checkpointing / playing))
+
+		# time the game is locked (its state is pickled) during a snapshot, and time of a checkpoint when no game has
+		# changed (on new games)
+		games = [gameClass(gameClass.type_dict[training](), gameClass.type_dict[training](), seed=seed, start=0)
+		         for seed in range(nbGames)]
+		t0 = time.perf_counter()
+		for game in games:
+			game.getSnapshot()
+		locked = 1e6 * (time.perf_counter() - t0) / nbGames
+		checkpointer.checkpoint()
+		t0 = time.perf_counter()
+		checkpointer.checkpoint()
+		unchanged = 1e6 * (time.perf_counter() - t0)
+		for game in games:
+			game.endOfGame(0, "Stopped")
+		checkpointer.checkpoint()
+		print("game locked during a snapshot: %.1f µs; checkpoint of %d games that have not changed: %.1f µs" %
+		      (locked, nbGames, unchanged))
+		left = checkpointer.getDictInformations()['games']
+
+	# restore the games from the snapshots of the first checkpoint
+	different = 0
+	for name, (_, snapshot) in saved.items():
+		game, _ = Game.loadSnapshot(snapshot)
+		if game.name != name or game.getData() != data[name]:
+			different += 1
+	print("%d games restored from the snapshots of the first checkpoint, %d differ (%d snapshots left at the end)" %
+	      (len(saved), different, left))
+	if different or left:
+		sys.exit(1)
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8
+"""
+
+* --------------------- *
+|                       |
+|   Coding Game Server  |
+|                       |
+* --------------------- *
+
+
+Authors: T. Hilaire, J. Brajard
+Licence: GPL
+
+File: command_reader.py
+	Check (and benchmark): the CommandReader (see server/Player/CommandReader.py) gives back the commands sent by a
+	client, whatever the way TCP cuts the stream
+	-> the same commands (framed with their size, with a varint, or ended by a newline) are fed to the reader byte by
+	byte, all in one buffer, and cut at random places; the reader should give back exactly these commands (a command
+	is larger than the initial buffer, so the buffer grows)
+	-> the first command ended by a newline is fed whole (the reader does not know yet that the client uses newlines,
+	and a client waits for the answer to CLIENT_NAME before sending its next command anyway)
+	-> the (short) commands without size nor newline (old clients) are fed one by one, as they are sent
+	-> gives the number of commands read per second (framed commands, all in one buffer), and exits with an error if a
+	command differs
+
+Copyright 2016-2017 T. Hilaire, J. Brajard
+"""
+
+import random
+import sys
+import time
+from os.path import abspath, dirname
+
+from docopt import docopt
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+from server.Constants import SIZE_FMT
+from server.Player.CommandReader import CommandReader
+from server.Player.Protocol import encodeVarint
+
+usage = """
+CommandReader check
+Feed some commands to the CommandReader (byte by byte, in one buffer, and cut at random places), and check that it
+gives back the same commands
+
+Usage:
+  command_reader.py -h | --help
+  command_reader.py [options]
+
+Options:
+  -h --help                Show this screen.
+  -c N --cuts=N            Number of random ways to cut each stream [default: 100].
+  -n N --commands=N        Number of commands read for the benchmark [default: 100000].
+  -s SEED --seed=SEED      Seed of the random cuts [default: 0].
+"""
+
+
+# commands sent by a client (the comment is larger than the initial buffer of the reader)
+COMMANDS = [b"CLIENT_NAME bot_1", b"WAIT_GAME TRAINING DO_NOTHING", b"GET_GAME_DATA", b"PLAY_MOVE 8 0", b"GET_MOVE",
+            b"DISP_GAME", b"SEND_COMMENT " + b"blah " * 999 + b"blah", b"PLAY_AND_WAIT DISP 0 3", b"GET_MOVE"]
+
+
+
+class FakeSocket:
+	"""
+	A socket that receives the given chunks of data (one chunk, or the beginning of the chunk, per recv_into)
+	"""
+
+	def __init__(self, chunks):
+		self._chunks = [chunk for chunk in reversed(chunks) if chunk]
+
+	def recv_into(self, view):
+		if not self._chunks:
+			return 0
+		chunk = self._chunks.pop()
+		n = min(len(chunk), len(view))
+		view[:n] = chunk[:n]
+		if n < len(chunk):
+			self._chunks.append(chunk[n:])
+		return n
+
+
+
+def readAll(chunks, varint=False):
+	"""
+	Returns the list of the commands read from the chunks of data
+	(the blanks around a text command, like the '\\r' of '\\r\\n', are removed, as the text protocol does, see
+	TextProtocol.decodeCommand)
+	"""
+	reader = CommandReader(FakeSocket(chunks))
+	reader.varint = varint
+	commands = []
+	command = reader.readCommand()
+	while command is not None:
+		commands.append(command if varint else command.strip())
+		command = reader.readCommand()
+	return commands
+
+
+def cut(stream, rng):
+	"""
+	Cut the stream at random places
+	"""
+	positions = sorted(rng.sample(range(1, len(stream)), rng.randint(1, min(20, len(stream) - 1))))
+	return [stream[i:j] for i, j in zip([0] + positions, positions + [len(stream)])]
+
+
+def frame(command):
+	"""Returns the command preceded by its size"""
+	return (SIZE_FMT % len(command)).encode() + command
+
+
+
+if __name__ == "__main__":
+	args = docopt(usage)
+	rng = random.Random(int(args['--seed']))
+	nbCuts = int(args['--cuts'])
+
+	# streams of commands: (first chunk, stream that is cut, varint)
+	streams = {
+		'framed': (b"", b"".join(frame(c) for c in COMMANDS), False),
+		'varint': (b"", b"".join(encodeVarint(len(c)) + c for c in COMMANDS), True),
+		'newlines': (COMMANDS[0] + b"\n", b"".join(c + b"\n" for c in COMMANDS[1:]), False),
+		'framed and newlines': (COMMANDS[0] + b"\r\n",
+		                        b"".join(frame(c) if i % 2 else c + b"\r\n" for i, c in enumerate(COMMANDS) if i), False),
+	}
+	errors = 0
+	for name, (first, stream, varint) in streams.items():
+		checks = {'byte by byte': [[first] + [stream[i:i + 1] for i in range(len(stream))]],
+		          'in one buffer': [[first + stream]],
+		          'random cuts': [[first] + cut(stream, rng) for _ in range(nbCuts)]}
+		for how, ways in checks.items():
+			wrong = sum(1 for chunks in ways if readAll(chunks, varint) != COMMANDS)
+			errors += wrong
+			print("%s commands, %s: %s" % (name, how, "ok" if not wrong else "%d/%d wrong" % (wrong, len(ways))))
+
+	# old clients: no size, no newline, one (short) command at a time
+	short = [c for c in COMMANDS if len(c) < 1024]
+	wrong = readAll(short) != short
+	errors += wrong
+	print("commands without size nor newline, one by one: %s" % ("wrong" if wrong else "ok"))
+
+	# benchmark: framed commands, all in one buffer (read by blocks of the size of a socket buffer)
+	nbCommands = int(args['--commands'])
+	stream = b"".join(frame(COMMANDS[i % 4 + 2]) for i in range(nbCommands))
+	chunks = [stream[i:i + 65536] for i in range(0, len(stream), 65536)]
+	t0 = time.perf_counter()
+	n = len(readAll(chunks))
+	duration = time.perf_counter() - t0
+	print("%d framed commands read in %.3fs: %.0f commands/s" % (n, duration, n / duration))
+
+	if errors or n != nbCommands:
+		sys.exit(1)
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8
+"""
+
+* --------------------- *
+|                       |
+|   Coding Game Server  |
+|                       |
+* --------------------- *
+
+
+Authors: T. Hilaire, J. Brajard
+Licence: GPL
+
+File: compression.py
+	Benchmark: bytes on the wire and CPU cost of the compression of the game data and of the displays
+	(option COMPRESS=1 of CLIENT_NAME)
+	-> games are created with the real board generators (scaled to get larger boards), and played by two training
+	players; the game data and the displays after each move are encoded with the text and binary protocols, with and
+	without compression (one deflate stream per connection, as the server does)
+
+Copyright 2016-2017 T. Hilaire, J. Brajard
+"""
+
+import time
+from importlib import import_module
+from os.path import abspath, dirname
+import sys
+
+from docopt import docopt
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+from server.Logger import configureRootLogger
+from server.Constants import SIZE_FMT, LARGE_SIZE_FMT
+from server.Player.Protocol import protocols, Compressor
+
+usage = """
+Compression benchmark
+Create games (with their real board generators, scaled) and measure the size of the game data and of the displays,
+with and without compression, and the time spent to compress them
+
+Usage:
+  compression.py -h | --help
+  compression.py <gameName> [options]
+
+Options:
+  -h --help                    Show this screen.
+  -s SCALES --scales=SCALES    Scales of the boards (multiply the sizes given to the board generator) [default: 1,2,4,8].
+  -g N --games=N               Number of games per scale [default: 5].
+  -m N --moves=N               Maximum number of moves per game [default: 100].
+  -t NAME --training=NAME      Training player that plays both sides (a random player of the game by default)
+  -l LEVEL --level=LEVEL       Compression level (1 to 9) [default: 6].
+"""
+
+# random training players of each game (used by default)
+randomPlayers = {'Labyrinth': 'PLAY_RANDOM', 'Networks': 'ALICE_RANDOM'}
+
+# board generators of each game (they are scaled)
+generators = {'Labyrinth': 'CreateLaby', 'Networks': 'CreateBoard', 'Starships': 'CreateBoard'}
+
+
+def scaleGenerator(module, name, scale):
+	"""Replace the board generator of the module by a generator of boards `scale` times larger"""
+	generator = getattr(module, '_' + name, None) or getattr(module, name)
+	setattr(module, '_' + name, generator)
+	setattr(module, name, lambda sX, sY, rng: generator(sX * scale, sY * scale, rng))
+
+
+def playGame(gameClass, training, nbMoves):
+	"""Create a game between two training players, play it, and returns the game data and the list of the displays
+	(the display is asked after each move, as a client does)"""
+	players = [gameClass.type_dict[training](), gameClass.type_dict[training]()]
+	game = gameClass(*players)
+	data, displays = game.getData(), [game.display(players[0])]
+	for _ in range(nbMoves):
+		if game.getLastMove()[1] != 0:
+			break
+		displays.append(game.display(players[0]))
+	if game.players[0].game is not None:
+		game.endOfGame(0, "End of the benchmark")
+	return data, displays
+
+
+def measure(protocol, messages, level):
+	"""Returns the number of bytes on the wire (with and without compression) and the time to compress (in s)
+	of the list of messages (bytes); the messages are compressed in one stream"""
+	compressor = Compressor(level)
+	plain = sum(len(b) for msg in messages for b in protocol.frame(msg))
+	t0 = time.process_time()
+	compressedMessages = [compressor.compress(msg) for msg in messages]
+	cpu = time.process_time() - t0
+	compressed = sum(len(b) for msg in compressedMessages for b in protocol.frameCompressed(msg))
+	return plain, compressed, cpu
+
+
+def printLine(kind, nb, plain, compressed, cpu, maxSize=None):
+	"""Print a line of results (sizes per message)"""
+	tooLong = maxSize is not None and maxSize >= 10 ** len(SIZE_FMT % 0)
+	print("%-14s %9d %9d %7.1f%% %10.1f%s" % (kind, plain / nb, compressed / nb, 100 * compressed / plain,
+	                                         1e6 * cpu / nb, "  (!)" if tooLong else ""))
+
+
+if __name__ == "__main__":
+	args = docopt(usage)
+	gameName = args['<gameName>']
+	training = args['--training'] or randomPlayers.get(gameName, 'DO_NOTHING')
+	level = int(args['--level'])
+
+	# the games log in logs/bench/ (as in production, without email)
+	configureRootLogger({'<gameName>': gameName, '--prod': True, '--dev': False, '--log': 'logs/bench/',
+	                     '--web': 0, '--host': 'localhost', '--no-email': True})
+	module = import_module('games.' + gameName + '.server.' + gameName)
+	gameClass = getattr(module, gameName)
+
+	print("Game %s, %s against %s, compression level %d" % (gameName, training, training, level))
+	print("(bytes per message, compression time in µs per message; "
+	      "(!) when a message is too long for the %d-digit header of the text protocol)" % len(SIZE_FMT % 0))
+	for scale in [int(s) for s in args['--scales'].split(',')]:
+		if gameName in generators:
+			scaleGenerator(module, generators[gameName], scale)
+		elif scale != 1:
+			continue
+		datas, displays = [], []
+		for _ in range(int(args['--games'])):
+			data, disp = playGame(gameClass, training, int(args['--moves']))
+			datas.append(data)
+			displays.append(disp)
+
+		print("\nScale %d: %d games, %d displays, game data of %d characters in average" %
+		      (scale, len(datas), sum(len(d) for d in displays), sum(len(d) for d in datas) / len(datas)))
+		print("%-14s %9s %9s %8s %10s" % ("", "plain", "deflate", "ratio", "cpu (µs)"))
+		for protocol in protocols.values():
+			name = "text" if protocol.version == 1 else "binary"
+			# game data: one message per connection
+			encoded = [protocol.encodeGameData(d) for d in datas]
+			res = [measure(protocol, [msg], level) for msg in encoded]
+			printLine(name + " data", len(encoded), *[sum(r[i] for r in res) for i in range(3)],
+			          maxSize=max(len(m) for m in encoded) if protocol.version == 1 else None)
+			# displays: one stream per connection (one game)
+			encoded = [[d.encode('utf-8') for d in disp] for disp in displays]
+			res = [measure(protocol, msgs, level) for msgs in encoded]
+			printLine(name + " display", sum(len(m) for m in encoded), *[sum(r[i] for r in res) for i in range(3)],
+			          maxSize=max(len(m) for msgs in encoded for m in msgs) if protocol.version == 1 else None)
+	print("\nThe compressed messages use a %d-digit header with the text protocol" % len(LARGE_SIZE_FMT % 0))
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8
+"""
+
+* --------------------- *
+|                       |
+|   Coding Game Server  |
+|                       |
+* --------------------- *
+
+
+Authors: T. Hilaire, J. Brajard
+Licence: GPL
+
+File: game_names.py
+	Benchmark: number of games created per second, when a tournament round starts many games at once
+	-> creates (and keeps) some games between training players with the same names and often with the same seed,
+	as fast as possible and from several threads, then checks that all the names are different
+	-> also gives the time to build a name (see Game.gameName)
+
+Copyright 2016-2017 T. Hilaire, J. Brajard
+"""
+
+import sys
+import time
+from importlib import import_module
+from os.path import abspath, dirname
+from threading import Thread
+
+from docopt import docopt
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+from server.Game import Game, gameName
+from server.Logger import configureSimulationLogger
+
+usage = """
+Game names benchmark
+Create many games at once (between the same training players, with a few seeds), and measure the number of games
+created per second and the time to build a name
+
+Usage:
+  game_names.py -h | --help
+  game_names.py [options]
+
+Options:
+  -h --help                Show this screen.
+  -n N --games=N           Number of games [default: 10000].
+  -t N --threads=N         Number of threads that create the games [default: 4].
+  -s N --seeds=N           Number of different seeds [default: 4].
+  -g GAME --game=GAME      Name of the game [default: Labyrinth]
+"""
+
+
+def createGames(gameClass, indexes, nbSeeds, games):
+	"""Create some games (in a thread), and store them in the list games"""
+	for i in indexes:
+		players = [gameClass.type_dict['DO_NOTHING'](), gameClass.type_dict['DO_NOTHING']()]
+		games.append(gameClass(*players, seed=i % nbSeeds, start=0))
+
+
+if __name__ == "__main__":
+	args = docopt(usage)
+	nbGames, nbThreads, nbSeeds = int(args['--games']), int(args['--threads']), int(args['--seeds'])
+
+	configureSimulationLogger()
+	gameClass = getattr(import_module('games.' + args['--game'] + '.server.' + args['--game']), args['--game'])
+
+	# time to build a name
+	t0 = time.perf_counter()
+	for i in range(nbGames):
+		gameName(i % nbSeeds)
+	duration = time.perf_counter() - t0
+	print("%d names built in %.3fs (%.2f µs per name)" % (nbGames, duration, 1e6 * duration / nbGames))
+
+	# create the games (all of them are kept, so each name is compared to the names of all the other games)
+	games = []
+	threads = [Thread(target=createGames, args=(gameClass, range(i, nbGames, nbThreads), nbSeeds, games))
+	           for i in range(nbThreads)]
+	t0 = time.perf_counter()
+	for t in threads:
+		t.start()
+	for t in threads:
+		t.join()
+	duration = time.perf_counter() - t0
+	print("%d games (%d seeds) created by %d threads in %.2fs (%.0f games/s, %.1f µs per game)" %
+	      (nbGames, nbSeeds, nbThreads, duration, nbGames / duration, 1e6 * duration / nbGames))
+
+	names = {g.name for g in games}
+	for g in games:
+		Game.removeInstance(g.name)
+	if len(names) != nbGames:
+		print("%d names are used by several games" % (nbGames - len(names)))
+		sys.exit(1)
+	print("All the names are different (e.g. %s)" % ", ".join(sorted(names)[:3]))
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8
+"""
+
+* --------------------- *
+|                       |
+|   Coding Game Server  |
+|                       |
+* --------------------- *
+
+
+Authors: T. Hilaire, J. Brajard
+Licence: GPL
+
+File: idle_connections.py
+	Benchmark: connect N idle players (waiting for a game) to the game server,
+	and compare the threaded server with the asyncio server (`--async` option of runCGS.py)
+	-> measures the time to connect all the players (and the CPU time of the server per connection), the memory (RSS)
+	and the number of threads of the server
+	-> the web server monkey-patches the threads with gevent, so the threads of the threaded server are greenlets (both
+	servers use one OS thread); a connection mostly costs the creation of the player and its logs (log file, and the
+	records of the connection)
+
+Copyright 2016-2017 T. Hilaire, J. Brajard
+"""
+
+import asyncio
+import os
+import resource
+import socket
+import subprocess
+import sys
+import time
+
+from docopt import docopt
+
+usage = """
+Idle connections benchmark
+Run the game server (threaded and asyncio) and connect N players waiting for a game
+
+Usage:
+  idle_connections.py -h | --help
+  idle_connections.py [options]
+
+Options:
+  -h --help                Show this screen.
+  -n N --nb=N              Number of idle players [default: 10000].
+  -g GAME --game=GAME      Name of the game [default: Labyrinth]
+  -p PORT --port=PORT      Game server port [default: 12345].
+  -w PORT --web=PORT       Web server port [default: 18088].
+  -d DUR --duration=DUR    Time (in seconds) the players stay idle [default: 20].
+  --only=MODE              Run only one mode (`threads` or `async`)
+"""
+
+
+def serverStatus(pid):
+	"""Returns the RSS (in Mo) and the number of threads of the process pid (from /proc)"""
+	status = {}
+	with open('/proc/%d/status' % pid) as f:
+		for line in f:
+			key, _, value = line.partition(':')
+			status[key] = value.strip()
+	return int(status['VmRSS'].split()[0]) / 1024, int(status['Threads'])
+
+
+def serverCPU(pid):
+	"""Returns the CPU time (user and system, in seconds) used by the process pid (from /proc)"""
+	with open('/proc/%d/stat' % pid) as f:
+		fields = f.read().rsplit(')', 1)[1].split()
+	return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def waitForPort(port, timeout=30):
+	"""Wait until the server listens on the port"""
+	t0 = time.time()
+	while time.time() - t0 < timeout:
+		try:
+			socket.create_connection(('localhost', port)).close()
+			return
+		except ConnectionRefusedError:
+			time.sleep(0.2)
+	raise RuntimeError("The server does not start")
+
+
+async def readMessage(reader):
+	"""Read a message (with its 4-digit header) from the server"""
+	size = int(await reader.readexactly(4))
+	return (await reader.readexactly(size)).decode('utf-8')
+
+
+async def idlePlayer(i, port, stop, ready):
+	"""Connect a player, ask for a game, and then wait (answering nothing) until stop is set"""
+	reader, writer = await asyncio.open_connection('localhost', port)
+	writer.write(b"CLIENT_NAME bench_%d" % i)
+	assert await readMessage(reader) == "OK"
+	writer.write(b"WAIT_GAME")
+	assert await readMessage(reader) == "OK"
+	ready.append(i)
+	# read the NOT_READY messages
+	reading = asyncio.ensure_future(stop.wait())
+	while not stop.is_set():
+		msg = asyncio.ensure_future(readMessage(reader))
+		await asyncio.wait((msg, reading), return_when=asyncio.FIRST_COMPLETED)
+		msg.cancel()
+	writer.close()
+
+
+async def runPlayers(N, port, duration, pid):
+	"""Run the N players, and measure the server"""
+	stop = asyncio.Event()
+	ready = []
+	cpu0 = serverCPU(pid)
+	t0 = time.time()
+	tasks = []
+	for i in range(N):
+		tasks.append(asyncio.ensure_future(idlePlayer(i, port, stop, ready)))
+		if i % 100 == 99:
+			await asyncio.sleep(0)
+	# wait for all the players to be connected and waiting for a game (or failed)
+	while len(ready) + sum(t.done() for t in tasks) < N:
+		await asyncio.sleep(0.01)
+	tConnect = time.time() - t0
+	cpu = serverCPU(pid) - cpu0
+	if len(ready) < N:
+		print("Warning: only %d players are connected" % len(ready))
+	measures = []
+	for _ in range(int(duration)):
+		await asyncio.sleep(1)
+		measures.append(serverStatus(pid))
+	stop.set()
+	await asyncio.gather(*tasks, return_exceptions=True)
+	rss = max(m[0] for m in measures)
+	threads = max(m[1] for m in measures)
+	return tConnect, cpu / N, rss, threads
+
+
+def runBenchmark(mode, args):
+	"""Run the server in a given mode and connect the idle players"""
+	cmd = [sys.executable, 'runCGS.py', args['--game'], '--dev', '--no-email',
+	       '-p', args['--port'], '-w', args['--web'], '--log=logs/bench/']
+	if mode == 'async':
+		cmd.append('--async')
+	server = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+	try:
+		waitForPort(int(args['--port']))
+		return asyncio.run(runPlayers(int(args['--nb']), int(args['--port']), args['--duration'], server.pid))
+	finally:
+		server.terminate()
+		server.wait()
+
+
+if __name__ == "__main__":
+	args = docopt(usage)
+	# each connection needs a file descriptor (for the client and the server)
+	soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+	resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+	modes = [args['--only']] if args['--only'] else ['threads', 'async']
+	print("%d idle players (%s)" % (int(args['--nb']), args['--game']))
+	print("%-10s %12s %14s %12s %10s" % ("server", "connect (s)", "CPU/conn (ms)", "RSS (Mo)", "threads"))
+	for m in modes:
+		tConnect, cpu, rss, threads = runBenchmark(m, args)
+		print("%-10s %12.2f %14.2f %12.1f %10d" % (m, tConnect, 1000 * cpu, rss, threads))
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8
+"""
+
+* --------------------- *
+|                       |
+|   Coding Game Server  |
+|                       |
+* --------------------- *
+
+
+Authors: T. Hilaire, J. Brajard
+Licence: GPL
+
+File: move_handoff.py
+	Benchmark: number of moves per second of a game between two regular players, in the same process
+	-> each player is played by a thread that calls Game.playMove and Game.getLastMove (as the PlayerSocket does),
+	without any socket, so only the handoff of the moves between the two threads (and the update of the game) is
+	measured (there is no web page to update)
+
+Copyright 2016-2017 T. Hilaire, J. Brajard
+"""
+
+import time
+from importlib import import_module
+from os.path import abspath, dirname
+from threading import Thread
+import sys
+
+from docopt import docopt
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+from server.Constants import NORMAL_MOVE
+from server.Logger import configureRootLogger
+from server.Player.RateLimiter import RateLimiter
+from server.Player.RegularPlayer import RegularPlayer
+
+usage = """
+Move handoff benchmark
+Play games between two regular players in the same process (one thread per player, without sockets),
+and measure the number of moves per second
+
+Usage:
+  move_handoff.py -h | --help
+  move_handoff.py [options]
+
+Options:
+  -h --help                Show this screen.
+  -n N --nb=N              Number of moves per game [default: 5000].
+  -r N --runs=N            Number of games [default: 5].
+  -g GAME --game=GAME      Name of the game [default: Labyrinth]
+  -m MOVE --move=MOVE      Move to play (that should be a legal move for the game) [default: 8 0]
+  -e MOVE --end=MOVE       Move that ends the game (an illegal move) [default: 9 0]
+"""
+
+
+class LocalSocket:
+	"""What a RegularPlayer needs from its PlayerSocket (there is no connection here)"""
+
+	def __init__(self):
+		self.rateLimiter = RateLimiter()
+
+	def notifyGame(self):
+		pass
+
+	def disconnect(self):
+		pass
+
+
+def playPlayer(game, player, nbMoves, move, endMove, counts, i):
+	"""
+	Play a game for a player (thread), as the PlayerSocket does (PLAY_MOVE then GET_MOVE)
+	The player #0 ends the game with endMove after nbMoves moves; counts[i] is set to the number of moves played
+	"""
+	n = 0
+	# (the player #0 starts; the player #1 cannot check if it has to play, because the player #0 may have already
+	# played when the thread starts)
+	if i == 1:
+		if game.getLastMove(player)[1] != NORMAL_MOVE:
+			counts[i] = n
+			return
+	while True:
+		n += 1
+		code, _ = game.playMove(endMove if i == 0 and 2 * n > nbMoves else move)
+		if code != NORMAL_MOVE or game.getLastMove(player)[1] != NORMAL_MOVE:
+			break
+	counts[i] = n
+
+
+def runGame(gameClass, nbMoves, move, endMove, index):
+	"""Play a game between two (new) regular players, and returns the number of moves and the duration"""
+	players = [RegularPlayer("bench%d_%d" % (index, i), "localhost", LocalSocket()) for i in range(2)]
+	game = gameClass(*players, start=0, timeout=60)
+	counts = [0, 0]
+	threads = [Thread(target=playPlayer, args=(game, p, nbMoves, move, endMove, counts, i))
+	           for i, p in enumerate(game.players)]
+	t0 = time.perf_counter()
+	for t in threads:
+		t.start()
+	for t in threads:
+		t.join()
+	duration = time.perf_counter() - t0
+	for p in players:
+		RegularPlayer.removeInstance(p.name)
+	return sum(counts), duration
+
+
+if __name__ == "__main__":
+	args = docopt(usage)
+	gameName = args['--game']
+
+	# the games log in logs/bench/ (as in production, without email)
+	configureRootLogger({'<gameName>': gameName, '--prod': True, '--dev': False, '--log': 'logs/bench/',
+	                     '--web': 0, '--host': 'localhost', '--no-email': True})
+	gameClass = getattr(import_module('games.' + gameName + '.server.' + gameName), gameName)
+
+	results = []
+	for r in range(int(args['--runs'])):
+		nb, duration = runGame(gameClass, int(args['--nb']), args['--move'], args['--end'], r)
+		results.append(nb / duration)
+		print("game %d: %d moves in %.2fs, %.0f moves/s" % (r, nb, duration, nb / duration))
+	results.sort()
+	print("median: %.0f moves/s (min %.0f, max %.0f)" % (results[len(results) // 2], results[0], results[-1]))
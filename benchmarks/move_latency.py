@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8
+"""
+
+* --------------------- *
+|                       |
+|   Coding Game Server  |
+|                       |
+* --------------------- *
+
+
+Authors: T. Hilaire, J. Brajard
+Licence: GPL
+
+File: move_latency.py
+	Benchmark: play training games (against DO_NOTHING) as fast as possible, and measure the time per move
+	-> measures the time of a move seen by the client (PLAY_MOVE + GET_MOVE), and gets the move histogram
+	of the server (/stats page)
+
+Copyright 2016-2017 T. Hilaire, J. Brajard
+"""
+
+import json
+import socket
+import subprocess
+import sys
+import time
+from urllib.request import urlopen
+
+from docopt import docopt
+
+usage = """
+Move latency benchmark
+Run the game server and play training games, to measure the time per move
+
+Usage:
+  move_latency.py -h | --help
+  move_latency.py [options]
+
+Options:
+  -h --help                Show this screen.
+  -n N --nb=N              Number of moves [default: 1000].
+  -g GAME --game=GAME      Name of the game [default: Labyrinth]
+  -m MOVE --move=MOVE      Move to play (that should be a legal move for the game) [default: 8 0]
+  -p PORT --port=PORT      Game server port [default: 12345].
+  -w PORT --web=PORT       Web server port [default: 18088].
+  --async                  Use the asyncio game server
+  --no-server              Do not run the server (use a server already running)
+"""
+
+
+def waitForPort(port, timeout=30):
+	"""Wait until the server listens on the port"""
+	t0 = time.time()
+	while time.time() - t0 < timeout:
+		try:
+			socket.create_connection(('localhost', port)).close()
+			return
+		except ConnectionRefusedError:
+			time.sleep(0.2)
+	raise RuntimeError("The server does not start")
+
+
+def readMessage(reader):
+	"""Read a message (with its 4-digit header) from the server (reader is a buffered file, from socket.makefile)"""
+	head = reader.read(4)
+	if len(head) < 4:
+		raise EOFError("The server has closed the connection")
+	return reader.read(int(head)).decode('utf-8')
+
+
+def sendCommand(sock, reader, command):
+	"""Send a command (with its size), and check the acknowledgment"""
+	cmd = command.encode('utf-8')
+	sock.sendall(b"%04d" % len(cmd) + cmd)
+	ack = readMessage(reader)
+	if ack != "OK":
+		raise RuntimeError("The server answers '%s' to '%s'" % (ack, command))
+
+
+def playMoves(port, nbMoves, move):
+	"""Play nbMoves moves (in several training games if necessary), returns the list of time per move"""
+	sock = socket.create_connection(('localhost', port))
+	sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+	reader = sock.makefile('rb')
+	sendCommand(sock, reader, "CLIENT_NAME latency_bench")
+	times = []
+	while len(times) < nbMoves:
+		sendCommand(sock, reader, "WAIT_GAME TRAINING DO_NOTHING timeout=600")
+		while readMessage(reader) == "NOT_READY":
+			pass
+		readMessage(reader)   # game sizes
+		sendCommand(sock, reader, "GET_GAME_DATA")
+		readMessage(reader)   # game data
+		whoPlays = readMessage(reader)
+		if whoPlays == '1':
+			sendCommand(sock, reader, "GET_MOVE")
+			readMessage(reader), readMessage(reader)
+		returnCode = '0'
+		while returnCode == '0' and len(times) < nbMoves:
+			t0 = time.perf_counter()
+			sendCommand(sock, reader, "PLAY_MOVE " + move)
+			returnCode, _ = readMessage(reader), readMessage(reader)
+			if returnCode == '0':
+				sendCommand(sock, reader, "GET_MOVE")
+				_, returnCode = readMessage(reader), readMessage(reader)
+			times.append(time.perf_counter() - t0)
+	reader.close()
+	sock.close()
+	return times
+
+
+if __name__ == "__main__":
+	args = docopt(usage)
+	port = int(args['--port'])
+	server = None
+	if not args['--no-server']:
+		cmd = [sys.executable, 'runCGS.py', args['--game'], '--dev', '--no-email',
+		       '-p', args['--port'], '-w', args['--web'], '--log=logs/bench/']
+		if args['--async']:
+			cmd.append('--async')
+		server = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+	try:
+		waitForPort(port)
+		times = sorted(playMoves(port, int(args['--nb']), args['--move']))
+		n = len(times)
+		print("%d moves, %.1f moves/s" % (n, n / sum(times)))
+		print("time per move (ms): mean=%.3f p50=%.3f p90=%.3f p99=%.3f max=%.3f" % (
+			1000 * sum(times) / n, 1000 * times[n // 2], 1000 * times[int(n * 0.9)], 1000 * times[int(n * 0.99)],
+			1000 * times[-1]))
+		try:
+			with urlopen('http://localhost:%s/stats' % args['--web']) as f:
+				print("server /stats:", json.dumps(json.loads(f.read().decode('utf-8')), indent=2))
+		except OSError:
+			print("The /stats page cannot be read")
+	finally:
+		if server:
+			server.terminate()
+			server.wait()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8
+"""
+
+* --------------------- *
+|                       |
+|   Coding Game Server  |
+|                       |
+* --------------------- *
+
+
+Authors: T. Hilaire, J. Brajard
+Licence: GPL
+
+File: protocol_throughput.py
+	Benchmark: compare the text protocol (v1) and the binary protocol (v2)
+	-> N clients play training games (against DO_NOTHING) as fast as possible, with each protocol,
+	and we measure the number of moves per second and the number of bytes exchanged per move
+
+Copyright 2016-2017 T. Hilaire, J. Brajard
+"""
+
+import asyncio
+import socket
+import subprocess
+import sys
+import time
+from struct import pack, unpack
+
+from docopt import docopt
+
+usage = """
+Protocol throughput benchmark
+Run the game server, and play training games with the text (v1) and binary (v2) protocols
+
+Usage:
+  protocol_throughput.py -h | --help
+  protocol_throughput.py [options]
+
+Options:
+  -h --help                Show this screen.
+  -n N --nb=N              Number of clients [default: 20].
+  -d DUR --duration=DUR    Duration (in seconds) of each test [default: 10].
+  -g GAME --game=GAME      Name of the game [default: Labyrinth]
+  -m MOVE --move=MOVE      Move to play (that should be a legal move for the game) [default: 8 0]
+  -p PORT --port=PORT      Game server port [default: 12345].
+  -w PORT --web=PORT       Web server port [default: 18088].
+  --async                  Use the asyncio game server
+  --no-server              Do not run the server (use a server already running)
+"""
+
+OPCODES = {"CLIENT_NAME": 1, "WAIT_GAME": 2, "GET_GAME_DATA": 3, "GET_MOVE": 4, "PLAY_MOVE": 5, "DISP_GAME": 6,
+           "SEND_COMMENT": 7}
+
+
+def waitForPort(port, timeout=30):
+	"""Wait until the server listens on the port"""
+	t0 = time.time()
+	while time.time() - t0 < timeout:
+		try:
+			socket.create_connection(('localhost', port)).close()
+			return
+		except ConnectionRefusedError:
+			time.sleep(0.2)
+	raise RuntimeError("The server does not start")
+
+
+def encodeVarint(n):
+	"""Encode a positive integer as a varint"""
+	out = bytearray()
+	while n >= 0x80:
+		out.append((n & 0x7F) | 0x80)
+		n >>= 7
+	out.append(n)
+	return bytes(out)
+
+
+
+class Client:
+	"""
+	Minimal client, for the text (v1) or binary (v2) protocol
+	(counts the bytes sent and received)
+	"""
+
+	def __init__(self, reader, writer, version):
+		self._reader = reader
+		self._writer = writer
+		self.version = version
+		self.bytes = 0
+
+
+	async def read(self):
+		"""Read a message (bytes)"""
+		if self.version == 1:
+			head = await self._reader.readexactly(4)
+			size = int(head)
+		else:
+			head = b''
+			size = shift = 0
+			while True:
+				b = (await self._reader.readexactly(1))[0]
+				head += bytes([b])
+				size |= (b & 0x7F) << shift
+				shift += 7
+				if not b & 0x80:
+					break
+		self.bytes += len(head) + size
+		return await self._reader.readexactly(size)
+
+
+	async def command(self, command):
+		"""Send a command (string), and check the acknowledgment"""
+		if self.version == 1 or command.startswith("CLIENT_NAME"):
+			cmd = command.encode('utf-8')
+			data = b"%04d" % len(cmd) + cmd
+		else:
+			name, _, args = command.partition(" ")
+			if name == "PLAY_MOVE":
+				values = [int(v) for v in args.split()]
+				cmd = bytes([OPCODES[name]]) + pack('>%dh' % len(values), *values)
+			else:
+				cmd = bytes([OPCODES[name]]) + args.encode('utf-8')
+			data = encodeVarint(len(cmd)) + cmd
+		self._writer.write(data)
+		self.bytes += len(data)
+		ack = await self.read()
+		if ack != b"OK":
+			raise RuntimeError("The server answers '%s' to '%s'" % (ack, command))
+
+
+	def returnCode(self, data):
+		"""Decode a return code"""
+		return int(data) if self.version == 1 else unpack('b', data)[0]
+
+
+async def player(i, port, version, move, stop, moves):
+	"""Play training games until stop is set, count the moves (in moves[i])"""
+	reader, writer = await asyncio.open_connection('localhost', port)
+	writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+	client = Client(reader, writer, 1)
+	await client.command("CLIENT_NAME bench_v%d_%d" % (version, i) + (" PROTOCOL=2" if version == 2 else ""))
+	client.version = version
+	while not stop.is_set():
+		await client.command("WAIT_GAME TRAINING DO_NOTHING timeout=600")
+		while await client.read() == b"NOT_READY":
+			pass
+		await client.read()     # game sizes
+		await client.command("GET_GAME_DATA")
+		await client.read()     # game data
+		whoPlays = await client.read()
+		if whoPlays in (b'1', b'\x01'):
+			await client.command("GET_MOVE")
+			await client.read(), await client.read()
+		returnCode = 0
+		while returnCode == 0 and not stop.is_set():
+			await client.command("PLAY_MOVE " + move)
+			returnCode = client.returnCode(await client.read())
+			await client.read()
+			if returnCode == 0:
+				await client.command("GET_MOVE")
+				await client.read()
+				returnCode = client.returnCode(await client.read())
+			moves[i] += 1
+	writer.close()
+	return client.bytes
+
+
+async def runClients(N, port, version, move, duration):
+	"""Run N clients during duration seconds, returns the number of moves per second, and the bytes per move"""
+	stop = asyncio.Event()
+	moves = [0] * N
+	tasks = [asyncio.ensure_future(player(i, port, version, move, stop, moves)) for i in range(N)]
+	await asyncio.sleep(1)      # warm up
+	m0, t0 = sum(moves), time.time()
+	await asyncio.sleep(duration)
+	m1, t1 = sum(moves), time.time()
+	stop.set()
+	nbBytes = await asyncio.gather(*tasks)
+	return (m1 - m0) / (t1 - t0), sum(nbBytes) / sum(moves)
+
+
+if __name__ == "__main__":
+	args = docopt(usage)
+	port = int(args['--port'])
+	server = None
+	if not args['--no-server']:
+		cmd = [sys.executable, 'runCGS.py', args['--game'], '--dev', '--no-email',
+		       '-p', args['--port'], '-w', args['--web'], '--log=logs/bench/']
+		if args['--async']:
+			cmd.append('--async')
+		server = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+	try:
+		waitForPort(port)
+		print("%d clients, %ss per protocol" % (int(args['--nb']), args['--duration']))
+		print("%-10s %12s %16s" % ("protocol", "moves/s", "bytes/move"))
+		for v in (1, 2):
+			rate, size = asyncio.run(runClients(int(args['--nb']), port, v, args['--move'], float(args['--duration'])))
+			print("%-10s %12.0f %16.1f" % ("v%d" % v, rate, size))
+	finally:
+		if server:
+			server.terminate()
+			server.wait()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8
+"""
+
+* --------------------- *
+|                       |
+|   Coding Game Server  |
+|                       |
+* --------------------- *
+
+
+Authors: T. Hilaire, J. Brajard
+Licence: GPL
+
+File: record_overhead.py
+	Benchmark: overhead of the record of the games (see server/Archive.py), per move
+	-> plays some games between two training players (without archive), then records them in an archive (in a temporary
+	folder), and compares the time to record them (encode and write) to the time to play them
+	-> also gives the time to record a move during the game, and the size of the records
+
+Copyright 2016-2017 T. Hilaire, J. Brajard
+"""
+
+import sys
+import time
+from importlib import import_module
+from os.path import abspath, dirname
+from tempfile import TemporaryDirectory
+
+from docopt import docopt
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+from server.Archive import archive
+from server.Constants import NORMAL_MOVE
+from server.Game import Game
+from server.Logger import configureSimulationLogger
+
+usage = """
+Record overhead benchmark
+Play games between two training players, record them in an archive, and measure the overhead (per move) of the record
+of the games
+
+Usage:
+  record_overhead.py -h | --help
+  record_overhead.py [options]
+
+Options:
+  -h --help                Show this screen.
+  -g GAME --game=GAME      Name of the game [default: Labyrinth]
+  -n N --games=N           Number of games [default: 200].
+  -m N --moves=N           Maximum number of moves per game [default: 500].
+  -t NAME --training=NAME  Training player that plays both sides (a random player of the game by default)
+"""
+
+# random training players of each game (used by default)
+randomPlayers = {'Labyrinth': 'PLAY_RANDOM', 'Networks': 'ALICE_RANDOM'}
+
+
+def playGames(gameClass, training, nbGames, maxMoves):
+	"""
+	Play some games between two training players (seeds 0 to nbGames-1), until their end (the game is ended when it
+	is too long)
+	Returns the number of moves, the duration and the list of the games
+	"""
+	nbMoves = 0
+	games = []
+	t0 = time.perf_counter()
+	for seed in range(nbGames):
+		game = gameClass(gameClass.type_dict[training](), gameClass.type_dict[training](), seed=seed, start=0)
+		return_code = NORMAL_MOVE
+		n = 0
+		while return_code == NORMAL_MOVE and n < maxMoves:
+			_, return_code = game.getLastMove()
+			n += 1
+		if return_code == NORMAL_MOVE:
+			game.endOfGame(0, "Too long")
+		nbMoves += n
+		games.append(game)
+	return nbMoves, time.perf_counter() - t0, games
+
+
+if __name__ == "__main__":
+	args = docopt(usage)
+	gameName = args['--game']
+	training = args['--training'] or randomPlayers.get(gameName, 'DO_NOTHING')
+	nbGames, maxMoves = int(args['--games']), int(args['--moves'])
+
+	configureSimulationLogger()
+	gameClass = getattr(import_module('games.' + gameName + '.server.' + gameName), gameName)
+	Game.setTheGameClass(gameClass)
+
+	# play the games (without archive)
+	nbMoves, duration, games = playGames(gameClass, training, nbGames, maxMoves)
+	perMove = 1e6 * duration / nbMoves
+	print("%s, %s against %s: %d games, %d moves, %.2f µs per move" %
+	      (gameName, training, training, nbGames, nbMoves, perMove))
+
+	# record of a move during the game (as Game.playMove and Game.getLastMove do)
+	moves, start = [], time.monotonic()
+	t0 = time.perf_counter()
+	for _ in range(nbMoves):
+		moves.append(("8 0", NORMAL_MOVE, int(1000 * (time.monotonic() - start))))
+	recordMove = 1e6 * (time.perf_counter() - t0) / nbMoves
+	print("record of a move during the game: %.3f µs" % recordMove)
+
+	# record of the games at their end (encoded and written in the archive)
+	with TemporaryDirectory() as path:
+		archive.open(path)
+		t0 = time.perf_counter()
+		for game in games:
+			archive.record(game)
+		recordGame = 1e6 * (time.perf_counter() - t0) / nbMoves
+		size = archive.getDictInformations()['size']
+		archive.close()
+	print("record of the games at their end: %.1f µs per game, %.3f µs per move" %
+	      (recordGame * nbMoves / nbGames, recordGame))
+	print("overhead: %.3f µs per move (%.2f%% of the time per move)" %
+	      (recordMove + recordGame, 100 * (recordMove + recordGame) / perMove))
+	print("size of the archive: %d octets (%.1f octets per game, %.2f per move)" %
+	      (size, size / nbGames, size / nbMoves))
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8
+"""
+
+* --------------------- *
+|                       |
+|   Coding Game Server  |
+|                       |
+* --------------------- *
+
+
+Authors: T. Hilaire, J. Brajard
+Licence: GPL
+
+File: unix_latency.py
+	Benchmark: compare the time per move on the loopback (TCP) and on a Unix domain socket (`--unix` option of runCGS.py)
+	-> play training games (against DO_NOTHING) as fast as possible, through each socket, and measure the round-trip
+	time of a move (PLAY_MOVE + GET_MOVE)
+
+Copyright 2016-2017 T. Hilaire, J. Brajard
+"""
+
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from docopt import docopt
+
+usage = """
+Unix socket latency benchmark
+Run the game server (listening on a TCP port and on a Unix socket) and play training games through each socket
+
+Usage:
+  unix_latency.py -h | --help
+  unix_latency.py [options]
+
+Options:
+  -h --help                Show this screen.
+  -n N --nb=N              Number of moves [default: 5000].
+  -g GAME --game=GAME      Name of the game [default: Labyrinth]
+  -m MOVE --move=MOVE      Move to play (that should be a legal move for the game) [default: 8 0]
+  -p PORT --port=PORT      Game server port [default: 12345].
+  -w PORT --web=PORT       Web server port [default: 18088].
+  -u PATH --unix=PATH      Path of the Unix socket [default: /tmp/cgs_bench.sock].
+  --async                  Use the asyncio game server
+"""
+
+
+def waitForPort(port, path, timeout=30):
+	"""Wait until the server listens on the port and on the Unix socket"""
+	t0 = time.time()
+	while time.time() - t0 < timeout:
+		try:
+			socket.create_connection(('localhost', port)).close()
+			if os.path.exists(path):
+				return
+		except ConnectionRefusedError:
+			pass
+		time.sleep(0.2)
+	raise RuntimeError("The server does not start")
+
+
+def readMessage(reader):
+	"""Read a message (with its 4-digit header) from the server (reader is a buffered file, from socket.makefile)"""
+	head = reader.read(4)
+	if len(head) < 4:
+		raise EOFError("The server has closed the connection")
+	return reader.read(int(head)).decode('utf-8')
+
+
+def sendCommand(sock, reader, command):
+	"""Send a command (with its size), and check the acknowledgment"""
+	cmd = command.encode('utf-8')
+	sock.sendall(b"%04d" % len(cmd) + cmd)
+	ack = readMessage(reader)
+	if ack != "OK":
+		raise RuntimeError("The server answers '%s' to '%s'" % (ack, command))
+
+
+def playMoves(sock, name, nbMoves, move):
+	"""Play nbMoves moves (in several training games if necessary) through the socket sock,
+	returns the list of time per move"""
+	reader = sock.makefile('rb')
+	sendCommand(sock, reader, "CLIENT_NAME " + name)
+	times = []
+	while len(times) < nbMoves:
+		sendCommand(sock, reader, "WAIT_GAME TRAINING DO_NOTHING timeout=600")
+		while readMessage(reader) == "NOT_READY":
+			pass
+		readMessage(reader)   # game sizes
+		sendCommand(sock, reader, "GET_GAME_DATA")
+		readMessage(reader)   # game data
+		whoPlays = readMessage(reader)
+		if whoPlays == '1':
+			sendCommand(sock, reader, "GET_MOVE")
+			readMessage(reader), readMessage(reader)
+		returnCode = '0'
+		while returnCode == '0' and len(times) < nbMoves:
+			t0 = time.perf_counter()
+			sendCommand(sock, reader, "PLAY_MOVE " + move)
+			returnCode, _ = readMessage(reader), readMessage(reader)
+			if returnCode == '0':
+				sendCommand(sock, reader, "GET_MOVE")
+				_, returnCode = readMessage(reader), readMessage(reader)
+			times.append(time.perf_counter() - t0)
+	reader.close()
+	sock.close()
+	return times
+
+
+def printTimes(kind, times):
+	"""Print the statistics about the time per move"""
+	times = sorted(times)
+	n = len(times)
+	print("%-6s %8.1f %9.3f %9.3f %9.3f %9.3f" % (kind, n / sum(times), 1000 * sum(times) / n, 1000 * times[n // 2],
+	                                             1000 * times[int(n * 0.9)], 1000 * times[int(n * 0.99)]))
+
+
+if __name__ == "__main__":
+	args = docopt(usage)
+	port, path = int(args['--port']), args['--unix']
+	cmd = [sys.executable, 'runCGS.py', args['--game'], '--dev', '--no-email', '-p', args['--port'],
+	       '-w', args['--web'], '--unix=' + path, '--log=logs/bench/']
+	if args['--async']:
+		cmd.append('--async')
+	server = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+	try:
+		waitForPort(port, path)
+		print("%d moves per socket (time in ms)" % int(args['--nb']))
+		print("%-6s %8s %9s %9s %9s %9s" % ("socket", "moves/s", "mean", "p50", "p90", "p99"))
+		# TCP (loopback)
+		sock = socket.create_connection(('localhost', port))
+		sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+		printTimes("tcp", playMoves(sock, "tcp_bench", int(args['--nb']), args['--move']))
+		# Unix socket
+		sock = socket.socket(socket.AF_UNIX)
+		sock.connect(path)
+		printTimes("unix", playMoves(sock, "unix_bench", int(args['--nb']), args['--move']))
+	finally:
+		server.terminate()
+		server.wait()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8
+"""
+
+* --------------------- *
+|                       |
+|   Coding Game Server  |
+|                       |
+* --------------------- *
+
+
+Authors: T. Hilaire, J. Brajard
+Licence: GPL
+
+File: websocket_broadcast.py
+	Benchmark: cost of the websockets (webpages of the games) in the time per move (see server/Broadcaster.py)
+	-> plays some games between two training players, each game being watched by some slow spectators (websockets
+	that take some time to send a message), first with the updates sent in the move (as before the broadcaster), then
+	with the broadcaster (the updates are sent by its thread, and coalesced)
+	-> gives the time per move in both cases, and the number of updates sent; every spectator must have received the
+	last state of its game
+
+Copyright 2016-2017 T. Hilaire, J. Brajard
+"""
+
+import json
+import sys
+import time
+from importlib import import_module
+from os.path import abspath, dirname
+
+from docopt import docopt
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+from server.Broadcaster import broadcaster
+from server.Constants import NORMAL_MOVE
+from server.Game import Game
+from server.Logger import configureSimulationLogger
+
+usage = """
+Websocket broadcast benchmark
+Play games between two training players, watched by slow spectators, and measure the time per move when the updates
+are sent in the move, and when they are sent by the broadcaster
+
+Usage:
+  websocket_broadcast.py -h | --help
+  websocket_broadcast.py [options]
+
+Options:
+  -h --help                  Show this screen.
+  -g GAME --game=GAME        Name of the game [default: Labyrinth]
+  -n N --games=N             Number of games played at the same time [default: 20].
+  -m N --moves=N             Maximum number of moves per game [default: 100].
+  -s N --spectators=N        Number of spectators per game [default: 2].
+  -l MS --latency=MS         Time (in ms) taken by a spectator to receive a message [default: 1].
+  -t NAME --training=NAME    Training player that plays both sides (a random player of the game by default)
+"""
+
+# random training players of each game (used by default)
+randomPlayers = {'Labyrinth': 'PLAY_RANDOM', 'Networks': 'ALICE_RANDOM'}
+
+
+
+class Spectator:
+	"""
+	A slow websocket: it takes `latency` seconds to send a message, and keeps the last message
+	"""
+
+	def __init__(self, latency):
+		self.latency = latency
+		self.last = None
+		self.nbMessages = 0
+
+	def send(self, js):
+		time.sleep(self.latency)
+		self.last = js
+		self.nbMessages += 1
+
+
+
+def playGames(gameClass, training, nbGames, maxMoves, nbSpectators, latency):
+	"""
+	Play the games (round-robin, one move per game), watched by the spectators
+	Returns the time per move (in seconds), and the list of the games and of their spectators
+	"""
+	games = [gameClass(gameClass.type_dict[training](), gameClass.type_dict[training](), seed=seed, start=0)
+	         for seed in range(nbGames)]
+	spectators = []
+	for game in games:
+		spectators.append([Spectator(latency) for _ in range(nbSpectators)])
+		for spectator in spectators[-1]:
+			game.registerWebSocket(spectator)
+	running = list(games)
+	nbMoves = 0
+	t0 = time.perf_counter()
+	while running:
+		for game in running:
+			_, return_code = game.getLastMove()
+			nbMoves += 1
+			if return_code == NORMAL_MOVE and len(game.moves) >= maxMoves:
+				game.endOfGame(0, "Too long")
+		running = [game for game in running if not game.isOver]
+	return (time.perf_counter() - t0) / nbMoves, games, spectators
+
+
+
+if __name__ == "__main__":
+	args = docopt(usage)
+	gameName = args['--game']
+	training = args['--training'] or randomPlayers.get(gameName, 'DO_NOTHING')
+	nbGames, maxMoves, nbSpectators = int(args['--games']), int(args['--moves']), int(args['--spectators'])
+	latency = float(args['--latency']) / 1000
+
+	configureSimulationLogger()
+	gameClass = getattr(import_module('games.' + gameName + '.server.' + gameName), gameName)
+	Game.setTheGameClass(gameClass)
+	print("%s, %s against %s: %d games at the same time, %d spectators per game (%g ms per message)" %
+	      (gameName, training, training, nbGames, nbSpectators, 1000 * latency))
+
+	# the updates sent in the move (the update is sent as soon as it is published)
+	publish = broadcaster.publish
+	broadcaster.publish = lambda obj, send: send()
+	inline, games, _ = playGames(gameClass, training, nbGames, maxMoves, nbSpectators, latency)
+	broadcaster.publish = publish
+	for game in games:
+		Game.removeInstance(game.name)
+	print("updates sent in the move: %.1f µs per move" % (1e6 * inline))
+
+	# the updates sent by the broadcaster (wait until they are all sent)
+	perMove, games, spectators = playGames(gameClass, training, nbGames, maxMoves, nbSpectators, latency)
+	lasts = [json.dumps(game.getDictInformations()) for game in games]
+	t0 = time.perf_counter()
+	while time.perf_counter() - t0 < 60:
+		if all(s.last == last for specs, last in zip(spectators, lasts) for s in specs):
+			break
+		time.sleep(0.01)
+	info = broadcaster.getDictInformations()
+	print("updates sent by the broadcaster: %.1f µs per move (%.1fx faster)" % (1e6 * perMove, inline / perMove))
+	print("%d updates published, %d sent (%.1f%% coalesced), %.1f µs per update sent" %
+	      (info['published'], info['sent'], 100 * (1 - info['sent'] / max(info['published'], 1)),
+	       info['timePerUpdate']))
+	late = sum(1 for specs, last in zip(spectators, lasts) for s in specs if s.last != last)
+	print("%d spectators have not received the last state of their game" % late)
+	if late:
+		sys.exit(1)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8
+"""
+
+* --------------------- *
+|                       |
+|   Coding Game Server  |
+|                       |
+* --------------------- *
+
+
+Authors: T. Hilaire, J. Brajard
+Licence: GPL
+
+File: worker_scaling.py
+	Benchmark: measure how the number of moves per second scales with the number of worker processes
+	(`--workers` option of runCGS.py)
+	-> N pairs of regular players play games against each other (the games are created with the web server),
+	as fast as possible, and we measure the total number of moves per second
+
+Copyright 2016-2017 T. Hilaire, J. Brajard
+"""
+
+import asyncio
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+from docopt import docopt
+
+usage = """
+Worker scaling benchmark
+Run the game server with 0, 1, 2, ... worker processes, and play games between pairs of regular players
+
+Usage:
+  worker_scaling.py -h | --help
+  worker_scaling.py [options]
+
+Options:
+  -h --help                Show this screen.
+  -n N --nb=N              Number of pairs of players [default: 16].
+  -W LIST --workers=LIST   Numbers of workers to test (comma separated) [default: 0,1,2,4].
+  -d DUR --duration=DUR    Duration (in seconds) of each test [default: 10].
+  -g GAME --game=GAME      Name of the game [default: Labyrinth]
+  -m MOVE --move=MOVE      Move to play (that should be a legal move for the game) [default: 8 0]
+  -p PORT --port=PORT      Game server port [default: 12345].
+  -w PORT --web=PORT       Web server port [default: 18088].
+"""
+
+
+def waitForPort(port, timeout=30):
+	"""Wait until the server listens on the port"""
+	t0 = time.time()
+	while time.time() - t0 < timeout:
+		try:
+			socket.create_connection(('localhost', port)).close()
+			return
+		except ConnectionRefusedError:
+			time.sleep(0.2)
+	raise RuntimeError("The server does not start")
+
+
+def createGame(web, name1, name2):
+	"""Create a game between two players (with the web server), returns True if the game is created"""
+	data = urlencode({'player1': name1, 'player2': name2}).encode('utf-8')
+	with urlopen('http://localhost:%d/create_new_game.html' % web, data=data) as f:
+		return not f.read().startswith(b'Error')
+
+
+
+class Client:
+	"""
+	Minimal client (text protocol)
+	"""
+
+	def __init__(self, reader, writer):
+		self._reader = reader
+		self._writer = writer
+
+
+	async def read(self):
+		"""Read a message (string)"""
+		size = int(await self._reader.readexactly(4))
+		return (await self._reader.readexactly(size)).decode('utf-8')
+
+
+	async def command(self, command):
+		"""Send a command (string), and check the acknowledgment"""
+		cmd = command.encode('utf-8')
+		self._writer.write(b"%04d" % len(cmd) + cmd)
+		ack = await self.read()
+		if ack != "OK":
+			raise RuntimeError("The server answers '%s' to '%s'" % (ack, command))
+
+
+async def connect(port, name):
+	"""Connect a player"""
+	reader, writer = await asyncio.open_connection('localhost', port)
+	writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+	client = Client(reader, writer)
+	await client.command("CLIENT_NAME " + name)
+	return client
+
+
+async def playGame(client, move, stop, moves, i):
+	"""Play a game (until its end or until stop is set), count the moves in moves[i]"""
+	while await client.read() == "NOT_READY":
+		pass
+	await client.read()     # game sizes
+	await client.command("GET_GAME_DATA")
+	await client.read()     # game data
+	returnCode = 0
+	if await client.read() == '1':
+		await client.command("GET_MOVE")
+		await client.read()
+		returnCode = int(await client.read())
+	while returnCode == 0 and not stop.is_set():
+		await client.command("PLAY_MOVE " + move)
+		returnCode = int(await client.read())
+		await client.read()
+		moves[i] += 1
+		if returnCode == 0:
+			await client.command("GET_MOVE")
+			await client.read()
+			returnCode = int(await client.read())
+
+
+async def pair(i, port, web, move, stop, moves):
+	"""Two players that play games against each other until stop is set"""
+	loop = asyncio.get_running_loop()
+	names = ("bench%d_a" % i, "bench%d_b" % i)
+	clients = [await connect(port, name) for name in names]
+	while not stop.is_set():
+		for client in clients:
+			await client.command("WAIT_GAME")
+		while not await loop.run_in_executor(None, createGame, web, *names):
+			await asyncio.sleep(0.1)
+		await asyncio.gather(*(playGame(client, move, stop, moves, i) for client in clients))
+
+
+async def runPairs(N, port, web, move, duration):
+	"""Run N pairs of players during duration seconds, returns the number of moves per second"""
+	stop = asyncio.Event()
+	moves = [0] * N
+	tasks = [asyncio.ensure_future(pair(i, port, web, move, stop, moves)) for i in range(N)]
+	await asyncio.sleep(2)      # warm up
+	m0, t0 = sum(moves), time.time()
+	await asyncio.sleep(duration)
+	m1, t1 = sum(moves), time.time()
+	stop.set()
+	for task in tasks:
+		task.cancel()
+	return (m1 - m0) / (t1 - t0)
+
+
+if __name__ == "__main__":
+	args = docopt(usage)
+	port, web = int(args['--port']), int(args['--web'])
+	print("%s pairs of players, %ss per test" % (args['--nb'], args['--duration']))
+	print("%-10s %12s" % ("workers", "moves/s"))
+	for nbWorkers in args['--workers'].split(','):
+		cmd = [sys.executable, 'runCGS.py', args['--game'], '--dev', '--no-email', '--workers=' + nbWorkers,
+		       '-p', str(port), '-w', str(web), '--log=logs/bench/']
+		server = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+		try:
+			waitForPort(port)
+			waitForPort(web)
+			rate = asyncio.run(runPairs(int(args['--nb']), port, web, args['--move'], float(args['--duration'])))
+			print("%-10s %12.0f" % (nbWorkers, rate))
+		finally:
+			server.terminate()
+			server.wait()
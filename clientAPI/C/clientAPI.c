@@ -25,11 +25,14 @@ Copyright 2016-2017 T. Hilaire, J. Brajard
 
 #include <netdb.h>
 #include <netinet/in.h>
+#include <sys/socket.h>
+#include <sys/un.h>
 
 #include <string.h>
 #include <unistd.h>
 #include <stdarg.h>
 #include <strings.h>
+#include <zlib.h>
 
 #include "clientAPI.h"
 
@@ -37,8 +40,16 @@ Copyright 2016-2017 T. Hilaire, J. Brajard
 
 
 #define HEAD_SIZE 4 /*number of bytes to code the size of the message (header)*/
+#define LARGE_HEAD_SIZE 8 /* number of bytes of the header of the compressed messages (text protocol) */
 #define MAX_LENGTH 1000 /* maximum size of the buffer expect for print_Game */
 
+/* binary protocol (v2): opcodes of the commands, and kinds of game data */
+#define NB_OPCODES 9
+#define PLAY_MOVE_OPCODE 5
+#define PLAY_AND_WAIT_OPCODE 8
+#define BITMAP_DATA 1
+const char* opcodes[NB_OPCODES] = {"", "CLIENT_NAME", "WAIT_GAME", "GET_GAME_DATA", "GET_MOVE", "PLAY_MOVE", "DISP_GAME", "SEND_COMMENT", "PLAY_AND_WAIT"};
+
 /* global variables about the connection
  * we use them just to hide all the connection details to the user
  * so no need to know about them, or give them when we use the functions of this API
@@ -48,6 +59,15 @@ char buffer[MAX_LENGTH];		/* global buffer used to send message (global so that
 int debug=1;			        /* debug constant; we do not use here a #DEFINE, since it allows the client to declare 'extern int debug;' set it to 1 to have debug information, without having to re-compile labyrinthAPI.c */
 char stream_size[HEAD_SIZE] ;
 char playerName[20];            /* name of the player, stored to display it in debug */
+int protocol=1;                 /* version of the protocol asked to the server (1: text, 2: binary); as for debug, the client can declare 'extern int protocol;' and set it to 2 before connecting */
+int activeProtocol=1;           /* version of the protocol used by the connection (the protocol asked is used after CLIENT_NAME) */
+int incrementalDisplay=0;       /* if 1, printGame only receives the lines of the display that have changed (and rebuilds the display locally); as for debug, the client can declare 'extern int incrementalDisplay;' and set it to 1 */
+char** frameLines = NULL;       /* lines of the last display received by printGame (with incrementalDisplay) */
+size_t nbFrameLines = 0;        /* number of lines of frameLines */
+int compression=0;              /* if 1, the game data and the displays are compressed (deflate) by the server; as for debug, the client can declare 'extern int compression;' and set it to 1 before connecting */
+z_stream inflateStream;         /* decompression context (one deflate stream for the whole connection) */
+int askTimesLeft=0;             /* if 1, the server sends the time left with the moves of the opponent (in timesLeft); as for debug, the client can declare 'extern int askTimesLeft;' and set it to 1 before connecting */
+int timesLeft[2] = {-1, -1};    /* time (in ms) left to the player and to its opponent, after the last move of the opponent (the time left on their clocks when the game has a clock, the timeout of the game otherwise); the client can declare 'extern int timesLeft[2];' */
 
 
 
@@ -94,6 +114,53 @@ void dispDebug(const char* fct, int level, const char* msg, ...)
 	}
 }
 
+/* Read exactly n bytes from the socket (read may return less bytes than asked)
+ * Parameters:
+ * - fct : name of the calling function
+ * - buf: buffer to fill
+ * - n: number of bytes to read
+ */
+void read_all(const char *fct, char *buf, size_t n){
+	while (n > 0) {
+		int r = read(sockfd, buf, n);
+		if (r <= 0)
+			dispError(fct, "Cannot read message (server has failed?)");
+		buf += r;
+		n -= r;
+	}
+}
+
+
+/* Read the length of the next message (the header)
+ * Parameters:
+ * - fct : name of the calling function
+ *
+ * Return the length of the message
+ * (HEAD_SIZE digits with the text protocol, a varint with the binary protocol)
+ */
+size_t read_length(const char *fct){
+	size_t length = 0;
+	if (activeProtocol == 1) {
+		bzero(stream_size, HEAD_SIZE);
+		read_all(fct, stream_size, HEAD_SIZE);
+		if (sscanf(stream_size, "%4lu", &length) != 1)
+			dispError (fct, "Cannot read message's length (server has failed?)");
+	}
+	else {
+		/* varint: 7 bits per byte, least significant group first */
+		unsigned char c;
+		int shift = 0;
+		do {
+			read_all(fct, (char*) &c, 1);
+			length |= (size_t) (c & 0x7F) << shift;
+			shift += 7;
+		} while ((c & 0x80) && shift < 28);
+	}
+	dispDebug (fct, 3, "prepare to receive a message of length :%lu",length);
+	return length;
+}
+
+
 /* Read the message and fill the buffer
 * Parameters:
 * - fct : name of the calling function
@@ -104,30 +171,152 @@ void dispDebug(const char* fct, int level, const char* msg, ...)
 * !FIXME: if allocated memory for buf is < MAX_LENGTH, leads to memory fault
 */
 int read_inbuf(const char *fct, char *buf, size_t nbuf){
-	static char stream_size[HEAD_SIZE];/* size of the message to be receivied, static to avoid allocate memory at each call*/
-	int r;
 	static size_t length=0 ; // static because some length has to be read again
-	if (!length)  {
-		bzero(stream_size,HEAD_SIZE);
-		r = read(sockfd, stream_size, HEAD_SIZE);
-		if (r < 0)
-			dispError (fct, "Cannot read message's length (server has failed?)");
-		r = sscanf (stream_size, "%lu", &length);
-		if (r != 1)
-			dispError (fct, "Cannot read message's length (server has failed?)");
-		dispDebug (fct, 3, "prepare to receive a message of length :%lu",length);
-	}
+	if (!length)
+		length = read_length(fct);
 	int mini = length > nbuf ? nbuf: length;
 	bzero(buf, nbuf);
-	r = read(sockfd, buf, mini);
-	if (r < 0)
-		dispError(fct, "Cannot read message (called by : %s)");
-  
+	read_all(fct, buf, mini);
+
 	length -= mini; // length to be read again
 	return length;
 }
 
 
+/* Read a whole binary message (binary protocol) in the buffer
+* Parameters:
+* - fct : name of the calling function
+* - buf: pointer to the buffer variable (already allocated)
+* - nbuf : size of the buffer
+*
+* Return the length of the message
+*/
+int read_binary(const char *fct, char *buf, size_t nbuf){
+	size_t length = read_length(fct);
+	if (length > nbuf)
+		dispError(fct, "Message too long (%lu bytes)", length);
+	read_all(fct, buf, length);
+	return length;
+}
+
+
+/* Read a return code (an integer)
+* Parameters:
+* - fct : name of the calling function
+*
+* Return the return code
+*/
+t_return_code read_return_code(const char *fct){
+	t_return_code result;
+	if (activeProtocol == 1) {
+		int r = read_inbuf(fct, buffer, MAX_LENGTH);
+		if (r > 0)
+			dispError( fct, "Too long return code");
+		sscanf( buffer, "%d", (int*) &result);
+	}
+	else {
+		if (read_binary(fct, buffer, MAX_LENGTH) != 1)
+			dispError( fct, "Invalid return code");
+		result = (signed char) buffer[0];
+	}
+	dispDebug(fct, 2, "Receive that return code: %d", result);
+	return result;
+}
+
+
+/* Read the time left (in ms) to the player and to its opponent, in timesLeft (only if askTimesLeft is set)
+* Parameters:
+* - fct : name of the calling function
+*/
+void read_times_left(const char *fct){
+	if (!askTimesLeft)
+		return;
+	int r = read_inbuf(fct, buffer, MAX_LENGTH);
+	if (r > 0 || sscanf(buffer, "%d %d", &timesLeft[0], &timesLeft[1]) != 2)
+		dispError( fct, "Invalid time left");
+	dispDebug(fct, 2, "Receive the time left: %d ms (opponent: %d ms)", timesLeft[0], timesLeft[1]);
+}
+
+
+/* Read a move (a string, or a sequence of 16-bit integers with the binary protocol)
+* Parameters:
+* - fct : name of the calling function
+* - move: string filled with the move (like "3 5")
+* - nmove : size of the string
+*/
+void read_move(const char *fct, char *move, size_t nmove){
+	if (activeProtocol == 1) {
+		int r = read_inbuf(fct,move, nmove);
+		if (r>0)
+			dispError( fct, "too long move");
+	}
+	else {
+		/* the move is a sequence of 16-bit integers, converted in a string "%d %d ..." */
+		int n = read_binary(fct, buffer, MAX_LENGTH);
+		size_t len = 0;
+		bzero(move, nmove);
+		for (int i = 0; i + 1 < n; i += 2) {
+			short v = (short) (((unsigned char) buffer[i] << 8) | (unsigned char) buffer[i+1]);
+			len += snprintf(move + len, nmove - len, i ? " %d" : "%d", v);
+			if (len >= nmove)
+				dispError( fct, "too long move");
+		}
+	}
+	dispDebug(fct,1, "Receive that move:%s", move);
+}
+
+
+/* Encode a text command (like "PLAY_MOVE 2 3") for the binary protocol
+ * (opcode, followed by the arguments, or by the values of the move as 16-bit integers for PLAY_MOVE and
+ * PLAY_AND_WAIT; for PLAY_AND_WAIT, the move is preceded by a byte that indicates if the display is asked)
+ * Parameters:
+ * - fct : name of the calling function
+ * - cmd : the text command
+ * - out : buffer to fill
+ * - nout : size of the buffer
+ *
+ * Return the length of the encoded command
+ */
+int encode_binary_command(const char *fct, const char *cmd, unsigned char *out, size_t nout){
+	size_t n = strcspn(cmd, " ");
+	int op = 1;
+	while (op < NB_OPCODES && (strlen(opcodes[op]) != n || strncmp(cmd, opcodes[op], n)))
+		op++;
+	if (op == NB_OPCODES)
+		dispError(fct, "Unknown command '%s'", cmd);
+	const char *args = cmd[n] ? cmd + n + 1 : cmd + n;
+
+	size_t len = 0;
+	out[len++] = op;
+	if (op == PLAY_AND_WAIT_OPCODE) {
+		int display = strncmp(args, "DISP ", 5) == 0;
+		out[len++] = display;
+		if (display)
+			args += 5;
+	}
+	if (op == PLAY_MOVE_OPCODE || op == PLAY_AND_WAIT_OPCODE) {
+		/* the move is a sequence of integers */
+		char *end;
+		long v = strtol(args, &end, 10);
+		while (end != args) {
+			if (len + 2 > nout)
+				dispError(fct, "The move is too long");
+			out[len++] = (v >> 8) & 0xFF;
+			out[len++] = v & 0xFF;
+			args = end;
+			v = strtol(args, &end, 10);
+		}
+	}
+	else {
+		if (len + strlen(args) > nout)
+			dispError(fct, "The command is too long");
+		memcpy(out + len, args, strlen(args));
+		len += strlen(args);
+	}
+	return len;
+}
+
+
 /* Send a string through the open socket and get acknowledgment (OK)
  * Manage connection problems
  *
@@ -139,15 +328,40 @@ int read_inbuf(const char *fct, char *buf, size_t nbuf){
 void sendString(const char* fct, const char* str, ...) {
 	va_list args;
 	va_start(args, str);
+	char cmd[MAX_LENGTH];
+	int len = vsnprintf(cmd, MAX_LENGTH, str, args);
+	va_end(args);
+	if (len >= MAX_LENGTH - HEAD_SIZE)
+		dispError( fct, "The command is too long (%d characters)", len);
 	bzero(buffer, MAX_LENGTH);
-	vsprintf(buffer, str, args);
+	if (activeProtocol == 1) {
+		/* the command is preceded by its size (HEAD_SIZE digits), so that the server can separate the commands */
+		char head[HEAD_SIZE+1];
+		sprintf(head, "%0*d", HEAD_SIZE, len);
+		memcpy(buffer, head, HEAD_SIZE);
+		memcpy(buffer + HEAD_SIZE, cmd, len);
+		len += HEAD_SIZE;
+	}
+	else {
+		/* binary command, preceded by its size (varint) */
+		unsigned char payload[MAX_LENGTH];
+		int n = encode_binary_command(fct, cmd, payload, MAX_LENGTH - HEAD_SIZE);
+		int m = n;
+		len = 0;
+		do {
+			buffer[len++] = (m & 0x7F) | (m >= 0x80 ? 0x80 : 0);
+			m >>= 7;
+		} while (m > 0);
+		memcpy(buffer + len, payload, n);
+		len += n;
+	}
 	/* check if the socket is open */
 	if (sockfd < 0)
 		dispError( fct, "The connection to the server is not established. Call 'connectToServer' before !");
 
 	/* send our message */
-	int r = write(sockfd, buffer, strlen(buffer));
-	dispDebug(fct,2, "Send '%s' to the server", buffer);
+	int r = write(sockfd, buffer, len);
+	dispDebug(fct,2, "Send '%s' to the server", cmd);
 	if (r < 0)
 		dispError(fct, "Cannot write to the socket (%s)", buffer);
 
@@ -173,12 +387,14 @@ void sendString(const char* fct, const char* str, ...) {
  * Parameters:
  * - fct: name of the function that calls connectToCGS (used for the logging)
  * - serverName: (string) address of the server (it could be "localhost" if the server is run in local, or "pc4521.polytech.upmc.fr" if the server runs there)
- * - port: (int) port number used for the connection
+ *   or "unix:<path>" to connect to the Unix domain socket <path> of a server run on the same host
+ * - port: (int) port number used for the connection (not used with a Unix domain socket)
  * - name: (string) name of the bot : max 20 characters (checked by the server)
  */
 void connectToCGS( const char* fct, char* serverName, int port, char* name)
 {
 	struct sockaddr_in serv_addr;
+	struct sockaddr_un unix_addr;
 	struct hostent *server;
 
 	/* copy the name */
@@ -186,30 +402,69 @@ void connectToCGS( const char* fct, char* serverName, int port, char* name)
 
 	dispDebug( fct,2, "Initiate connection with %s (port: %d)", serverName, port);
 
-	/* Create a socket point, TCP/IP protocol, connected */
-	sockfd = socket(AF_INET, SOCK_STREAM, 0);
-	if (sockfd < 0)
-		dispError( fct, "Impossible to open socket");
-
-	/* Get the server */
-	server = gethostbyname(serverName);
-	if (server == NULL)
-		dispError( fct, "Unable to find the server by its name");
-	dispDebug( fct,1, "Open connection with the server %s", serverName);
-
-	/* Allocate sockaddr */
-	bzero((char *) &serv_addr, sizeof(serv_addr));
-	serv_addr.sin_family = AF_INET;
-	bcopy((char *)server->h_addr, (char *)&serv_addr.sin_addr.s_addr, server->h_length);
-	serv_addr.sin_port = htons(port);
-
-	/* Now connect to the server */
-	if (connect(sockfd, (struct sockaddr*)&serv_addr, sizeof(serv_addr)) < 0)
-		dispError( fct, "Connection to the server '%s' on port %d impossible.", serverName, port);
-
-	/* Sending our name */
-	sendString( fct, "CLIENT_NAME %s",name);
+	if (strncmp(serverName, "unix:", 5) == 0)
+	{
+		/* Create a Unix domain socket, connected */
+		sockfd = socket(AF_UNIX, SOCK_STREAM, 0);
+		if (sockfd < 0)
+			dispError( fct, "Impossible to open socket");
+
+		/* Allocate sockaddr */
+		if (strlen(serverName + 5) >= sizeof(unix_addr.sun_path))
+			dispError( fct, "The path of the Unix socket '%s' is too long", serverName + 5);
+		bzero((char *) &unix_addr, sizeof(unix_addr));
+		unix_addr.sun_family = AF_UNIX;
+		strcpy(unix_addr.sun_path, serverName + 5);
+		dispDebug( fct,1, "Open connection with the server %s", serverName);
+
+		/* Now connect to the server */
+		if (connect(sockfd, (struct sockaddr*)&unix_addr, sizeof(unix_addr)) < 0)
+			dispError( fct, "Connection to the server '%s' impossible.", serverName);
+	}
+	else
+	{
+		/* Create a socket point, TCP/IP protocol, connected */
+		sockfd = socket(AF_INET, SOCK_STREAM, 0);
+		if (sockfd < 0)
+			dispError( fct, "Impossible to open socket");
+
+		/* Get the server */
+		server = gethostbyname(serverName);
+		if (server == NULL)
+			dispError( fct, "Unable to find the server by its name");
+		dispDebug( fct,1, "Open connection with the server %s", serverName);
+
+		/* Allocate sockaddr */
+		bzero((char *) &serv_addr, sizeof(serv_addr));
+		serv_addr.sin_family = AF_INET;
+		bcopy((char *)server->h_addr, (char *)&serv_addr.sin_addr.s_addr, server->h_length);
+		serv_addr.sin_port = htons(port);
+
+		/* Now connect to the server */
+		if (connect(sockfd, (struct sockaddr*)&serv_addr, sizeof(serv_addr)) < 0)
+			dispError( fct, "Connection to the server '%s' on port %d impossible.", serverName, port);
+	}
 
+	/* Sending our name (and the version of the protocol we want to use, if it's not the text protocol,
+	 and if we want the compression and the time left) */
+	char options[50] = "";
+	if (protocol != 1)
+		sprintf(options, " PROTOCOL=%d", protocol);
+	if (compression)
+		strcat(options, " COMPRESS=1");
+	if (askTimesLeft)
+		strcat(options, " CLOCK=1");
+	activeProtocol = 1;
+	sendString( fct, "CLIENT_NAME %s%s", name, options);
+	activeProtocol = protocol;
+
+	/* prepare the decompression (raw deflate stream, without zlib header) */
+	if (compression) {
+		inflateEnd(&inflateStream);
+		bzero(&inflateStream, sizeof(inflateStream));
+		if (inflateInit2(&inflateStream, -15) != Z_OK)
+			dispError( fct, "Cannot initialize the decompression");
+	}
 
 }
 
@@ -226,6 +481,8 @@ void closeCGSConnection( const char* fct)
 	if (sockfd<0)
 		dispError( fct,"The connection to the server is not established. Call 'connectToServer' before !");
 	close(sockfd);
+	if (compression)
+		inflateEnd(&inflateStream);
 }
 
 
@@ -290,6 +547,113 @@ void waitForGame( const char* fct, char* gameType, char* gameName, char* data)
 
 
 
+/* Read a whole message (of any size), used for the large messages (game data and display)
+* With compression, these messages are compressed: their size is given with LARGE_HEAD_SIZE digits (text protocol),
+* and they are decompressed (the deflate stream continues from a message to the next one)
+* Parameters:
+* - fct : name of the calling function
+* - length : filled with the length of the message (may be NULL)
+*
+* Return the message (null-terminated string, allocated with malloc: it should be freed by the caller)
+*/
+char* read_message(const char *fct, size_t* length){
+	size_t n;
+	if (compression && activeProtocol == 1) {
+		char head[LARGE_HEAD_SIZE+1];
+		bzero(head, LARGE_HEAD_SIZE+1);
+		read_all(fct, head, LARGE_HEAD_SIZE);
+		if (sscanf(head, "%8lu", &n) != 1)
+			dispError (fct, "Cannot read message's length (server has failed?)");
+	}
+	else
+		n = read_length(fct);
+	char* msg = (char*) malloc(n + 1);
+	if (msg == NULL)
+		dispError(fct, "Not enough memory to read a message of %lu bytes", n);
+	read_all(fct, msg, n);
+
+	if (compression) {
+		/* decompress the message (in a buffer that grows if necessary) */
+		size_t size = 4 * n + 64, len = 0;
+		char* out = (char*) malloc(size);
+		inflateStream.next_in = (Bytef*) msg;
+		inflateStream.avail_in = n;
+		do {
+			if (size - len < 64)
+				out = (char*) realloc(out, size *= 2);
+			if (out == NULL)
+				dispError(fct, "Not enough memory to decompress a message");
+			inflateStream.next_out = (Bytef*) (out + len);
+			inflateStream.avail_out = size - len - 1;
+			int z = inflate(&inflateStream, Z_SYNC_FLUSH);
+			if (z != Z_OK && z != Z_BUF_ERROR)
+				dispError(fct, "Cannot decompress the message (%s)", inflateStream.msg ? inflateStream.msg : "");
+			len = size - 1 - inflateStream.avail_out;
+		} while (inflateStream.avail_in > 0 || inflateStream.avail_out == 0);
+		dispDebug(fct, 3, "decompress a message of length %lu in %lu bytes", n, len);
+		free(msg);
+		msg = out;
+		n = len;
+	}
+	msg[n] = 0;
+	if (length)
+		*length = n;
+	return msg;
+}
+
+
+
+/* -------------------------------------
+ * Get the game data and tell who starts, with the binary protocol
+ * The game data are converted in the same string as with the text protocol
+ * (a bitmap is converted in a string of '0' and '1')
+ *
+ * Parameters:
+ * - fct: name of the function that calls gameGetData (used for the logging)
+ * - data: the array of game (the pointer data MUST HAVE allocated with the right size !!)
+ *
+ * Returns 0 if the client begins, or 1 if the opponent begins
+ */
+int getBinaryGameData(const char* fct, char* data, size_t ndata)
+{
+	/* read the game data */
+	size_t length;
+	unsigned char* raw = (unsigned char*) read_message(fct, &length);
+	if (length == 0)
+		dispError( fct, "Invalid game data");
+
+	bzero(data, ndata);
+	if (raw[0] == BITMAP_DATA) {
+		/* number of bits (varint), and then the bits */
+		size_t nbits = 0, pos = 1;
+		int shift = 0;
+		do {
+			nbits |= (size_t) (raw[pos] & 0x7F) << shift;
+			shift += 7;
+		} while ((raw[pos++] & 0x80) && pos < length);
+		if (nbits >= ndata || pos + (nbits + 7) / 8 > length)
+			dispError( fct, "too long answer from 'GET_GAME_DATA' command");
+		for (size_t i = 0; i < nbits; i++)
+			data[i] = '0' + ((raw[pos + i / 8] >> (7 - i % 8)) & 1);
+	}
+	else {
+		if (length - 1 >= ndata)
+			dispError( fct, "too long answer from 'GET_GAME_DATA' command");
+		memcpy(data, raw + 1, length - 1);
+	}
+	free(raw);
+	dispDebug( fct,2, "Receive game's data:%s", data);
+
+	/* read if we begin (0) or if the opponent begins (1) */
+	if (read_binary(fct, buffer, MAX_LENGTH) != 1)
+		dispError(fct, "Invalid answer from 'GET_GAME_DATA'");
+	dispDebug(fct,2, "Receive these player who begins=%d", buffer[0]);
+
+	return buffer[0];
+}
+
+
+
 /* -------------------------------------
  * Get the game data and tell who starts
  * It fills the char* data with the data of the game (it will be parsed by the caller)
@@ -305,17 +669,24 @@ int getGameData(const char* fct, char* data, size_t ndata)
 {
 	sendString(fct, "GET_GAME_DATA");
 
+	if (activeProtocol == 2)
+		return getBinaryGameData(fct, data, ndata);
+
 	/* read game data */
-	int r = read_inbuf(fct, data, ndata);
-	if (r > 0)
+	size_t length;
+	char* msg = read_message(fct, &length);
+	if (length > ndata)
 		dispError( fct, "too long answer from 'GET_GAME_DATA' command");
+	bzero(data, ndata);
+	memcpy(data, msg, length);
+	free(msg);
 
 	dispDebug( fct,2, "Receive game's data:%s", data);
 
 
 	/* read if we begin (0) or if the opponent begins (1) */
 	bzero(buffer,1000);
-	r = read_inbuf(fct,buffer,MAX_LENGTH);
+	int r = read_inbuf(fct,buffer,MAX_LENGTH);
 	if (r > 0)
 		dispError(fct, "too long answer from 'GET_GAME_DATA' ");
 
@@ -326,6 +697,7 @@ int getGameData(const char* fct, char* data, size_t ndata)
 
 
 
+
 /* ----------------------
  * Get the opponent move
  *
@@ -335,6 +707,7 @@ int getGameData(const char* fct, char* data, size_t ndata)
  *
  * Fill the move and returns a return_code (0 for normal move, 1 for a winning move, -1 for a losing (or illegal) move)
  * this code is relative to the opponent (+1 if HE wins, ...)
+ * (the time left is then in timesLeft, if askTimesLeft is set)
  */
 t_return_code getCGSMove( const char* fct, char* move ,size_t nmove)
 {
@@ -342,21 +715,14 @@ t_return_code getCGSMove( const char* fct, char* move ,size_t nmove)
 	sendString( fct, "GET_MOVE");
 
 	/* read move */
-	int r = read_inbuf(fct,move, nmove);
-	if (r>0)
-		dispError( fct, "too long answer from 'GET_MOVE' command");
-	dispDebug(__FUNCTION__,1, "Receive that move:%s", move);
+	read_move(fct, move, nmove);
 
 	/* read the return code*/
-	//bzero(buffer,1000);
-	r = read_inbuf(fct,buffer, MAX_LENGTH);
-	if (r>0)
-		dispError( fct, "Too long answer from 'GET_MOVE' command");
-	dispDebug(__FUNCTION__,2, "Receive that return code:%s", buffer);
-
-	/* extract result */
-	sscanf( buffer, "%d", &result);
+	result = read_return_code(fct);
 	dispDebug(__FUNCTION__,2,"results=%d",result);
+
+	/* read the time left */
+	read_times_left(fct);
 	return result;
 }
 
@@ -378,19 +744,11 @@ t_return_code sendCGSMove( const char* fct, char* move)
 
 
 	/* read return code */
-	//bzero(buffer,1000);
-	int r = read_inbuf(fct,buffer,MAX_LENGTH);
-	if (r>0)
-		dispError( fct, "Too long answer from 'PLAY_MOVE' command");
-
-	dispDebug( fct,2, "Receive that return code: %s", buffer);
-
-	/* extract result */
-	sscanf( buffer, "%d", &result);
+	result = read_return_code(fct);
 
 	/* read the associated message */
 	//bzero(buffer,1000);
-	r = read_inbuf(fct,buffer,MAX_LENGTH);
+	int r = read_inbuf(fct,buffer,MAX_LENGTH);
 	if (r>0)
 		dispError( fct, "Too long answer from 'PLAY_MOVE' command ");
 
@@ -405,9 +763,139 @@ t_return_code sendCGSMove( const char* fct, char* move)
 
 
 
+/* -----------
+ * Send a move, and then wait for the move of the opponent (in one command, PLAY_AND_WAIT)
+ * (same as sendCGSMove followed by getCGSMove, but with only one round trip)
+ *
+ * Parameters:
+ * - fct: name of the function that calls playAndWaitCGSMove (used for the logging)
+ * - move: a string representing our move
+ * - opponentMove: string filled with the move of the opponent (only if our move is a normal move)
+ * - nmove: size of the string opponentMove
+ * - opponentResult: filled with the return_code of the opponent's move, relative to the opponent
+ *                   (NORMAL_MOVE if our move has ended the game)
+ * - display: if not 0, the game is displayed after the opponent's move (as with printGame)
+ * (the time left is then in timesLeft, if askTimesLeft is set)
+ *
+ * Returns the return_code of our move (0 for normal move, 1 for a winning move, -1 for a losing (or illegal) move)
+ */
+t_return_code playAndWaitCGSMove( const char* fct, char* move, char* opponentMove, size_t nmove, t_return_code* opponentResult, int display)
+{
+	t_return_code result;
+	if (display)
+		sendString( fct, "PLAY_AND_WAIT DISP %s", move);
+	else
+		sendString( fct, "PLAY_AND_WAIT %s", move);
+
+	/* read our return code and the associated message */
+	result = read_return_code(fct);
+	int r = read_inbuf(fct,buffer,MAX_LENGTH);
+	if (r>0)
+		dispError( fct, "Too long answer from 'PLAY_AND_WAIT' command ");
+	dispDebug( fct,1, "Receive that message: %s", buffer);
+
+	/* read the move of the opponent and its return code (if the game continues) */
+	bzero(opponentMove, nmove);
+	*opponentResult = NORMAL_MOVE;
+	if (result == NORMAL_MOVE) {
+		read_move(fct, opponentMove, nmove);
+		*opponentResult = read_return_code(fct);
+		read_times_left(fct);
+	}
+
+	/* display the game */
+	if (display) {
+		char* msg = read_message(fct, NULL);
+		printf("%s", msg);
+		free(msg);
+	}
+
+	return result;
+}
+
+
+
+/* Change the number of lines of the display (frameLines)
+ * Parameters:
+ * - fct : name of the calling function
+ * - n : new number of lines (the new lines are empty)
+ */
+void resizeFrame(const char *fct, size_t n){
+	for (size_t i = n; i < nbFrameLines; i++)
+		free(frameLines[i]);
+	frameLines = (char**) realloc(frameLines, (n + 1) * sizeof(char*));
+	if (frameLines == NULL)
+		dispError(fct, "Not enough memory for the display");
+	for (size_t i = nbFrameLines; i < n; i++)
+		frameLines[i] = NULL;
+	nbFrameLines = n;
+}
+
+
+/* Change a line of the display (frameLines)
+ * Parameters:
+ * - fct : name of the calling function
+ * - i : index of the line
+ * - line : the new line (not null-terminated)
+ * - len : length of the line
+ */
+void setFrameLine(const char *fct, size_t i, const char* line, size_t len){
+	if (i >= nbFrameLines)
+		dispError(fct, "Invalid display sent by the server (line %lu)", i);
+	free(frameLines[i]);
+	frameLines[i] = strndup(line, len);
+}
+
+
+/* Update the display (frameLines) with the answer of the server to "DISP_GAME DIFF"
+ * The answer is "F<display>" (whole display), or "D<number of lines>\n" followed by "<index> <line>\n"
+ * for each line that has changed
+ * Parameters:
+ * - fct : name of the calling function
+ * - msg : the answer of the server
+ */
+void updateFrame(const char *fct, const char* msg){
+	const char *p, *end;
+	if (msg[0] == 'F') {
+		/* whole display: cut it in lines */
+		size_t n = 1;
+		for (p = msg + 1; *p; p++)
+			n += (*p == '\n');
+		resizeFrame(fct, n);
+		p = msg + 1;
+		for (size_t i = 0; i < n; i++) {
+			end = strchr(p, '\n');
+			if (end == NULL)
+				end = p + strlen(p);
+			setFrameLine(fct, i, p, end - p);
+			p = end + 1;
+		}
+	}
+	else if (msg[0] == 'D') {
+		/* only the lines that have changed */
+		char *next;
+		resizeFrame(fct, strtoul(msg + 1, &next, 10));
+		if (*next != '\n')
+			dispError(fct, "Invalid display sent by the server");
+		p = next + 1;
+		while (*p) {
+			size_t i = strtoul(p, &next, 10);
+			end = strchr(next, '\n');
+			if (*next != ' ' || end == NULL)
+				dispError(fct, "Invalid display sent by the server");
+			setFrameLine(fct, i, next + 1, end - next - 1);
+			p = end + 1;
+		}
+	}
+	else
+		dispError(fct, "Invalid display sent by the server");
+}
+
+
 /* ----------------------
  * Display the game
  * in a pretty way (ask the server what to print)
+ * With incrementalDisplay, the server only sends the lines that have changed since the last display
  *
  * Parameters:
  * - fct: name of the function that calls sendCGSMove (used for the logging)
@@ -416,16 +904,24 @@ void printGame( const char* fct)
 {
   dispDebug( fct,2, "Try to get string to display Game");
 
+	if (incrementalDisplay) {
+		/* get the lines that have changed, and display the whole game */
+		sendString( fct, "DISP_GAME DIFF");
+		char* msg = read_message(fct, NULL);
+		updateFrame(fct, msg);
+		free(msg);
+		for (size_t i = 0; i < nbFrameLines; i++)
+			printf(i + 1 < nbFrameLines ? "%s\n" : "%s", frameLines[i] ? frameLines[i] : "");
+		return;
+	}
+
 	/* send command */
 	sendString( fct, "DISP_GAME");
 
 	/* get string to print */
-	//char buffer[1000];
-	int r ;
-	do {
-	  r = read_inbuf(fct,buffer,MAX_LENGTH);
-	  printf("%s",buffer);
-	} while(r>0);
+	char* msg = read_message(fct, NULL);
+	printf("%s", msg);
+	free(msg);
 }
 
 
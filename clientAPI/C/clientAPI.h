@@ -53,10 +53,13 @@ void dispDebug(const char* fct,int level, const char* msg, ...);
 /* -------------------------------------
  * Initialize connection with the server
  * Quit the program if the connection to the server cannot be established
+ * If the global variable compression is set to 1 ('extern int compression;'), the server compresses the game data
+ * and the displays (the client is then linked with zlib, -lz)
  *
  * Parameters:
  * - fct: name of the function that calls connectToCGS (used for the logging)
  * - serverName: (string) address of the server (it could be "localhost" if the server is run in local, or "pc4521.polytech.upmc.fr" if the server runs there)
+ *   or "unix:<path>" to connect to the Unix domain socket <path> of a server run on the same host
  * - port: (int) port number used for the connection
  * - name: (string) name of the bot : max 20 characters (checked by the server)
  */
@@ -130,6 +133,8 @@ int getGameData( const char* fct, char* data, size_t ndata);
  * - nmove : maximum size of the string representing the move  
  * Fill the move and returns a return_code (0 for normal move, 1 for a winning move, -1 for a losing (or illegal) move)
  * this code is relative to the opponent (+1 if HE wins, ...)
+ * If the global variable askTimesLeft is set to 1 before connecting ('extern int askTimesLeft;'), the time (in ms) left
+ * to the player and to its opponent is then in the global variable timesLeft ('extern int timesLeft[2];')
  */
 t_return_code getCGSMove( const char* fct, char* move, size_t nmove );
 
@@ -148,9 +153,30 @@ t_return_code sendCGSMove( const char* fct, char* move);
 
 
 
+/* -----------
+ * Send a move, and then wait for the move of the opponent (in one command)
+ *
+ * Parameters:
+ * - fct: name of the function that calls playAndWaitCGSMove (used for the logging)
+ * - move: a string representing our move
+ * - opponentMove: string filled with the move of the opponent (only if our move is a normal move)
+ * - nmove: size of the string opponentMove
+ * - opponentResult: filled with the return_code of the opponent's move, relative to the opponent
+ *                   (NORMAL_MOVE if our move has ended the game)
+ * - display: if not 0, the game is displayed after the opponent's move
+ * (the time left is then in timesLeft, if askTimesLeft is set, see getCGSMove)
+ *
+ * Returns the return_code of our move (0 for normal move, 1 for a winning move, -1 for a losing (or illegal) move)
+ */
+t_return_code playAndWaitCGSMove( const char* fct, char* move, char* opponentMove, size_t nmove, t_return_code* opponentResult, int display);
+
+
+
 /* ----------------------
  * Display the game
  * in a pretty way (ask the server what to print)
+ * If the global variable incrementalDisplay is set to 1 ('extern int incrementalDisplay;'), the server only sends
+ * the lines that have changed since the last display (the display is rebuilt locally)
  *
  * Parameters:
  * - fct: name of the function that calls sendCGSMove (used for the logging)
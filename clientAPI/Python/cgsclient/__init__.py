@@ -0,0 +1,9 @@
+"""
+asyncio client of the Coding Game Server (see clientAPI/Python/README.md)
+Import the different classes of the client (Client, CGSError, and the clients of the games: LabyrinthClient,
+NetworksClient and StarshipsClient) and the return codes
+"""
+from cgsclient.client import Client, CGSError, NORMAL_MOVE, WINNING_MOVE, LOSING_MOVE
+from cgsclient.labyrinth import LabyrinthClient
+from cgsclient.networks import NetworksClient
+from cgsclient.starships import StarshipsClient
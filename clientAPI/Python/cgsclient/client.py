@@ -0,0 +1,388 @@
+"""
+* --------------------- *
+|                       |
+|   Coding Game Server  |
+|                       |
+* --------------------- *
+
+Authors: T. Hilaire, J. Brajard
+Licence: GPL
+
+File: client.py
+	Contains the class Client
+	-> asyncio client of the Coding Game Server, with the same functions as clientAPI/C/clientAPI.c
+	(see doc/Protocol.md), for the text and the binary protocols, with or without compression
+	-> all the exchanges with the server are coroutines, so one event loop can run hundreds of clients (bots) at once
+
+Copyright 2016-2017 T. Hilaire, J. Brajard
+"""
+
+import asyncio
+import logging
+import socket
+import zlib
+from struct import pack, unpack
+
+# return codes (relative to the player who has played the move)
+NORMAL_MOVE = 0
+WINNING_MOVE = 1
+LOSING_MOVE = -1
+
+# binary protocol (v2): opcodes of the commands, and kind of game data
+OPCODES = {"CLIENT_NAME": 1, "WAIT_GAME": 2, "GET_GAME_DATA": 3, "GET_MOVE": 4, "PLAY_MOVE": 5, "DISP_GAME": 6,
+           "SEND_COMMENT": 7, "PLAY_AND_WAIT": 8}
+BITMAP_DATA = 1
+
+HEAD_SIZE = 4           # number of digits of the size of the messages (text protocol)
+LARGE_HEAD_SIZE = 8     # number of digits of the size of the compressed messages (text protocol)
+
+logger = logging.getLogger('cgsclient')
+
+
+
+class CGSError(Exception):
+	"""Error raised when the server does not accept a command, or answers something unexpected"""
+	pass
+
+
+
+def encodeVarint(n):
+	"""Returns the varint encoding (bytes) of a positive integer (7 bits per byte, least significant group first)"""
+	out = bytearray()
+	while True:
+		b = n & 0x7F
+		n >>= 7
+		if n:
+			out.append(b | 0x80)
+		else:
+			out.append(b)
+			return bytes(out)
+
+
+
+class Client:
+	"""
+	Connection to the Coding Game Server (one object per connection, ie per bot)
+	The moves are strings (like "3 5"); the game classes (see labyrinth.py, etc.) give them a type (Move)
+
+	Class attributes:
+	- Move: class of the moves (built from the string sent by the server with Move.fromString,
+	and sent with str); None for the moves as strings
+
+	Attributes:
+	- name: (string) name of the bot
+	- protocol: (int) version of the protocol asked (1: text, 2: binary)
+	- compression: (bool) True if the game data and the displays are compressed
+	- clock: (bool) True if the server sends the time left with the moves of the opponent
+	- timesLeft: (tuple) time (in ms) left to the bot and to its opponent, after the last move of the opponent (the
+	time left on their clocks when the game has a clock, the timeout of the game otherwise), or None if not asked
+	- _reader, _writer: asyncio streams of the connection
+	- _activeProtocol: (int) version of the protocol used by the connection (the protocol asked is used after
+	CLIENT_NAME)
+	- _inflate: decompression context (one deflate stream for the whole connection)
+	- _frameLines: (list of strings) lines of the last display received with the incremental display
+	"""
+
+	Move = None
+
+
+	def __init__(self, name, protocol=1, compression=False, clock=False):
+		"""
+		Parameters:
+		- name: (string) name of the bot: max 20 characters in [a-zA-Z0-9_] (checked by the server)
+		- protocol: (int) version of the protocol (1: text, 2: binary)
+		- compression: (bool) True to ask the server to compress the game data and the displays
+		- clock: (bool) True to ask the server for the time left with the moves of the opponent (see timesLeft)
+		"""
+		self.name = name
+		self.protocol = protocol
+		self.compression = compression
+		self.clock = clock
+		self.timesLeft = None
+		self._reader = self._writer = None
+		self._activeProtocol = 1
+		self._inflate = None
+		self._frameLines = None
+
+
+	async def connect(self, serverName, port=None):
+		"""
+		Open the connection with the server, and send the name of the bot
+		Parameters:
+		- serverName: (string) address of the server (like "localhost"),
+		or "unix:<path>" to connect to the Unix domain socket <path> of a server run on the same host
+		- port: (int) port number used for the connection (not used with a Unix domain socket)
+		"""
+		logger.debug("[%s] Initiate connection with %s (port: %s)", self.name, serverName, port)
+		if serverName.startswith("unix:"):
+			self._reader, self._writer = await asyncio.open_unix_connection(serverName[5:])
+		else:
+			self._reader, self._writer = await asyncio.open_connection(serverName, port)
+			# the commands are small and sent one by one
+			self._writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+		# send our name (and the version of the protocol, the compression and the clock, if asked)
+		options = ""
+		if self.protocol != 1:
+			options += " PROTOCOL=%d" % self.protocol
+		if self.compression:
+			options += " COMPRESS=1"
+		if self.clock:
+			options += " CLOCK=1"
+		self._activeProtocol = 1
+		await self.sendCommand("CLIENT_NAME %s%s" % (self.name, options))
+		self._activeProtocol = self.protocol
+		self._inflate = zlib.decompressobj(-15) if self.compression else None
+		self._frameLines = None
+
+
+	async def close(self):
+		"""Close the connection to the server (to do, because we are polite)"""
+		if self._writer is None:
+			raise CGSError("The connection to the server is not established. Call 'connect' before !")
+		self._writer.close()
+		await self._writer.wait_closed()
+		self._writer = self._reader = None
+
+
+	async def waitForGame(self, gameType=""):
+		"""
+		Wait for a game, and retrieve its name and its first data (typically, array sizes)
+		Parameters:
+		- gameType: (string) "[TOURNAMENT <name> | TRAINING <name>] {options}" (see waitForGame in clientAPI.c),
+		empty string for a regular game
+		Returns the name of the game and the data (strings)
+		"""
+		await self.sendCommand("WAIT_GAME %s" % gameType)
+		# the server sends "NOT_READY" until the game starts
+		name = await self.readString()
+		while name == "NOT_READY":
+			name = await self.readString()
+		logger.debug("[%s] Receive Game name=%s", self.name, name)
+		data = await self.readString()
+		logger.debug("[%s] Receive Game sizes=%s", self.name, data)
+		return name, data
+
+
+	async def getGameData(self):
+		"""
+		Get the game data and tell who starts
+		Returns the data of the game (string), and 0 if the client begins, or 1 if the opponent begins
+		"""
+		await self.sendCommand("GET_GAME_DATA")
+		data = await self.readLargeMessage()
+		if self._activeProtocol == 1:
+			data = data.decode('utf-8')
+			who = int(await self.readString())
+		else:
+			if data[0] == BITMAP_DATA:
+				# number of bits (varint), and then the bits (most significant bit first)
+				nbits, pos = self.decodeVarint(data, 1)
+				data = "".join("1" if data[pos + i // 8] & (0x80 >> (i % 8)) else "0" for i in range(nbits))
+			else:
+				data = data[1:].decode('utf-8')
+			who = unpack("b", await self.readMessage())[0]
+		logger.debug("[%s] Receive game's data:%s (who begins=%d)", self.name, data, who)
+		return data, who
+
+
+	async def getMove(self):
+		"""
+		Get the move of the opponent
+		Returns the move, and the return code (NORMAL_MOVE, WINNING_MOVE or LOSING_MOVE), relative to the opponent
+		(the time left is then in timesLeft, if asked)
+		"""
+		await self.sendCommand("GET_MOVE")
+		move = await self.readMove()
+		return_code = await self.readReturnCode()
+		await self.readTimesLeft()
+		return move, return_code
+
+
+	async def sendMove(self, move):
+		"""
+		Send a move
+		Returns the return code of the move (relative to the bot), and the associated message
+		(that explains why a move is illegal, for example)
+		"""
+		await self.sendCommand("PLAY_MOVE %s" % (move,))
+		return_code = await self.readReturnCode()
+		return return_code, await self.readString()
+
+
+	async def playAndWait(self, move, display=False):
+		"""
+		Send a move, and then wait for the move of the opponent (in one command, PLAY_AND_WAIT)
+		Parameters:
+		- move: our move
+		- display: (bool) True to also get the display of the game (after the opponent's move)
+		Returns the return code of our move, its message, the move of the opponent and its return code (None and
+		NORMAL_MOVE if our move has ended the game) and the display (or None)
+		(the time left is then in timesLeft, if asked)
+		"""
+		await self.sendCommand("PLAY_AND_WAIT %s%s" % ("DISP " if display else "", move))
+		return_code = await self.readReturnCode()
+		msg = await self.readString()
+		opponentMove, opponentReturnCode = None, NORMAL_MOVE
+		if return_code == NORMAL_MOVE:
+			opponentMove = await self.readMove()
+			opponentReturnCode = await self.readReturnCode()
+			await self.readTimesLeft()
+		disp = (await self.readLargeMessage()).decode('utf-8') if display else None
+		return return_code, msg, opponentMove, opponentReturnCode, disp
+
+
+	async def getDisplay(self, incremental=False):
+		"""
+		Returns the string that displays the game (in a pretty way)
+		Parameters:
+		- incremental: (bool) if True, the server only sends the lines that have changed since the last incremental
+		display ("DISP_GAME DIFF"), and the display is rebuilt locally
+		"""
+		await self.sendCommand("DISP_GAME DIFF" if incremental else "DISP_GAME")
+		display = (await self.readLargeMessage()).decode('utf-8')
+		if not incremental:
+			return display
+		if display.startswith("F"):
+			self._frameLines = display[1:].split("\n")
+		elif display.startswith("D") and self._frameLines is not None:
+			head, _, changes = display.partition("\n")
+			n = int(head[1:])
+			self._frameLines = (self._frameLines + [""] * n)[:n]
+			for line in changes.split("\n")[:-1]:
+				i, _, content = line.partition(" ")
+				self._frameLines[int(i)] = content
+		else:
+			raise CGSError("Invalid display sent by the server")
+		return "\n".join(self._frameLines)
+
+
+	async def printGame(self, incremental=False):
+		"""Display the game (ask the server what to print)"""
+		print(await self.getDisplay(incremental))
+
+
+	async def sendComment(self, comment):
+		"""Send a comment (string, max 100 characters) to the server"""
+		if len(comment) > 100:
+			raise CGSError("The Comment is more than 100 characters.")
+		await self.sendCommand("SEND_COMMENT %s" % comment)
+
+
+	async def sendCommand(self, cmd):
+		"""
+		Send a command (string, like "PLAY_MOVE 3 5") and get the acknowledgment (OK)
+		Raises CGSError if the server does not acknowledge
+		"""
+		if self._writer is None:
+			raise CGSError("The connection to the server is not established. Call 'connect' before !")
+		if self._activeProtocol == 1:
+			data = cmd.encode('utf-8')
+			self._writer.write(b"%0*d" % (HEAD_SIZE, len(data)) + data)
+		else:
+			data = self.encodeBinaryCommand(cmd)
+			self._writer.write(encodeVarint(len(data)) + data)
+		logger.debug("[%s] Send '%s' to the server", self.name, cmd)
+		await self._writer.drain()
+		ack = await self.readString()
+		if ack != "OK":
+			raise CGSError("The server does not acknowledge '%s', but answered: %s" % (cmd, ack))
+
+
+	@staticmethod
+	def encodeBinaryCommand(cmd):
+		"""
+		Encode a text command for the binary protocol: opcode, followed by the arguments, or by the values of the move
+		as 16-bit integers (for PLAY_MOVE and PLAY_AND_WAIT, where the move follows a byte that is 1 if the display
+		is asked)
+		"""
+		name, _, args = cmd.partition(" ")
+		if name not in OPCODES:
+			raise CGSError("Unknown command '%s'" % cmd)
+		out = bytes([OPCODES[name]])
+		if name == "PLAY_AND_WAIT":
+			display = args.startswith("DISP ")
+			out += bytes([display])
+			if display:
+				args = args[5:]
+		if name in ("PLAY_MOVE", "PLAY_AND_WAIT"):
+			values = [int(v) for v in args.split()]
+			return out + pack(">%dh" % len(values), *values)
+		return out + args.encode('utf-8')
+
+
+	@staticmethod
+	def decodeVarint(data, pos=0):
+		"""Decode a varint in data (bytes) from pos; returns its value and the position after it"""
+		n = shift = 0
+		while True:
+			b = data[pos]
+			pos += 1
+			n |= (b & 0x7F) << shift
+			shift += 7
+			if not b & 0x80:
+				return n, pos
+
+
+	async def readLength(self, headSize=HEAD_SIZE):
+		"""Read the size of the next message (headSize digits with the text protocol, a varint with the binary one)"""
+		try:
+			if self._activeProtocol == 1:
+				return int(await self._reader.readexactly(headSize))
+			n = shift = 0
+			while True:
+				b = (await self._reader.readexactly(1))[0]
+				n |= (b & 0x7F) << shift
+				shift += 7
+				if not b & 0x80:
+					return n
+		except asyncio.IncompleteReadError:
+			raise ConnectionError("Cannot read message (server has failed?)")
+
+
+	async def readMessage(self, headSize=HEAD_SIZE):
+		"""Read a message (bytes)"""
+		length = await self.readLength(headSize)
+		try:
+			return await self._reader.readexactly(length)
+		except asyncio.IncompleteReadError:
+			raise ConnectionError("Cannot read message (server has failed?)")
+
+
+	async def readString(self):
+		"""Read a message (string)"""
+		return (await self.readMessage()).decode('utf-8')
+
+
+	async def readLargeMessage(self):
+		"""
+		Read a large message (game data or display), decompressed if the compression is used
+		(the size of a compressed message has LARGE_HEAD_SIZE digits with the text protocol)
+		"""
+		if self._inflate is None:
+			return await self.readMessage()
+		return self._inflate.decompress(await self.readMessage(LARGE_HEAD_SIZE))
+
+
+	async def readReturnCode(self):
+		"""Read a return code (int)"""
+		if self._activeProtocol == 1:
+			return int(await self.readString())
+		return unpack("b", await self.readMessage())[0]
+
+
+	async def readMove(self):
+		"""Read a move (converted with Move.fromString, if the class Move is defined)"""
+		if self._activeProtocol == 1:
+			move = await self.readString()
+		else:
+			data = await self.readMessage()
+			move = " ".join(str(v) for v in unpack(">%dh" % (len(data) // 2), data))
+		logger.debug("[%s] Receive that move:%s", self.name, move)
+		return self.Move.fromString(move) if self.Move and move else move
+
+
+	async def readTimesLeft(self):
+		"""Read the time left (in ms) to the bot and to its opponent (in timesLeft), if the clock is asked"""
+		if self.clock:
+			self.timesLeft = tuple(int(t) for t in (await self.readString()).split())
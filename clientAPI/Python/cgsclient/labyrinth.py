@@ -0,0 +1,94 @@
+"""
+* --------------------- *
+|                       |
+|   Coding Game Server  |
+|                       |
+* --------------------- *
+
+Authors: T. Hilaire, J. Brajard
+Licence: GPL
+
+File: labyrinth.py
+	Contains the classes MoveType, Move and LabyrinthClient
+	-> client API for the Labyrinth game (same functions as games/Labyrinth/API/labyrinthAPI.c)
+
+Copyright 2016-2017 T. Hilaire, J. Brajard
+"""
+
+from enum import IntEnum
+from typing import NamedTuple
+
+from cgsclient.client import Client
+
+
+class MoveType(IntEnum):
+	"""Types of move"""
+	ROTATE_LINE_LEFT = 0
+	ROTATE_LINE_RIGHT = 1
+	ROTATE_COLUMN_UP = 2
+	ROTATE_COLUMN_DOWN = 3
+	MOVE_UP = 4
+	MOVE_DOWN = 5
+	MOVE_LEFT = 6
+	MOVE_RIGHT = 7
+	DO_NOTHING = 8
+
+
+class Move(NamedTuple):
+	"""
+	A move is a tuple (type, value):
+	in case of rotation, the value indicates the number of the line (or column) to be rotated
+	"""
+	type: MoveType
+	value: int = 0
+
+	def __str__(self):
+		return "%d %d" % (self.type, self.value)
+
+	@classmethod
+	def fromString(cls, move):
+		"""Build the move from the string sent by the server ("<type> <value>")"""
+		t, v = move.split()
+		return cls(MoveType(int(t)), int(v))
+
+
+
+class LabyrinthClient(Client):
+	"""
+	Client for the Labyrinth game
+	(the moves are Move objects, see Client.getMove, Client.sendMove and Client.playAndWait)
+
+	Attributes:
+	- sizeX, sizeY: (int) sizes of the labyrinth (set by waitForLabyrinth)
+	"""
+
+	Move = Move
+
+
+	async def waitForLabyrinth(self, gameType=""):
+		"""
+		Wait for a Labyrinth, and retrieve its name and its size
+		Parameters:
+		- gameType: (string) type of the game we want to play (empty string for regular game),
+		like "TRAINING PLAY_RANDOM rotate=False" (see labyrinthAPI.h for the training players and their options)
+		Returns the name of the labyrinth and its sizes (sizeX, sizeY)
+		"""
+		name, data = await self.waitForGame(gameType)
+		self.sizeX, self.sizeY = (int(v) for v in data.split())
+		return name, self.sizeX, self.sizeY
+
+
+	async def getLabyrinth(self):
+		"""
+		Get the labyrinth and tell who starts
+		Returns the labyrinth (list of lines, lab[y][x] is 1 if there's a wall, 0 for nothing),
+		and 0 if you begin, or 1 if the opponent begins
+		"""
+		data, who = await self.getGameData()
+		lab = [[int(c) for c in data[y * self.sizeX:(y + 1) * self.sizeX]] for y in range(self.sizeY)]
+		return lab, who
+
+
+	async def printLabyrinth(self, incremental=False):
+		"""Display the labyrinth (ask the server what to print)"""
+		await self.printGame(incremental)
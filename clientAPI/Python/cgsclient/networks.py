@@ -0,0 +1,92 @@
+"""
+* --------------------- *
+|                       |
+|   Coding Game Server  |
+|                       |
+* --------------------- *
+
+Authors: T. Hilaire, J. Brajard
+Licence: GPL
+
+File: networks.py
+	Contains the classes MoveType, Move and NetworksClient
+	-> client API for the Networks game (same functions as games/Networks/API/networksAPI.c)
+
+Copyright 2016-2017 T. Hilaire, J. Brajard
+"""
+
+from enum import IntEnum
+from typing import NamedTuple
+
+from cgsclient.client import Client
+
+
+class MoveType(IntEnum):
+	"""Types of move"""
+	CAPTURE = 0
+	DESTROY = 1
+	LINK_H = 2
+	LINK_V = 3
+	DO_NOTHING = 4
+
+
+class Move(NamedTuple):
+	"""
+	A move is a tuple (type, x, y):
+	in case of CAPTURE, (x, y) are the coordinates of the node to be captured;
+	in case of LINK_H, LINK_V or DESTROY, (x, y) are the coordinates of the link to be created or destroyed
+	"""
+	type: MoveType
+	x: int = 0
+	y: int = 0
+
+	def __str__(self):
+		return "%d %d %d" % (self.type, self.x, self.y)
+
+	@classmethod
+	def fromString(cls, move):
+		"""Build the move from the string sent by the server ("<type> <x> <y>")"""
+		t, x, y = move.split()
+		return cls(MoveType(int(t)), int(x), int(y))
+
+
+
+class NetworksClient(Client):
+	"""
+	Client for the Networks game
+	(the moves are Move objects, see Client.getMove, Client.sendMove and Client.playAndWait)
+
+	Attributes:
+	- sizeX, sizeY: (int) sizes of the board (set by waitForBoard)
+	"""
+
+	Move = Move
+
+
+	async def waitForBoard(self, gameType=""):
+		"""
+		Wait for a game, and retrieve its name and the size of the board
+		Parameters:
+		- gameType: (string) type of the game we want to play (empty string for regular game),
+		like "TRAINING ALICE_RANDOM" (see networksAPI.h)
+		Returns the name of the game and the sizes of the board (sizeX, sizeY)
+		"""
+		name, data = await self.waitForGame(gameType)
+		self.sizeX, self.sizeY = (int(v) for v in data.split())
+		return name, self.sizeX, self.sizeY
+
+
+	async def getBoardData(self):
+		"""
+		Get the board and tell who starts
+		Returns the board (list of lines of integers, board[y][x], see networksAPI.h for their meaning),
+		and 0 if you begin, or 1 if the opponent begins
+		"""
+		data, who = await self.getGameData()
+		board = [[ord(c) - ord('0') for c in data[y * self.sizeX:(y + 1) * self.sizeX]] for y in range(self.sizeY)]
+		return board, who
+
+
+	async def printBoard(self, incremental=False):
+		"""Display the board (ask the server what to print)"""
+		await self.printGame(incremental)
@@ -0,0 +1,90 @@
+"""
+* --------------------- *
+|                       |
+|   Coding Game Server  |
+|                       |
+* --------------------- *
+
+Authors: T. Hilaire, J. Brajard
+Licence: GPL
+
+File: starships.py
+	Contains the classes MoveType, Move and StarshipsClient
+	-> client API for the Starships game (same functions as games/Starships/API/starshipsAPI.c)
+
+Copyright 2016-2017 T. Hilaire, J. Brajard
+"""
+
+from enum import IntEnum
+from typing import NamedTuple
+
+from cgsclient.client import Client
+
+
+class MoveType(IntEnum):
+	"""Types of move"""
+	MOVE_UP = 0
+	MOVE_DOWN = 1
+	SHOOT = 2
+	ASTEROID_PUSH = 3
+	DO_NOTHING = 4
+
+
+class Move(NamedTuple):
+	"""
+	A move is a tuple (type, value):
+	in case of SHOOT or ASTEROID_PUSH, the value indicates the number of energy cells to consume
+	"""
+	type: MoveType
+	value: int = 0
+
+	def __str__(self):
+		return "%d %d" % (self.type, self.value)
+
+	@classmethod
+	def fromString(cls, move):
+		"""Build the move from the string sent by the server ("<type> <value>")"""
+		t, v = move.split()
+		return cls(MoveType(int(t)), int(v))
+
+
+
+class StarshipsClient(Client):
+	"""
+	Client for the Starships game
+	(the moves are Move objects, see Client.getMove, Client.sendMove and Client.playAndWait)
+
+	Attributes:
+	- sizeX, sizeY: (int) sizes of the view window of the board (set by waitForBoard)
+	"""
+
+	Move = Move
+
+
+	async def waitForBoard(self, gameType=""):
+		"""
+		Wait for a game, and retrieve its name and the size of the view window of the board
+		Parameters:
+		- gameType: (string) type of the game we want to play (empty string for regular game),
+		like "TRAINING DO_NOTHING" (see starshipsAPI.h)
+		Returns the name of the game and the sizes of the view window (sizeX, sizeY)
+		"""
+		name, data = await self.waitForGame(gameType)
+		self.sizeX, self.sizeY = (int(v) for v in data.split())
+		return name, self.sizeX, self.sizeY
+
+
+	async def getBoardData(self):
+		"""
+		Get the view window of the board and tell who starts
+		Returns the board (list of lines, board[y][x] is 1 if there's an asteroid, 0 for nothing),
+		and 0 if you begin, or 1 if the opponent begins
+		"""
+		data, who = await self.getGameData()
+		board = [[int(c) for c in data[y * self.sizeX:(y + 1) * self.sizeX]] for y in range(self.sizeY)]
+		return board, who
+
+
+	async def printBoard(self, incremental=False):
+		"""Display the board (ask the server what to print)"""
+		await self.printGame(incremental)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8
+"""
+
+* --------------------- *
+|                       |
+|   Coding Game Server  |
+|                       |
+* --------------------- *
+
+
+Authors: T. Hilaire, J. Brajard
+Licence: GPL
+
+File: randomBots.py
+	Example of the Python client: run many Labyrinth bots (in one event loop), that play random moves against a
+	training player
+
+Copyright 2016-2017 T. Hilaire, J. Brajard
+"""
+
+import asyncio
+from random import choice
+
+from docopt import docopt
+
+from cgsclient import LabyrinthClient, NORMAL_MOVE, WINNING_MOVE
+from cgsclient.labyrinth import Move, MoveType
+
+usage = """
+Random Labyrinth bots
+Run many bots (in one event loop) that play random moves against a training player
+
+Usage:
+  randomBots.py -h | --help
+  randomBots.py [options]
+
+Options:
+  -h --help                Show this screen.
+  -s NAME --server=NAME    Server name (or "unix:<path>" for a Unix domain socket) [default: localhost].
+  -p PORT --port=PORT      Server port [default: 1234].
+  -n N --nb=N              Number of bots [default: 10].
+  -g N --games=N           Number of games per bot [default: 1].
+  -t NAME --training=NAME  Training player [default: DO_NOTHING]
+  --protocol=P             Version of the protocol (1: text, 2: binary) [default: 1].
+  --compress               Ask the server to compress the game data and the displays
+  --display                Display the game after each move (only for the first bot)
+"""
+
+# moves played by the bots (a move in a wall is a losing move)
+MOVES = [Move(MoveType.DO_NOTHING)] * 4 + [Move(t) for t in (MoveType.MOVE_UP, MoveType.MOVE_DOWN, MoveType.MOVE_LEFT,
+                                                             MoveType.MOVE_RIGHT)]
+
+
+async def bot(i, args):
+	"""Play the games of a bot; returns the number of games won and the number of moves"""
+	client = LabyrinthClient("random_%d" % i, int(args['--protocol']), args['--compress'])
+	await client.connect(args['--server'], int(args['--port']))
+	wins = moves = 0
+	for _ in range(int(args['--games'])):
+		await client.waitForLabyrinth("TRAINING " + args['--training'])
+		_, player = await client.getLabyrinth()
+		ret = NORMAL_MOVE
+		while ret == NORMAL_MOVE:
+			if player == 1:
+				_, ret = await client.getMove()
+				if ret != NORMAL_MOVE:
+					break
+			ret, _, _, opponentRet, display = await client.playAndWait(choice(MOVES), args['--display'] and i == 0)
+			moves += 1
+			if display:
+				print(display)
+			if ret == WINNING_MOVE:
+				wins += 1
+			if ret == NORMAL_MOVE:
+				ret = opponentRet
+			player = 0
+	await client.close()
+	return wins, moves
+
+
+async def main(args):
+	"""Run all the bots"""
+	results = await asyncio.gather(*[bot(i, args) for i in range(int(args['--nb']))])
+	print("%d bots, %d games won, %d moves" % (len(results), sum(r[0] for r in results), sum(r[1] for r in results)))
+
+
+if __name__ == "__main__":
+	asyncio.run(main(docopt(usage)))
@@ -92,7 +92,7 @@ void waitForLabyrinth( char* gameType, char* labyrinthName, int* sizeX, int* siz
 {
 	char data[128];
 	/* wait for a game */
-	waitForGame( __FUNCTION__, training, labyrinthName, data);
+	waitForGame( __FUNCTION__, gameType, labyrinthName, data);
 
 	/* parse the data */
 	sscanf( data, "%d %d", sizeX, sizeY);
@@ -177,6 +177,36 @@ t_return_code sendMove( t_move move)
 
 
 
+/* -----------
+ * Send a move, and then wait for the move of the opponent
+ * (same as sendMove followed by getMove, but in only one exchange with the server)
+ *
+ * Parameters:
+ * - move: our move
+ * - opponentMove: filled with the move of the opponent (only if our move is a normal move)
+ * - opponentRet: filled with the return_code of the opponent's move (relative to the opponent),
+ *                or NORMAL_MOVE if our move has ended the game
+ * - display: if not 0, the game is displayed after the opponent's move
+ *
+ * Returns the return_code of our move (relative to your programm)
+ */
+t_return_code sendMoveAndWait(t_move move, t_move* opponentMove, t_return_code* opponentRet, int display)
+{
+    /* build the string move */
+    char data[128], opponentData[128];
+    sprintf(data, "%d %d", move.type, move.value);
+
+    /* send the move and get the opponent's move */
+    t_return_code ret = playAndWaitCGSMove(__FUNCTION__, data, opponentData, 128, opponentRet, display);
+
+    /* extract the opponent's move */
+    if (ret == NORMAL_MOVE)
+        sscanf(opponentData, "%d %d", &(opponentMove->type), &(opponentMove->value));
+    return ret;
+}
+
+
+
 /* ----------------------
  * Display the labyrinth
  * in a pretty way (ask the server what to print)
@@ -62,6 +62,7 @@ typedef struct
  * - serverName: (string) address of the server 
  *   (it could be "localhost" if the server is run in local, 
  *   or "pc4521.polytech.upmc.fr" if the server runs there)
+ *   or "unix:<path>" for the Unix domain socket <path> of a server run on the same host
  * - port: (int) port number used for the connection
  * - name: (string) name of the bot : max 20 characters 
  *         (checked by the server)
@@ -162,6 +163,27 @@ t_return_code sendMove( t_move move );
 
 
 
+/* -----------
+ * Send a move, and then wait for the move of the opponent
+ * (same as sendMove followed by getMove, but in only one exchange with the server)
+ *
+ * Parameters:
+ * - move: our move
+ * - opponentMove: filled with the move of the opponent (only if our move is a normal move)
+ * - opponentRet: filled with the return_code of the opponent's move (relative to the opponent),
+ *                or NORMAL_MOVE if our move has ended the game
+ * - display: if not 0, the game is displayed after the opponent's move (as with the print function)
+ *
+ * Returns a return_code for our move
+ * NORMAL_MOVE for normal move,
+ * WINNING_MOVE for a winning move, -1
+ * LOOSING_MOVE for a losing (or illegal) move
+ * this code is relative to your programm (WINNING_MOVE if YOU win, ...)
+ */
+t_return_code sendMoveAndWait(t_move move, t_move* opponentMove, t_return_code* opponentRet, int display);
+
+
+
 /* ----------------------
  * Display the labyrinth
  * in a pretty way (ask the server what to print)
@@ -16,7 +16,6 @@ File: Labyrinth.py
 Copyright 2016-2017 T. Hilaire, J. Brajard
 """
 
-from random import shuffle, random, randint
 from re import compile
 from ansi2html import Ansi2HTMLConverter
 from colorama import Fore
@@ -73,11 +72,12 @@ def tadd(tuple1, tuple2, modu):
 	return tuple(map(lambda x, y, m: (x + y) % m, tuple1, tuple2, modu))
 
 
-def CreateLaby(sX, sY):
+def CreateLaby(sX, sY, rng):
 	"""
 	Build a Labyrinth (an array of booleans: True=> empty, False=> wall)
 	:param sX: number of 2x2 blocks (over X)
 	:param sY: number of 2x2 blocks (over Y)
+	:param rng: random generator (of the game)
 	Build a random (4*sX+1) x (2*sY+1) labyrinth, symmetric with respect column 2*sX
 
 	generation based on https://29a.ch/2009/9/7/generating-maps-mazes-with-python
@@ -106,7 +106,7 @@ def CreateLaby(sX, sY):
 	# create a L*H array of False)
 	lab = [list((False,) * H) for _ in range(L)]
 
-	shuffle(Directions)
+	rng.shuffle(Directions)
 	stack = [(0, 0, list(Directions))]  # X, Y of the cell( 2x2 cell) and directions
 
 	while stack:
@@ -138,12 +138,12 @@ def CreateLaby(sX, sY):
 		# remove the origin
 		lab[ox][oy] = True
 		lab[4 * sX - ox][oy] = True  # and its symmetric
-		if random() > 0.75:
+		if rng.random() > 0.75:
 			lab[ox + 1][oy - 1] = True
 			lab[4 * sX - ox - 1][oy - 1] = True  # and its symmetric
 
 		# add it to the stack
-		shuffle(Directions)
+		rng.shuffle(Directions)
 		stack.append((nx, ny, list(Directions)))
 
 	return L, H, lab
@@ -182,10 +182,11 @@ class Labyrinth(Game):
 		:param options: dictionary of options (the options 'seed' and 'timeout' are managed by the Game class)
 		"""
 
-		# random Labyrinth
-		totalSize = randint(8, 12)  # sX + sY is randomly in [8;11]
-		sX = randint(3, 5)
-		self._L, self._H, self._lab = CreateLaby(sX, totalSize - sX)
+		# random Labyrinth (drawn from the random generator of the game, seeded with the 'seed' option)
+		rng = self.initRandom(options)
+		totalSize = rng.randint(8, 12)  # sX + sY is randomly in [8;11]
+		sX = rng.randint(3, 5)
+		self._L, self._H, self._lab = CreateLaby(sX, totalSize - sX, rng)
 
 		# add treasure and players
 		self._treasure = (self.L // 2, self.H // 2)
@@ -195,8 +196,8 @@ class Labyrinth(Game):
 		self._playerPos.append((0, self.H // 2))
 		self._playerPos.append((self.L - 1, self.H // 2))
 
-		# Level of energy
-		self._playerEnergy = [INITIAL_ENERGY_SECOND] * 2
+		# Level of energy (the player #0 always starts)
+		self._playerEnergy = [INITIAL_ENERGY_FIRST, INITIAL_ENERGY_SECOND]
 
 		for x, y in self._playerPos:
 			self._lab[x][y] = True  # no wall here
@@ -205,8 +206,6 @@ class Labyrinth(Game):
 		# the players and they will immediately requires some Labyrinth's properties)
 		super().__init__(player1, player2, **options)
 
-		self._playerEnergy[0] = INITIAL_ENERGY_FIRST
-
 
 	@property
 	def treasure(self):
@@ -17,7 +17,6 @@ Copyright 2017 M. Pecheux
 """
 
 from server.Player import TrainingPlayer
-from random import choice, randint
 from .Constants import CAPTURE, DESTROY, LINK_H, LINK_V, DO_NOTHING, \
 	LINK_ENERGY, DESTROY_ENERGY
 
@@ -109,7 +108,7 @@ class AliceRandomPlayer(TrainingPlayer):
 			if self.game.playerEnergy[us] >= DESTROY_ENERGY:
 				linkCells = [(x,y) for x in range(self.game.L-1) for y in range(self.game.H-1) if check_type(self.game.board[x][y], "link")]
 				if len(linkCells) > 0:
-					lx, ly = choice(linkCells)
+					lx, ly = self.game.rng.choice(linkCells)
 					moves.append("%d %d %d" % (DESTROY, lx, ly))
 			# create link
 			if self.game.playerEnergy[us] >= LINK_ENERGY:
@@ -124,7 +123,7 @@ class AliceRandomPlayer(TrainingPlayer):
 								check_type(self.game.board[x][y+1], "Node"):
 								blankCells.append((x, y, 1))
 				if len(blankCells) > 0:
-					cx, cy, d = choice(blankCells)
+					cx, cy, d = self.game.rng.choice(blankCells)
 					if d == 0:
 						moves.append("%d %d %d" % (LINK_H, cx, cy))
 					elif d == 1:
@@ -132,7 +131,7 @@ class AliceRandomPlayer(TrainingPlayer):
 
 		# choose one possible move
 		if moves:
-			return choice(moves)
+			return self.game.rng.choice(moves)
 		else:
 			# sometimes, we cannot move...
 			self.game.sendComment(self, "I am blocked... I cannot play...")
@@ -16,7 +16,6 @@ File: Network.py
 Copyright 2017 M. Pecheux
 """
 
-from random import random, randint, choice, shuffle
 from re import compile
 from ansi2html import Ansi2HTMLConverter
 from colorama import Fore
@@ -115,11 +114,12 @@ class Link:
 		return str(self.direction + 1)
 
 
-def CreateBoard(sX, sY):
+def CreateBoard(sX, sY, rng):
 	"""
 	Build a Board (an array of elements = Node, Link or None)
 	:param sX: number of 2x2 blocks (over X)
 	:param sY: number of 2x2 blocks (over Y)
+	:param rng: random generator (of the game)
 	Build a random (4*sX+1) x (2*sY+1) board, symmetric with respect middle point
 
 	generation based on https://29a.ch/2009/9/7/generating-maps-mazes-with-python
@@ -148,7 +148,7 @@ def CreateBoard(sX, sY):
 	# create a L*H array of None
 	board = [list((None,) * H) for _ in range(L)]
 
-	shuffle(Directions)
+	rng.shuffle(Directions)
 	stack = [(0, 0, list(Directions))]  # X, Y of the cell( 2x2 cell) and directions
 	current_node_counts = [0] * len(MAX_NODES_COUNT)
 
@@ -186,12 +186,12 @@ def CreateBoard(sX, sY):
 			if MAX_NODES_COUNT[i] == -1 or current_node_counts[i] < MAX_NODES_COUNT[i]:
 				available_node_types.append(i)
 
-		c = choice(available_node_types)
+		c = rng.choice(available_node_types)
 		current_node_counts[c] += 1
 		board[ox][oy] = Node(ox, oy, c, False)
 
 		# add it to the stack
-		shuffle(Directions)
+		rng.shuffle(Directions)
 		stack.append((nx, ny, list(Directions)))
 
 	# set goal node
@@ -223,7 +223,7 @@ def CreateBoard(sX, sY):
 			for y in range(H//2):
 				if y in links_in_column:
 					board[goal_x-1][y] = Link(0)
-					board[goal_x][y] = Node(goal_x, y, randint(0, NODE_TYPES), False)
+					board[goal_x][y] = Node(goal_x, y, rng.randint(0, NODE_TYPES), False)
 					board[goal_x+1][y] = Link(0)
 
 			# add the goal node links
@@ -249,7 +249,7 @@ def CreateBoard(sX, sY):
 			for x in range(L//2):
 				if x in links_in_row:
 					board[x][goal_y-1] = Link(1)
-					board[x][goal_y] = Node(x, goal_y, randint(0, NODE_TYPES - 1), False)
+					board[x][goal_y] = Node(x, goal_y, rng.randint(0, NODE_TYPES - 1), False)
 					board[x][goal_y+1] = Link(1)
 
 			# add the goal node links
@@ -272,7 +272,7 @@ def CreateBoard(sX, sY):
 		for x in range(L//2):
 			if x in links_in_row:
 				board[x][goal_y-1] = Link(1)
-				board[x][goal_y] = Node(x, goal_y, randint(0, NODE_TYPES - 1), False)
+				board[x][goal_y] = Node(x, goal_y, rng.randint(0, NODE_TYPES - 1), False)
 				board[x][goal_y+1] = Link(1)
 
 		# add the goal node links
@@ -290,12 +290,12 @@ def CreateBoard(sX, sY):
 	# create a random 'cutename' for the Board (one that can be displayed in the server)
 	nameparts1 = ['Black', 'Red', 'Blue', 'Green', 'New', 'Old', 'Disconnected', 'Unique', 'Estranged']
 	nameparts2 = ['Network', 'Grid', 'Cells', 'Web', 'Server', 'Router', 'Antenna', 'Satellite']
-	r = randint(0, 100)
+	r = rng.randint(0, 100)
 	if r < 20:
-		name = choice(nameparts2) + ' '
-		name += choice(['X', 'Y', 'Z', 'Theta', 'Omega', 'Alpha']) + '-' + str(randint(10, 30))
+		name = rng.choice(nameparts2) + ' '
+		name += rng.choice(['X', 'Y', 'Z', 'Theta', 'Omega', 'Alpha']) + '-' + str(rng.randint(10, 30))
 	else:
-		name = choice(nameparts1) + ' ' + choice(nameparts2)
+		name = rng.choice(nameparts1) + ' ' + rng.choice(nameparts2)
 
 	return L, H, board, name, board[goal_x][goal_y]
 
@@ -338,8 +338,10 @@ class Networks(Game):
 		:param options: dictionary of options (the options 'seed' and 'timeout' are managed by the Game class)
 		"""
 
-		# random Board, cutename and goalNode
-		self._L, self._H, self._board, self._cutename, self._goalNode = CreateBoard(randint(4, 6), randint(4, 6))
+		# random Board, cutename and goalNode (drawn from the random generator of the game, seeded with the 'seed' option)
+		rng = self.initRandom(options)
+		sX, sY = rng.randint(4, 6), rng.randint(4, 6)
+		self._L, self._H, self._board, self._cutename, self._goalNode = CreateBoard(sX, sY, rng)
 		#self._L, self._H, self._board, self._cutename, self._goalNode = CreateBoard(2, 2)
 
 		# add players
@@ -615,7 +617,7 @@ class Networks(Game):
 		if hasattr(self, '_cutename'):
 			return self._cutename
 		else:
-			return None
+			return super().getCutename()
 
 
 	def getData(self):
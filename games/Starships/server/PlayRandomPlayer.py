@@ -17,7 +17,6 @@ Copyright 2016-2017 T. Hilaire, J. Brajard
 """
 
 from server.Player import TrainingPlayer
-from random import choice, randint
 from .Constants import MOVE_DOWN, MOVE_LEFT, MOVE_RIGHT, MOVE_UP, DO_NOTHING
 from .Constants import ROTATE_COLUMN_DOWN, ROTATE_COLUMN_UP, ROTATE_LINE_LEFT, ROTATE_LINE_RIGHT, ROTATE_ENERGY
 from .Constants import Ddx, Ddy
@@ -69,8 +68,8 @@ class PlayRandomPlayer(TrainingPlayer):
 
 		# rotate line or column
 		if self.game.playerEnergy[us] >= ROTATE_ENERGY and self.rotate:
-			line = randint(0, self.game.H-1)
-			col = randint(0, self.game.L-1)
+			line = self.game.rng.randint(0, self.game.H-1)
+			col = self.game.rng.randint(0, self.game.L-1)
 			moves.append("%d %d" % (ROTATE_COLUMN_DOWN, col))
 			moves.append("%d %d" % (ROTATE_COLUMN_UP, col))
 			moves.append("%d %d" % (ROTATE_LINE_RIGHT, line))
@@ -78,7 +77,7 @@ class PlayRandomPlayer(TrainingPlayer):
 
 		# choose one (up to 4 moves and 4 rotations)
 		if moves:
-			return choice(moves)
+			return self.game.rng.choice(moves)
 		else:
 			# sometimes, we cannot move...
 			self.game.sendComment(self, "I am blocked... I cannot move...")
@@ -16,7 +16,6 @@ File: Starships.py
 Copyright 2017 M. Pecheux
 """
 
-from random import random, randint, choice
 from re import compile
 from ansi2html import Ansi2HTMLConverter
 from colorama import Fore
@@ -33,11 +32,12 @@ from .DoNothingPlayer import DoNothingPlayer
 regdd = compile("(\d+)\s+(\d+)")  # regex to parse a "%d %d" string
 
 
-def CreateBoard(sX, sY):
+def CreateBoard(sX, sY, rng):
 	"""
 	Build a Board (an array of booleans: True => empty, False => asteroid)
 	:param sX: order of the number of cells (over X)
 	:param sY: order of the number of cells (over Y)
+	:param rng: random generator (of the game)
 	Build a random (4*sX) x (2*sY+1) board containing asteroids with a given chance,
 	otherwise simply an empty cell.
 
@@ -60,18 +60,18 @@ def CreateBoard(sX, sY):
 	for i in range(max(L//10, 10), L):
 		for j in range(H):
 			# get a random number and, if necessary, pop an asteroid
-			if random() < ASTEROID_POP_CHANCE:
+			if rng.random() < ASTEROID_POP_CHANCE:
 				board[i][j] = False
 
 	# create a random 'cutename' for the Board (one that can be displayed in the server)
 	nameparts1 = ['Sector', 'Galaxy', 'Quadrant', 'System', 'Planet', 'Wormhole', 'Blackhole', 'Supernova', 'Star']
 	nameparts2 = ['Arcturus', 'Andromeda', 'Cassiopeia', 'of Zonn', 'of Tron', 'of Alf']
-	name = choice(nameparts1) + ' '
-	r = randint(0, 100)
+	name = rng.choice(nameparts1) + ' '
+	r = rng.randint(0, 100)
 	if r < 20:
-		name += choice(['X', 'Y', 'Z', 'Theta', 'Omega', 'Alpha']) + '-' + str(randint(10, 30))
+		name += rng.choice(['X', 'Y', 'Z', 'Theta', 'Omega', 'Alpha']) + '-' + str(rng.randint(10, 30))
 	else:
-		name += choice(nameparts2)
+		name += rng.choice(nameparts2)
 
 	return L, H, board, name
 
@@ -110,8 +110,9 @@ class Starships(Game):
 		:param options: dictionary of options (the options 'seed' and 'timeout' are managed by the Game class)
 		"""
 
-		# random Board
-		self._L, self._H, self._board, self._cutename = CreateBoard(randint(15, 20), randint(3, 5))
+		# random Board (drawn from the random generator of the game, seeded with the 'seed' option)
+		rng = self.initRandom(options)
+		self._L, self._H, self._board, self._cutename = CreateBoard(rng.randint(15, 20), rng.randint(3, 5), rng)
 		self._vL = 50
 		self._xOffset = 0
 
@@ -10,4 +10,4 @@ fi
 filename=`cut -d "." -f 1 <<< $1`
 
 gcc -c -Wall $1 -I../API/
-gcc -o $filename.out $filename.o ../API/starshipsAPI.o ../../../clientAPI/C/clientAPI.o
+gcc -o $filename.out $filename.o ../API/starshipsAPI.o ../../../clientAPI/C/clientAPI.o -lz
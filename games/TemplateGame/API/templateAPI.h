@@ -31,6 +31,7 @@ typedef struct
  * - serverName: (string) address of the server
  *   (it could be "localhost" if the server is run in local,
  *   or "pc4521.polytech.upmc.fr" if the server runs there)
+ *   or "unix:<path>" for the Unix domain socket <path> of a server run on the same host
  * - port: (int) port number used for the connection
  * - name: (string) name of the bot : max 20 characters
  *         (checked by the server)
@@ -51,6 +51,8 @@ class TemplateGame(Game):
 		"""
 		#
 		# insert your code here to create your game (its data, etc.)...
+		# (use the random generator of the game, given by `rng = self.initRandom(options)`, and not the module random,
+		# so that the same seed gives the same game)
 		#
 
 		# call the superclass constructor (only at the end, because the superclass constructor launches
@@ -14,6 +14,7 @@ Licence: GPL
 
 File: runCGS.py
 	Main file/entry for the Coding Game Server
+	(also runs simulations between training players, without server, with `runCGS.py simulate`)
 
 
 CGS requires Python3 and the following packages: colorama, colorlog, docopt, bottle, jinja2, gevent-websocket
@@ -24,23 +25,21 @@ Copyright 2016-2017 T. Hilaire, J. Brajard
 
 import threading  # to run threads
 from importlib import import_module    # to dynamically import modules
-from socketserver import ThreadingTCPServer  # socket server (with multi-threads capabilities)
+from os.path import join
 
 from colorama import Fore
 from docopt import docopt  # used to parse the command line
 
-from server.Game import Game
-from server.Logger import configureRootLogger
-from server.Player import PlayerSocketHandler  # TCP socket handler for players
-from server.Webserver import runWebServer  # to run the webserver (bottle)
-
 usage = """
 Coding Game Server
-Run the servers (Game server and web server)
+Run the servers (Game server and web server),
+or simulate games between two training players (without server)
 
 Usage:
   runCGS.py -h | --help
   runCGS.py <gameName> [options] [--debug|--dev|--prod]
+  runCGS.py simulate <gameName> <player1> <player2> [-n GAMES] [--seed=SEED] [--processes=N] [--max-moves=N]
+                     [--options=OPTIONS] [--save=FILE]
 
 Options:
   gameName                 Name of game [default: Labyrinth]
@@ -52,9 +51,21 @@ Options:
   -s SMTP --smtp=SMTP      SMTP server:port used in prod to send the email [default: smtp.gmail.com:587]
   -l LOGS --log=LOGS       Folder where the logs are stored [default: logs/{{hostname}}/]
   --no-email               Do not send email in production [default: False]
+  --async                  Use the asyncio game server (instead of one thread per player) [default: False]
+  --unix=PATH              Also listen on the Unix domain socket PATH (for the bots run on the same host)
+  --workers=N              Number of worker processes that play the games between two regular players
+                           (0 to play all the games in the main process, not used with --async) [default: 0]
   --debug                  Debug mode (log and display everything)
   --dev                    Development mode (log everything, display infos, warnings and errors)
   --prod                   Production mode (only log infos, warnings and errors and send emails) [default: True]
+
+Simulation options (`simulate`, the players are names of training players of the game, like ASTAR or PLAY_RANDOM):
+  -n GAMES --games=GAMES   Number of games (each player starts half of them) [default: 1000].
+  --seed=SEED              Seed of the first game (the next games use the next seeds; random if not given)
+  --processes=N            Number of processes that play the games (the number of CPUs if not given)
+  --max-moves=N            Maximum number of moves of a game (it is then stopped, without winner) [default: 1000].
+  --options=OPTIONS        Options of the game and of the training players, like "rotate=false"
+  --save=FILE              Save the moves of all the games in FILE (gzip is used if FILE ends with .gz)
 """
 
 
@@ -66,8 +77,23 @@ if __name__ == "__main__":
 		args['--prod'] = True
 	args['--port'] = int(args['--port'])
 	args['--web'] = int(args['--web'])
+	args['--workers'] = int(args['--workers'])
 	gameName = args['<gameName>']
 
+	# import the server (the webserver first, since it monkey-patches with gevent; it is not imported for the
+	# simulations, that use a pool of processes)
+	if not args['simulate']:
+		from server.Webserver import runWebServer  # to run the webserver (bottle)
+	from server.Archive import archive  # archive of the finished games
+	from server.Checkpoint import checkpointer  # snapshots of the running games
+	from server.Game import Game
+	from server.Logger import configureRootLogger, configureSimulationLogger, Config
+	from server.Player import PlayerSocketHandler  # TCP socket handler for players
+	from server.Player import PlayerServer  # threaded server for players (with a waiting room)
+	from server.Player import UnixPlayerServer  # same server, on a Unix domain socket
+	from server.Player import AsyncPlayerServer  # asyncio server for players
+	from server.Player import WorkerPool  # worker processes that play the games
+
 
 	# import the <gameName> module and store it (in Game)
 	try:
@@ -84,6 +110,16 @@ if __name__ == "__main__":
 		print(e)
 		quit()
 
+	# simulation (without server and logs)
+	if args['simulate']:
+		from server.Simulation import runSimulation
+		configureSimulationLogger()
+		try:
+			runSimulation(Game.getTheGameClass(), args)
+		except ValueError as e:
+			print(Fore.RED + "Error: " + str(e) + Fore.RESET)
+		quit()
+
 	# configure the loggers
 	logger = configureRootLogger(args)
 
@@ -95,6 +131,27 @@ if __name__ == "__main__":
 	logger.message("#=====================================================#")
 	logger.message("")
 
+	# Open the folder of the snapshots of the running games, in the log folder (before the creation of the workers, so
+	# that they save the games they play in it)
+	checkpointer.open(join(Config.logPath, 'snapshots'))
+
+	# Create the worker processes (before running any thread, since they are forked)
+	workers = None
+	if args['--workers'] and not args['--async']:
+		workers = WorkerPool(args['--workers'])
+		logger.message("%d worker processes are started", args['--workers'])
+
+	# Open the archive of the finished games, in the log folder (after the creation of the workers, since the games
+	# played by the workers are recorded by the main process)
+	archive.open(join(Config.logPath, 'archive'))
+
+	# Restore the games that were running when the server has stopped (they wait for their players), and save the
+	# running games from now on
+	nbRestored = checkpointer.restoreGames()
+	if nbRestored:
+		logger.message("%d games are restored from their snapshots", nbRestored)
+	checkpointer.start()
+
 	# Run the webserver
 	threading.Thread(
 		target=runWebServer,
@@ -102,9 +159,18 @@ if __name__ == "__main__":
 	).start()
 
 	# Start TCP Socket server (connection to players)
-	PlayerServer = ThreadingTCPServer((args['--host'], args['--port']), PlayerSocketHandler)
-	logger.message("Run the game server on port %d...", args['--port'])
-	threading.Thread(target=PlayerServer.serve_forever())
+	if args['--async']:
+		gameServer = AsyncPlayerServer((args['--host'], args['--port']), unixPath=args['--unix'])
+		logger.message("Run the (asyncio) game server on port %d...", args['--port'])
+	else:
+		gameServer = PlayerServer((args['--host'], args['--port']), PlayerSocketHandler, workers)
+		logger.message("Run the game server on port %d...", args['--port'])
+		if args['--unix']:
+			unixServer = UnixPlayerServer(args['--unix'], PlayerSocketHandler, gameServer)
+			threading.Thread(target=unixServer.serve_forever, daemon=True).start()
+	if args['--unix']:
+		logger.message("Run the game server on the Unix socket %s...", args['--unix'])
+	threading.Thread(target=gameServer.serve_forever())
 
 
 
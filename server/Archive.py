@@ -0,0 +1,390 @@
+"""
+* --------------------- *
+|                       |
+|   Coding Game Server  |
+|                       |
+* --------------------- *
+
+Authors: T. Hilaire, J. Brajard
+Licence: GPL
+
+File: Archive.py
+	Contains the class Record, the class Archive, and the archive of the finished games (archive)
+	-> when a game is over, its record (class of the game, name, seed, options, names of the players, and the moves with
+	their return code and time) is encoded in a compact binary form and appended to the archive, made of segments
+	(append-only files of at most SEGMENT_SIZE octets) and of an index (by game name and by player)
+	-> during the game, recording a move is only appending a tuple to a list (see Game), the record is encoded and
+	written once the players have left the game
+	-> a recorded game can be played again, from its seed, with the updateGame method of the game (see replayGame and
+	the /replay/<gameName> web page)
+
+Copyright 2016-2017 T. Hilaire, J. Brajard
+"""
+
+import logging
+import zlib
+from collections import namedtuple
+from operator import sub
+from os import makedirs, listdir
+from os.path import join, getsize
+from struct import Struct, pack, unpack_from
+from threading import Lock
+
+logger = logging.getLogger()  # general logger ('root')
+
+
+SEGMENT_SIZE = 16 * 1024 * 1024     # maximum size (in octets) of a segment of the archive
+RECORD_VERSION = 1                  # version of the binary format of the records
+FRAME = Struct('!I')                # each record is preceded by its size (in octets)
+DOUBLE = Struct('!d')
+
+
+# record of a game
+# - gameClass: (string) name of the class of the game
+# - name: (string) name of the game
+# - tournament: (string) name of the tournament ('' if the game is not in a tournament)
+# - seed: (int) seed of the game
+# - startTime: (float) time (epoch) when the game has started
+# - options: (dict) options of the game, as strings (except the seed and who starts)
+# - players: (tuple) names of the two players (the player #0 starts)
+# - moves: list of (move, return_code, time), where time is the time (in ms) since the start of the game
+# - winner: (int) number of the player who wins the game (or None)
+# - message: (string) message explaining why it's the end of the game
+Record = namedtuple('Record', 'gameClass name tournament seed startTime options players moves winner message')
+
+
+
+# ==================
+#   binary format
+# ==================
+def writeVarint(buf, n):
+	"""Append an unsigned integer to buf (bytearray), with 7 bits per octet (LEB128)"""
+	while n > 0x7F:
+		buf.append((n & 0x7F) | 0x80)
+		n >>= 7
+	buf.append(n)
+
+
+def readVarint(data, pos):
+	"""Read an unsigned integer (see writeVarint) at the position pos of data; returns the integer and the new position"""
+	n = shift = 0
+	while True:
+		octet = data[pos]
+		pos += 1
+		n |= (octet & 0x7F) << shift
+		if octet < 0x80:
+			return n, pos
+		shift += 7
+
+
+def writeString(buf, s):
+	"""Append a string to buf (its length, then its utf-8 encoding)"""
+	b = s.encode('utf8')
+	writeVarint(buf, len(b))
+	buf += b
+
+
+def readString(data, pos):
+	"""Read a string (see writeString); returns the string and the new position"""
+	size, pos = readVarint(data, pos)
+	return data[pos:pos + size].decode('utf8'), pos + size
+
+
+def writeMoves(buf, moves):
+	"""
+	Append a list of moves (move, return_code, time) to buf: the number of moves, then the lengths of the moves (2
+	octets each), the return codes (shifted by one, so they are not negative; 1 octet each), the time between two moves
+	(in ms; 4 octets each), and the moves (utf-8)
+	(the columns are packed at once, and are then well compressed; the times are given by the monotonic clock, so
+	they never decrease)
+	"""
+	n = len(moves)
+	writeVarint(buf, n)
+	if not n:
+		return
+	strings, codes, times = zip(*moves)
+	strings = list(map(str.encode, strings))
+	buf += pack('!%dH' % n, *map(len, strings))
+	buf += bytes(map((1).__add__, codes))
+	buf += pack('!%dI' % n, *map(sub, times, (0,) + times))
+	buf += b''.join(strings)
+
+
+def readMoves(data, pos):
+	"""Read a list of moves (see writeMoves); returns the list and the new position"""
+	n, pos = readVarint(data, pos)
+	if not n:
+		return [], pos
+	lengths = unpack_from('!%dH' % n, data, pos)
+	pos += 2 * n
+	codes = data[pos:pos + n]
+	pos += n
+	deltas = unpack_from('!%dI' % n, data, pos)
+	pos += 4 * n
+	moves = []
+	t = 0
+	for length, code, delta in zip(lengths, codes, deltas):
+		t += delta
+		moves.append((data[pos:pos + length].decode('utf8'), code - 1, t))
+		pos += length
+	return moves, pos
+
+
+def encodeMoves(moves):
+	"""Encode (and compress) a list of moves, to send it to another process (see server/Player/Worker.py)"""
+	buf = bytearray()
+	writeMoves(buf, moves)
+	return zlib.compress(bytes(buf))
+
+
+def decodeMoves(data):
+	"""Decode a list of moves encoded by encodeMoves"""
+	return readMoves(zlib.decompress(data), 0)[0]
+
+
+def encodeRecord(record):
+	"""
+	Encode a record (binary): version, strings, integers (see writeVarint and writeString) and moves (see writeMoves);
+	the winner is shifted by one (0 when there is no winner)
+	The encoded record is compressed (deflate)
+	Returns the bytes
+	"""
+	buf = bytearray((RECORD_VERSION,))
+	for s in (record.gameClass, record.name, record.tournament) + tuple(record.players):
+		writeString(buf, s)
+	writeVarint(buf, record.seed)
+	buf += DOUBLE.pack(record.startTime)
+	writeVarint(buf, len(record.options))
+	for key, value in record.options.items():
+		writeString(buf, key)
+		writeString(buf, value)
+	writeMoves(buf, record.moves)
+	writeVarint(buf, 0 if record.winner is None else record.winner + 1)
+	writeString(buf, record.message)
+	return zlib.compress(bytes(buf))
+
+
+def decodeRecord(data):
+	"""Decode a record (see encodeRecord); returns the Record"""
+	data = zlib.decompress(data)
+	if data[0] != RECORD_VERSION:
+		raise ValueError("The version of the record (%d) is not supported" % data[0])
+	pos = 1
+	strings = []
+	for _ in range(5):
+		s, pos = readString(data, pos)
+		strings.append(s)
+	gameClass, name, tournament, player1, player2 = strings
+	seed, pos = readVarint(data, pos)
+	startTime, = DOUBLE.unpack_from(data, pos)
+	pos += DOUBLE.size
+	nbOptions, pos = readVarint(data, pos)
+	options = {}
+	for _ in range(nbOptions):
+		key, pos = readString(data, pos)
+		options[key], pos = readString(data, pos)
+	moves, pos = readMoves(data, pos)
+	winner, pos = readVarint(data, pos)
+	message, pos = readString(data, pos)
+	return Record(gameClass, name, tournament, seed, startTime, options, (player1, player2), moves,
+	              None if winner == 0 else winner - 1, message)
+
+
+
+# ==================
+#   archive
+# ==================
+class Archive:
+	"""
+	Append-only archive of the records of the games
+	The records are appended to the last segment (files segment-000000.cga, segment-000001.cga, etc.), and a line is
+	appended to the index (file index.tsv) for each record: name of the game, segment, offset, size, names of the
+	players, time and winner (separated by tabulations); the index is loaded in memory when the archive is opened
+	Nothing is recorded while the archive is not opened (simulations, benchmarks and worker processes, since the
+	main process records the games played by the workers)
+
+	Attributes:
+	- _path: folder of the archive (None if the archive is not opened)
+	- _lock: lock used to append a record (the games may end in different threads)
+	- _segment: (int) number of the last segment
+	- _file: the last segment (opened in append mode)
+	- _index: dictionary name of the game -> (segment, offset, size)
+	- _byPlayer: dictionary name of the player -> list of the names of its games (oldest first)
+	- _indexFile: the index (opened in append mode)
+	"""
+
+	def __init__(self):
+		self._path = None
+		self._lock = Lock()
+		self._segment = 0
+		self._file = None
+		self._indexFile = None
+		self._index = {}
+		self._byPlayer = {}
+
+
+	def open(self, path):
+		"""
+		Open the archive in the folder path (created if needed), and load its index
+		"""
+		with self._lock:
+			makedirs(path, exist_ok=True)
+			self._index.clear()
+			self._byPlayer.clear()
+			try:
+				with open(join(path, 'index.tsv'), encoding='utf8') as f:
+					for line in f:
+						fields = line.rstrip('\n').split('\t')
+						if len(fields) == 8:
+							self._addToIndex(fields[0], int(fields[1]), int(fields[2]), int(fields[3]), fields[4:6])
+			except FileNotFoundError:
+				pass
+			segments = [int(f[8:14]) for f in listdir(path) if f.startswith('segment-') and f.endswith('.cga')]
+			self._segment = max(segments, default=0)
+			self._path = path
+			self._file = open(self._segmentPath(self._segment), 'ab')
+			self._indexFile = open(join(path, 'index.tsv'), 'a', encoding='utf8')
+		logger.info("The archive %s is opened (%d games)", path, len(self._index))
+
+
+	def close(self):
+		"""Close the archive (nothing is recorded anymore)"""
+		with self._lock:
+			if self._path is not None:
+				self._file.close()
+				self._indexFile.close()
+				self._path = None
+
+
+	@property
+	def isOpen(self):
+		"""Returns True if the archive is opened (the games are recorded)"""
+		return self._path is not None
+
+
+	def _segmentPath(self, segment):
+		"""Returns the path of a segment"""
+		return join(self._path, 'segment-%06d.cga' % segment)
+
+
+	def _addToIndex(self, name, segment, offset, size, players):
+		"""Add a record to the index (in memory)"""
+		self._index[name] = (segment, offset, size)
+		for p in set(players):
+			self._byPlayer.setdefault(p, []).append(name)
+
+
+	def record(self, game):
+		"""
+		Record a game that is over (nothing is done if the archive is not opened)
+		Parameters:
+		- game: the game (its getRecord method gives its record)
+		"""
+		if self._path is None:
+			return
+		record = game.getRecord()
+		data = encodeRecord(record)
+		with self._lock:
+			if self._path is None:
+				return
+			# start a new segment when the last one is full
+			offset = self._file.tell()
+			if offset and offset + FRAME.size + len(data) > SEGMENT_SIZE:
+				self._file.close()
+				self._segment += 1
+				self._file = open(self._segmentPath(self._segment), 'ab')
+				offset = 0
+			self._file.write(FRAME.pack(len(data)) + data)
+			self._file.flush()
+			# (the index is written after the record, so that it only refers to complete records)
+			self._indexFile.write("%s\t%d\t%d\t%d\t%s\t%s\t%d\t%s\n" % (
+				record.name, self._segment, offset, len(data), record.players[0], record.players[1],
+				record.startTime, '-' if record.winner is None else record.winner))
+			self._indexFile.flush()
+			self._addToIndex(record.name, self._segment, offset, len(data), record.players)
+
+
+	def isRecorded(self, name):
+		"""
+		Returns True if a game is in the archive
+		Parameters:
+		- name: (string) name of the game
+		"""
+		return name in self._index
+
+
+	def getRecord(self, name):
+		"""
+		Returns the record of a game (or None if the game is not in the archive)
+		Parameters:
+		- name: (string) name of the game
+		"""
+		with self._lock:
+			if self._path is None or name not in self._index:
+				return None
+			segment, offset, size = self._index[name]
+			path = self._segmentPath(segment)
+		with open(path, 'rb') as f:
+			f.seek(offset + FRAME.size)
+			return decodeRecord(f.read(size))
+
+
+	def getGames(self, player):
+		"""
+		Returns the names of the games of a player (the most recent first)
+		Parameters:
+		- player: (string) name of the player
+		"""
+		with self._lock:
+			return self._byPlayer.get(player, [])[::-1]
+
+
+	def getDictInformations(self):
+		"""
+		Returns a dictionary with the number of games recorded, the number of segments and the size of the archive
+		"""
+		with self._lock:
+			if self._path is None:
+				return {'games': 0, 'segments': 0, 'size': 0}
+			self._file.flush()
+			return {'games': len(self._index), 'segments': self._segment + 1,
+			        'size': sum(getsize(self._segmentPath(s)) for s in range(self._segment + 1))}
+
+
+
+def replayGame(record):
+	"""
+	Play again a recorded game: the game is created again from its seed and options (with two training players that
+	have the names of the players), and the recorded moves are given to its updateGame method (see Game.replayMove)
+	Parameters:
+	- record: (Record) the record of the game
+	Returns the game and the list of the steps, where a step is a tuple (informations, move, who, return_code, time)
+	- informations: dictionary of informations about the game after the move (see getDictInformations), used by the
+	web page of the game
+	- move, return_code, time: the recorded move (the first step, before the first move, has no move)
+	- who: number of the player who plays the move
+	Raises a ValueError if the game cannot be replayed (it is not a game of the server, or a move gives another return
+	code than the recorded one)
+	"""
+	# (imported here, since the games import the archive)
+	from server.Game import Game
+	from server.Player import TrainingPlayer
+
+	gameClass = Game.getTheGameClass()
+	if record.gameClass != gameClass.__name__:
+		raise ValueError("The game %s is a game of %s (not %s)" % (record.name, record.gameClass, gameClass.__name__))
+	players = [TrainingPlayer(name) for name in record.players]
+	game = gameClass(*players, replay=record.name, **dict(record.options, seed=record.seed, start=0))
+	steps = [(game.getDictInformations(), None, None, None, 0)]
+	for n, (move, return_code, t) in enumerate(record.moves):
+		who = game.playerWhoPlays is players[1]
+		code = game.replayMove(move)
+		if code != return_code:
+			raise ValueError("The move #%d of the game %s (%s) gives another result than the recorded one (the rules of "
+			                 "the game may have changed)" % (n + 1, record.name, move))
+		steps.append((game.getDictInformations(), move, int(who), return_code, t))
+	return game, steps
+
+
+# archive of the finished games
+archive = Archive()
@@ -19,6 +19,7 @@ Copyright 2016-2017 T. Hilaire, J. Brajard
 import logging
 from geventwebsocket import WebSocketError
 import json
+from server.Broadcaster import broadcaster
 from server.Logger import configureBaseClassLogger
 logger = logging.getLogger()
 
@@ -161,14 +162,27 @@ class BaseClass:
 		"""
 		Send list of instances through all the websockets (or only one if given)
 		Called everytime the list of instances is changed
+		(the list is sent to all the websockets by the broadcaster, see server/Broadcaster.py)
 		Parameters:
-		- wsock: (websocket) if None, the data is sent to all the websockets, otherwise only to this one
+		- wsock: (websocket) if None, the data is sent to all the websockets, otherwise only to this one (now)
 		"""
+		if wsock is not None:
+			BaseClass._sendListofInstances([wsock])
+		elif BaseClass._LoIWebSockets:
+			broadcaster.publish(BaseClass, BaseClass._sendListofInstances)
+
+
+	@staticmethod
+	def _sendListofInstances(lws=None):
+		"""
+		Send the list of instances through the websockets lws (all the LoI websockets if None)
+		"""
+		lws = list(BaseClass._LoIWebSockets) if lws is None else lws
+		if not lws:
+			return
 		d = {cls.__name__: [obj.HTMLrepr() for obj in cls.allInstances.values()] for cls in BaseClass.__subclasses__()}
 		js = json.dumps(d)
 		logger.low_debug("send List of instances : {%s}" % (d.keys(),))
-		# send to all the websockets or only to one
-		lws = BaseClass._LoIWebSockets if wsock is None else [wsock]
 		for ws in lws:
 			try:
 				ws.send(js)
@@ -209,13 +223,27 @@ class BaseClass:
 		"""
 		Send some informations about self through all the websockets (or only one, if wsock is specified)
 		Called everytime the object (self) is changed
+		The update is only published to the broadcaster (see server/Broadcaster.py), that sends it later from its own
+		thread (so that a slow browser does not slow the game); the updates published before it is sent are coalesced
 		Parameters:
-		- wsock: (websocket) if None, the data is sent to all the websockets, otherwise only to this one
+		- wsock: (websocket) if None, the data is sent to all the websockets, otherwise only to this one (now)
 		"""
-		js = json.dumps(self.getDictInformations())
+		if wsock is not None:
+			self._sendUpdate([wsock])
+		elif self._lwsocks:
+			broadcaster.publish(self, self._sendUpdate)
+
+
+	def _sendUpdate(self, lws=None):
+		"""
+		Send the informations about self through the websockets lws (all the websockets of the object if None)
+		(the informations are converted in json once, for all the websockets)
+		"""
+		lws = list(self._lwsocks) if lws is None else lws
+		if not lws:
+			return
+		js = json.dumps(self.getWebSocketInformations())
 		logger.low_debug("send information to webseocket")
-		# send to all the websockets or only to one
-		lws = self._lwsocks if wsock is None else [wsock]
 		for ws in lws:
 			try:
 				ws.send(js)
@@ -224,6 +252,14 @@ class BaseClass:
 				self.removeWebSocket(ws)
 
 
+	def getWebSocketInformations(self):
+		"""
+		Returns the informations (a dictionary) sent to the websockets of the object
+		(the informations of getDictInformations, by default)
+		"""
+		return self.getDictInformations()
+
+
 	def getDictInformations(self):
 		"""
 		Send information (a dictionary) about the object
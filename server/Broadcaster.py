@@ -0,0 +1,104 @@
+"""
+* --------------------- *
+|                       |
+|   Coding Game Server  |
+|                       |
+* --------------------- *
+
+Authors: T. Hilaire, J. Brajard
+Licence: GPL
+
+File: Broadcaster.py
+	Contains the class Broadcaster, and the broadcaster of the process (broadcaster)
+	-> the updates of the objects (games, players, tournaments, and the list of instances) shown by the webpages are
+	sent to the websockets by a thread of the broadcaster (a greenlet, since the webserver monkey-patches with gevent),
+	so that a slow browser does not slow the games down
+	-> the updates are coalesced: an object that changes several times before its update is sent is only sent once,
+	with its latest state (the informations are built and converted in json once per update, for all its websockets)
+
+Copyright 2016-2017 T. Hilaire, J. Brajard
+"""
+
+import logging
+from threading import Thread, Condition
+from time import perf_counter
+
+logger = logging.getLogger()  # general logger ('root')
+
+
+
+class Broadcaster:
+	"""
+	Send the updates of the objects to the websockets, from its own thread
+	An update is published with the object (the key) and the function that sends its latest state to the websockets;
+	while the update is pending, the next publications of the same object are coalesced with it
+	The thread is started with the first update (a worker process has no websocket, so it never starts it)
+
+	Attributes:
+	- _cond: condition used to wait for the updates (and that protects the counters)
+	- _thread: the thread that sends the updates (None if not started)
+	- _pending: dictionary object -> function, of the updates to send (in the order of their first publication)
+	- _nbPublished, _nbSent, _time: number of updates published, number of updates sent and time spent to send them
+	(in seconds)
+	"""
+
+	def __init__(self):
+		self._cond = Condition()
+		self._thread = None
+		self._pending = {}
+		self._nbPublished = 0
+		self._nbSent = 0
+		self._time = 0.0
+
+
+	def publish(self, obj, send):
+		"""
+		Publish an update of an object (O(1), the update is sent later by the thread of the broadcaster)
+		Parameters:
+		- obj: the object that has changed
+		- send: function (without parameter) that sends the latest state of the object to its websockets
+		"""
+		with self._cond:
+			self._nbPublished += 1
+			if obj not in self._pending:
+				self._pending[obj] = send
+				self._cond.notify()
+			if self._thread is None or not self._thread.is_alive():
+				self._thread = Thread(target=self.run, name="Broadcaster", daemon=True)
+				self._thread.start()
+
+
+	def run(self):
+		"""
+		Send the updates (thread): all the updates pending are taken at once, and sent one after the other
+		"""
+		while True:
+			with self._cond:
+				while not self._pending:
+					self._cond.wait()
+				updates = list(self._pending.values())
+				self._pending.clear()
+			t0 = perf_counter()
+			for send in updates:
+				try:
+					send()
+				except Exception as err:
+					logger.error("Error while sending an update to the websockets: %s", err, exc_info=True)
+			with self._cond:
+				self._nbSent += len(updates)
+				self._time += perf_counter() - t0
+
+
+	def getDictInformations(self):
+		"""
+		Returns a dictionary with the number of updates published, sent (the others have been coalesced) and pending, and
+		the time spent per update sent (in µs)
+		"""
+		with self._cond:
+			return {'published': self._nbPublished, 'sent': self._nbSent, 'pending': len(self._pending),
+			        'timePerUpdate': 1e6 * self._time / max(self._nbSent, 1)}
+
+
+
+# broadcaster of this process
+broadcaster = Broadcaster()
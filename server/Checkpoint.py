@@ -0,0 +1,318 @@
+"""
+* --------------------- *
+|                       |
+|   Coding Game Server  |
+|                       |
+* --------------------- *
+
+Authors: T. Hilaire, J. Brajard
+Licence: GPL
+
+File: Checkpoint.py
+	Contains the classes RestoredGame and Checkpointer, and the checkpointer of the process (checkpointer)
+	-> the running games are saved in a folder (snapshots), so that they are not lost when the server stops (crash or
+	restart in the middle of a tournament)
+	-> a snapshot is the pickled state of the game (board, positions, energy, who plays, comments, moves and random
+	generator, see Game.getSnapshot); every CHECKPOINT_PERIOD seconds, a thread takes the snapshots of the games that
+	have changed since their last snapshot only (see Game.version), and writes the snapshots of all the games of the
+	process in one file (the snapshots of the other games are kept in memory)
+	-> when the server starts, the games are restored from their snapshots, and each one waits for its regular players:
+	when they are all connected again (with the same names, see rejoin), the game continues where it has stopped
+	-> each process saves the games it plays in its own file (a worker process saves its games, see
+	server/Player/Worker.py)
+
+Copyright 2016-2017 T. Hilaire, J. Brajard
+"""
+
+import logging
+import pickle
+from os import makedirs, listdir, remove, replace, getpid
+from os.path import join
+from threading import Thread, Lock
+from time import sleep, perf_counter
+
+from server.Game import Game
+from server.TimerWheel import timerWheel
+
+logger = logging.getLogger()  # general logger ('root')
+
+
+CHECKPOINT_PERIOD = 1           # time (in seconds) between two checkpoints
+RESTORE_DELAY = 600             # time (in seconds) given to the players of a restored game to connect again
+
+
+
+class RestoredGame:
+	"""
+	A game restored from its snapshot, that waits for its regular players (see Checkpointer.rejoin)
+	- game: the game
+	- players: list of the two players (the name of a regular player, until it is connected again)
+	- names: list of the names of the regular players (None for a training player)
+	- timer: timer (of the timer wheel) that gives up the game if the players do not come back
+	"""
+
+	def __init__(self, game, players):
+		self.game = game
+		self.players = players
+		self.names = [p if isinstance(p, str) else None for p in players]
+		self.timer = None
+
+
+
+class Checkpointer:
+	"""
+	Save the snapshots of the running games of the process, and restore them
+	The file of the process (snapshots-<pid>.snap in the folder of the checkpointer) contains a pickled dictionary
+	name of the game -> (version, snapshot); it is written in a temporary file and then renamed, so that it is always
+	complete
+	Nothing is saved while the checkpointer is not opened (simulations and benchmarks)
+
+	Attributes:
+	- _path: folder of the snapshots (None if the checkpointer is not opened)
+	- _lock: lock used for the restored games and the counters
+	- _thread: the thread that writes the snapshots (None if not started)
+	- _snapshots: dictionary name of the game -> (version, snapshot) of the last snapshot of the games of the process
+	(only used by the thread, and by restoreGames before the thread is started)
+	- _pending: dictionary name of a player -> restored game that waits for this player
+	- _nbSnapshots, _nbChanges, _nbFiles, _size, _time: number of snapshots taken, number of changes of the games they
+	contain, number of files written, their size (in octets) and time spent to take and write them (in seconds)
+	- _nbIdle, _idleTime: number of checkpoints where nothing has changed, and time spent to check the games (in seconds)
+	"""
+
+	def __init__(self):
+		self._path = None
+		self._lock = Lock()
+		self._thread = None
+		self._snapshots = {}
+		self._pending = {}
+		self._nbSnapshots = 0
+		self._nbChanges = 0
+		self._nbFiles = 0
+		self._size = 0
+		self._time = 0.0
+		self._nbIdle = 0
+		self._idleTime = 0.0
+
+
+	def open(self, path):
+		"""
+		Open the folder path (created if needed) for the snapshots
+		(it should be opened before the creation of the workers, so that they save their games in it)
+		"""
+		makedirs(path, exist_ok=True)
+		self._path = path
+		logger.info("The snapshots of the games are saved in %s", path)
+
+
+	def start(self):
+		"""
+		Start the thread that writes the snapshots (in the current process), if the checkpointer is opened
+		"""
+		if self._path is not None and (self._thread is None or not self._thread.is_alive()):
+			self._thread = Thread(target=self.run, name="Checkpointer", daemon=True)
+			self._thread.start()
+
+
+	@property
+	def isOpen(self):
+		"""Returns True if the checkpointer is opened (the games are saved)"""
+		return self._path is not None
+
+
+	def _filePath(self):
+		"""Returns the path of the file of the snapshots of the process"""
+		return join(self._path, 'snapshots-%d.snap' % getpid())
+
+
+	def run(self):
+		"""
+		Write the snapshots (thread), every CHECKPOINT_PERIOD seconds
+		"""
+		while True:
+			sleep(CHECKPOINT_PERIOD)
+			try:
+				self.checkpoint()
+			except Exception as err:
+				logger.error("Error while saving the snapshots of the games: %s", err, exc_info=True)
+
+
+	def checkpoint(self):
+		"""
+		Take the snapshots of the games (of the current process) that have changed since their last snapshot, forget the
+		games that are over, and write the file of the snapshots (if something has changed)
+		The game is only locked while its state is pickled (see Game.getSnapshot)
+		Returns the number of snapshots taken
+		"""
+		t0 = perf_counter()
+		# (the snapshots of the restored games that wait for their players are kept)
+		with self._lock:
+			running = {restoredGame.game.name for restoredGame in self._pending.values()}
+		taken = changes = 0
+		for game in list(Game.allInstances.values()):
+			# (a game played by a worker process is saved by the worker)
+			if game.remote is not None or game.isOver:
+				continue
+			running.add(game.name)
+			last = self._snapshots.get(game.name)
+			if last is not None and last[0] == game.version:
+				continue
+			self._snapshots[game.name] = game.getSnapshot()
+			changes += self._snapshots[game.name][0] - (last[0] if last else 0)
+			taken += 1
+
+		# the games that are over (or removed, or played by a worker)
+		over = self._snapshots.keys() - running
+		for name in over:
+			del self._snapshots[name]
+
+		size = self._writeFile() if taken or over else 0
+
+		# (the time of a checkpoint where nothing has changed is counted apart, so that the time per snapshot is the cost
+		# of the changes only)
+		with self._lock:
+			if taken or over:
+				self._nbSnapshots += taken
+				self._nbChanges += changes
+				self._nbFiles += 1 if size else 0
+				self._size += size
+				self._time += perf_counter() - t0
+			else:
+				self._nbIdle += 1
+				self._idleTime += perf_counter() - t0
+		return taken
+
+
+	def _writeFile(self):
+		"""
+		Write the file of the snapshots of the process (or remove it if there is no game)
+		Returns the size of the file
+		"""
+		path = self._filePath()
+		if not self._snapshots:
+			self._removeFile(path)
+			return 0
+		data = pickle.dumps(self._snapshots, pickle.HIGHEST_PROTOCOL)
+		with open(path + '.tmp', 'wb') as f:
+			f.write(data)
+		replace(path + '.tmp', path)
+		return len(data)
+
+
+	@staticmethod
+	def _removeFile(path):
+		"""Remove a file (if it exists)"""
+		try:
+			remove(path)
+		except FileNotFoundError:
+			pass
+
+
+	def restoreGames(self):
+		"""
+		Restore the games from the files of the folder (the games that were running when the server has stopped; the
+		last snapshot of a game is taken when it is in several files), and move them in the file of the process
+		Each game waits for its regular players (see rejoin) during RESTORE_DELAY seconds
+		(it should be called before the thread is started)
+		Returns the number of games restored
+		"""
+		if self._path is None:
+			return 0
+		files = [join(self._path, f) for f in listdir(self._path) if f.endswith('.snap')]
+		snapshots = {}
+		for path in list(files):
+			try:
+				with open(path, 'rb') as f:
+					for name, (version, data) in pickle.load(f).items():
+						if name not in snapshots or snapshots[name][0] < version:
+							snapshots[name] = (version, data)
+			except Exception as err:
+				logger.error("The snapshots of %s cannot be read (%s)", path, err)
+				files.remove(path)
+
+		gameClass = Game.getTheGameClass()
+		for name, (version, data) in sorted(snapshots.items()):
+			try:
+				game, players = Game.loadSnapshot(data)
+				if not isinstance(game, gameClass):
+					raise ValueError("it is not a game of %s" % gameClass.__name__)
+			except Exception as err:
+				logger.error("The game %s cannot be restored from its snapshot (%s)", name, err)
+				continue
+			restoredGame = RestoredGame(game, players)
+			with self._lock:
+				for p in restoredGame.names:
+					if p is not None:
+						self._pending[p] = restoredGame
+				restoredGame.timer = timerWheel.schedule(RESTORE_DELAY, self._giveUp, restoredGame)
+			self._snapshots[name] = (version, data)
+			logger.message("The game %s is restored, and waits for %s", name,
+			               " and ".join("'%s'" % p for p in restoredGame.names if p is not None))
+
+		# the restored games are now in the file of this process
+		self._writeFile()
+		for path in files:
+			if path != self._filePath():
+				self._removeFile(path)
+		return len(self._snapshots)
+
+
+	def rejoin(self, player):
+		"""
+		Called when a regular player waits for a game (see PlayerSocket.parseWaitGame): if it was playing a restored
+		game, it takes its place again, and the game continues when all its regular players are back
+		Parameters:
+		- player: (RegularPlayer) the player
+		Returns True if the player is in a restored game (False otherwise)
+		"""
+		with self._lock:
+			restoredGame = self._pending.get(player.name)
+			if restoredGame is None:
+				return False
+			# (a player that has been disconnected while waiting for its opponent is replaced)
+			players = restoredGame.players
+			players[restoredGame.names.index(player.name)] = player
+			if any(isinstance(p, str) for p in players) or not restoredGame.timer.cancel():
+				return True
+		# all the players are back (the game is only removed from the pending games once it is restored, so that its
+		# snapshot is kept)
+		game = restoredGame.game
+		game.restore(players)
+		with self._lock:
+			for name in restoredGame.names:
+				if name is not None:
+					del self._pending[name]
+		game.logger.message("The game %s continues (restored from its snapshot)", game.name)
+		return True
+
+
+	def _giveUp(self, restoredGame):
+		"""
+		Called by the timer wheel when the players of a restored game have not come back in time: the game is dropped
+		(and its snapshot is removed by the next checkpoint)
+		"""
+		with self._lock:
+			for name in restoredGame.names:
+				self._pending.pop(name, None)
+			names = [p for p in restoredGame.players if isinstance(p, str)]
+		logger.message("The restored game %s is dropped (%s did not come back)", restoredGame.game.name,
+		               " and ".join("'%s'" % name for name in names))
+
+
+	def getDictInformations(self):
+		"""
+		Returns a dictionary with the number of games saved and restored (waiting for their players), the number of
+		snapshots taken and of files written, the size of the files written, the time spent per change of a game
+		(move or comment) and per snapshot (in µs), and the number of checkpoints where nothing has changed, with the
+		time spent per such checkpoint (in µs)
+		"""
+		with self._lock:
+			return {'games': len(self._snapshots), 'restored': len(set(self._pending.values())),
+			        'snapshots': self._nbSnapshots, 'files': self._nbFiles, 'size': self._size,
+			        'timePerChange': 1e6 * self._time / max(self._nbChanges, 1),
+			        'timePerSnapshot': 1e6 * self._time / max(self._nbSnapshots, 1),
+			        'idle': self._nbIdle, 'timePerIdle': 1e6 * self._idleTime / max(self._nbIdle, 1)}
+
+
+
+# checkpointer of this process
+checkpointer = Checkpointer()
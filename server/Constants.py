@@ -28,6 +28,31 @@ LOSING_MOVE = -1
 
 # Formatting string indicating  the length of the message
 SIZE_FMT = "%04d"
+# Formatting string indicating the length of a compressed message (game data and display, with the compression option)
+LARGE_SIZE_FMT = "%08d"
 
 # Maximum number of comments per player
 MAX_COMMENTS = 5
+
+# Rate limits of the commands sent by a client (token buckets, per connection, see server/Player/RateLimiter.py)
+# kind of command -> (rate, burst): `rate` commands per second on average, and at most `burst` commands in a row
+# ('*' is for all the commands of the connection)
+RATE_LIMITS = {'*': (2000, 4000), 'DISP_GAME': (20, 50), 'SEND_COMMENT': (2, 10), 'WAIT_GAME': (20, 50)}
+# the commands over the limits are delayed; they are rejected when the client keeps sending commands without waiting
+# for the answers while it is slowed down, for more than ABUSE_DURATION seconds in a row
+ABUSE_DURATION = 10
+
+# Deadlines of the connections (see server/Player/Reaper.py): the connection is closed when the client does not send
+# a command for IDLE_TIMEOUT seconds outside a game (the players waiting for a game are not concerned), or for the
+# timeout of the game plus REAP_MARGIN seconds during a game (the game ends first, with the usual timeout)
+IDLE_TIMEOUT = 600
+REAP_MARGIN = 5
+# TCP keepalive of the connections: the first probe after KEEPALIVE_IDLE seconds of silence, then KEEPALIVE_COUNT probes
+# every KEEPALIVE_INTERVAL seconds
+KEEPALIVE_IDLE = 60
+KEEPALIVE_INTERVAL = 10
+KEEPALIVE_COUNT = 5
+
+# Time (in seconds) between two updates of a game played by a worker process, sent to the front process (the new moves,
+# the comments and the clocks, see server/Player/Worker.py)
+WORKER_UPDATE_PERIOD = 0.1
@@ -16,33 +16,19 @@ Copyright 2016-2017 T. Hilaire, J. Brajard
 """
 
 
-import time as timemod
-from datetime import datetime
-from random import seed as set_seed, randint, choice
-from threading import Barrier, BrokenBarrierError
-from time import time
-
+import pickle
+from copy import deepcopy
+from itertools import count
+from logging import getLogger
+from random import Random, randint
+from threading import Condition
+from time import time, monotonic
+
+from server.Archive import archive, Record
 from server.Comments import CommentQueue
 from server.Constants import NORMAL_MOVE, WINNING_MOVE, LOSING_MOVE, TIMEOUT_TURN, MAX_COMMENTS
 from server.BaseClass import BaseClass
-
-
-def crc24(octets):
-	"""
-	Compute a CRC 24 bits hash
-	Credits Karl Knechtel
-	http://stackoverflow.com/questions/4544154/crc24-from-c-to-python
-	"""
-	INIT = 0xB704CE
-	POLY = 0x1864CFB
-	crc = INIT
-	for octet in octets:
-		crc ^= (octet << 16)
-		for i in range(8):
-			crc <<= 1
-			if crc & 0x1000000:
-				crc ^= POLY
-	return crc & 0xFFFFFF
+from server.TimerWheel import timerWheel
 
 
 def hex6(x):
@@ -53,6 +39,24 @@ def hex6(x):
 	return h[-6:]   # get the 6 last characters
 
 
+# counter of the games created by the server (next() is atomic, so two threads never get the same number)
+# it starts from the time, so that the names of the games differ from one run of the server to another (the names of
+# the games of the archive are skipped anyway, see Game.__init__)
+_gameCounter = count(int(time()))
+ID_MULTIPLIER = 0x5851F5        # (odd) multiplier that scrambles the counter (bijection of the integers modulo 2^24)
+
+
+def gameName(seed):
+	"""
+	Returns a new (unique) name for a game with a given seed, composed by
+	- the first 6 characters are the seed (in hexadecimal),
+	- the 6 next characters are the number of the game (counter) scrambled with the seed (hexadecimal)
+	For a given seed, the 6 last characters are a bijection of the counter (modulo 2^24), so the name is unique
+	among the last 16777216 games created (without lock, hash or sleep) of the run of the server
+	"""
+	return hex6(seed) + hex6(((next(_gameCounter) * ID_MULTIPLIER) ^ seed) & 0xFFFFFF)
+
+
 class Game(BaseClass):
 	"""
 	Game class
@@ -63,10 +67,32 @@ class Game(BaseClass):
 	- _players: tuple of the two players (player0 and player1)
 	- _logger: logger to use to log infos, debug, ...
 	- _name: name of the game
+	- _seed: seed of the game
+	- _rng: random generator of the game (random.Random seeded with the seed), used by the board and the training players
 	- _whoPlays: number of the player who should play now (0 or 1)
+	- _whoStarts: number of the player who plays first (0, or the player who was playing for a game restored from its
+	snapshot), sent to the players with the game data
 	- _waitingPlayer: Event used to wait for the player
 	- _lastMove: string corresponding to the last move
+	- _mailbox: the last move not yet read by the opponent of its author (tuple (author, move, return_code)), or None
+	- _moveReady: Condition used to wait for a move in the mailbox (or for the end of the game)
+	- _delay: delay (in ms) between two moves (to let the time to see the game)
+	- _nextMoveTime: time (monotonic clock) before which the last move is not given to the opponent (see getLastMove)
+	- _deadline: timer (of the timer wheel) of the move of the regular player who plays (or None), see _armDeadline
+	- _clock: list of the time (in s) left on the clock of each player (or None when the game has no clock, and each
+	move has the timeout of the game), see _armDeadline and _chargeClock
+	- _increment: time (in s) added to the clock of a player after each of its moves
+	- _turnStart: time (monotonic clock) when the clock of the player who plays has started (when it gets the move)
+	- _whoWins: number of the player who wins the game (None until the end of the game)
+	- _finished: True when the players have left the game (that is over)
 	- _tournament: (Tournament) the tournament the game is involved in (or None no tournament)
+	- _options: options of the game (as strings), except the seed and who starts (kept for the record of the game)
+	- _startTime, _startClock: time (epoch) and time (monotonic clock) of the start of the game
+	- _moves: list of the moves played (tuple (move, return_code, time), where time is the time (in ms) since the start)
+	- _endMessage: message explaining why it's the end of the game ('' until the end of the game)
+	- _version: number of changes of the game (moves, comments and delay), used to only save the snapshots of the games
+	that have changed (see getSnapshot)
+	- remote: (WorkerPool) the worker pool when the game is played by a worker process (or None)
 
 	"""
 
@@ -81,10 +107,16 @@ class Game(BaseClass):
 		Parameters:
 		- player1, player2: two Player (the order will be changed according who begins)
 		- options: dictionary of options
-			- 'seed': seed of the labyrinth (same seed => same labyrinth); used as seed for the random generator
+			- 'seed': seed of the labyrinth (same seed => same labyrinth); used as seed for the random generator of the game
+			(see initRandom)
 			- 'timeout': timeout of the game (if not given, the default timeout is used)
+			- 'clock': time (in s) given to each player for the whole game (chess clock), instead of a timeout per move
+			(no clock if not given or empty)
+			- 'increment': time (in s) added to the clock of a player after each of its moves (0 if not given)
 			- 'start': who starts the game (0, 1 or -1); random when not precised or '-1'
-			# TODO: add a delay/pause option (in second)
+			- 'delay': delay (in ms) between two moves (0 if not given)
+			- 'replay': the name of a recorded game, when the game is only created to play it again (see
+			server/Archive.py): the game has that name, and it is not registered, not logged and its moves are not recorded
 		"""
 
 		# check if we can create the game (are the players available)
@@ -95,58 +127,56 @@ class Game(BaseClass):
 		if player1.game is not None or player2.game is not None:
 			raise ValueError("Players already play in a game")
 
+		# random generator of the game (if it has not been created by the child class, before creating the board)
+		if getattr(self, '_rng', None) is None:
+			self.initRandom(options)
+		seed = self._seed
+
 		# players
 		# we randomly decide the order of the players
 		if 'start' not in options:
-			pl = choice((0, 1))
+			pl = self._rng.choice((0, 1))
 		else:
 			try:
 				pl = int(options['start'])
 				if pl == -1:
-					pl = choice((0, 1))
+					pl = self._rng.choice((0, 1))
 			except ValueError:
 				raise ValueError("The 'start' option must be '0', '1' or '-1'")
 		self._players = (player1, player2) if pl == 0 else (player2, player1)
 
 
-
-		# get a seed if the seed is not given; seed the random numbers generator
-		if 'seed' not in options:
-			set_seed(None)  # (from doc):  If seed is omitted or None, current system time is used
-			seed = randint(0, 16777215)     # between 0 and 2^24-1
+		# (unique) name of the game (see gameName)
+		# (a name already used by a game of the archive, in a previous run of the server, is skipped, so that this game
+		# can still be replayed)
+		replay = options.pop('replay', None)
+		if replay:
+			name = replay
 		else:
-			try:
-				seed = int(options['seed'])
-				if not 0 <= seed <= 16777215:
-					raise ValueError("The 'seed' value must be between 0 and 16777215 ('seed=%s'." % options['seed'])
-			except ValueError:
-				raise ValueError("The 'seed' value is invalid ('seed=%s')" % options['seed'])
-		set_seed(seed)
-
-
-		# (unique) name composed by
-		# - the first 6 characters are the seed (in hexadecimal),
-		# - the 6 next characters are hash (CRC24) of the time and names (hexadecimal)
-		ok = False
-		name = ""
-		while not ok:   # we need a loop just in case we are unlucky and two existing games have the same hash
-			fullName = str(int(time())) + player1.name + player2.name
-			name = hex6(seed)[2:] + hex6(crc24(bytes(fullName, 'utf8')))[2:]
-			ok = name not in self.allInstances
-			if not ok:
-				timemod.sleep(1)
+			name = gameName(seed)
+			while name in self.allInstances or archive.isRecorded(name):
+				name = gameName(seed)
 
 		# store the tournament
 		self._tournament = tournament
 
+		# record of the game (see getRecord)
+		self._options = {key: str(value) for key, value in options.items() if key not in ('seed', 'start')}
+		self._startTime = time()
+		self._startClock = monotonic()
+		self._moves = []
+		self._endMessage = ''
+
 		# determine who starts (player #0 ALWAYS starts)
 		self._whoPlays = 0
+		self._whoStarts = 0
 
 		# last move
 		self._lastMove = ""
 		self._lastReturn_code = 0
 
 		# set a delay after each move (to let the time to see the party)
+		# (no thread sleeps: the opponent gets the move when the delay is elapsed, see getLastMove)
 		if 'delay' not in options:
 			self._delay = 0
 		else:
@@ -155,6 +185,7 @@ class Game(BaseClass):
 			except ValueError:
 				self._delay = 0
 				# raise ValueError("The 'delay' value is invalid ('delay=%s')" % options['delay'])
+		self._nextMoveTime = 0
 
 		# time out for the move
 		if 'timeout' not in options:
@@ -164,14 +195,41 @@ class Game(BaseClass):
 				self._timeout = int(options['timeout'])
 			except ValueError:
 				raise ValueError("The 'timeout' value is invalid ('timeout=%s')" % options['timeout'])
-		# timestamp of the last move
-		self._lastMoveTime = datetime.now()     # used for the timeout when one player is a non-regular player
 
-		# Barrier used for the synchronization of the two players (during playMove and getMove)
-		self._sync = Barrier(2, timeout=self._timeout)
+		# chess clock (the time of a player runs from the time it gets the move, see _armDeadline, until it plays)
+		self._clock = None
+		self._increment = 0
+		self._turnStart = 0
+		if options.get('clock'):
+			try:
+				self._clock = [float(options['clock'])] * 2
+				self._increment = float(options.get('increment') or 0)
+			except ValueError:
+				raise ValueError("The 'clock' and 'increment' values are invalid ('clock=%s', 'increment=%s')" %
+				                 (options['clock'], options.get('increment')))
+			if self._clock[0] <= 0 or self._increment < 0:
+				raise ValueError("The 'clock' value must be positive, and the 'increment' value must not be negative")
+
+		# mailbox used to give a move to the opponent (the move posted by playMove is read by getLastMove)
+		self._mailbox = None
+		self._moveReady = Condition()
+		self._whoWins = None
+		self._finished = False
+		self._deadline = None
+		self.remote = None
 
 		# list of comments
 		self._comments = CommentQueue(MAX_COMMENTS)
+		self._version = 0
+
+		# a replayed game is not registered, nor logged (see replayMove)
+		if replay:
+			self._name = name
+			self._logger = getLogger("disable-logger")
+			self._lwsocks = []
+			player1.game = self
+			player2.game = self
+			return
 
 		# and (almost) last, call the super init for base initialization
 		super().__init__(name)
@@ -187,10 +245,44 @@ class Game(BaseClass):
 			                    self._tournament.name, name, player1.name, player2.name, seed)
 		else:
 			self.logger.message("Game %s just starts with '%s' and '%s' (seed=%d).", name, player1.name, player2.name, seed)
-		self.logger.debug("The delay is set to %ds" % self._delay)
-		self.logger.debug("The timeout is set to %ds" % self._timeout)
+		self.logger.debug("The delay is set to %dms" % self._delay)
+		if self._clock is None:
+			self.logger.debug("The timeout is set to %ds" % self._timeout)
+		else:
+			self.logger.debug("The clock is set to %gs (+%gs per move)" % (self._clock[0], self._increment))
+
+		# the first player has the timeout of the game to play its first move
+		with self._moveReady:
+			self._armDeadline(0)
+
 
 
+	def initRandom(self, options):
+		"""
+		Create the random generator of the game (a random.Random), seeded with the 'seed' option (or with a random seed)
+		The board and the training players should only draw from this generator (see the property rng), and not from
+		the global generator of the module random (shared by all the games, so the games played at the same time would
+		interleave their draws): the same seed always gives the same game
+		It should be called by the constructor of the child class, before the board is created (otherwise it is called
+		by the constructor of Game)
+		Parameters:
+		- options: dictionary of options of the game
+		Returns the random generator
+		"""
+		# get a seed if the seed is not given
+		if 'seed' not in options:
+			seed = randint(0, 16777215)     # between 0 and 2^24-1
+		else:
+			try:
+				seed = int(options['seed'])
+				if not 0 <= seed <= 16777215:
+					raise ValueError("The 'seed' value must be between 0 and 16777215 ('seed=%s'." % options['seed'])
+			except ValueError:
+				raise ValueError("The 'seed' value is invalid ('seed=%s')" % options['seed'])
+		self._seed = seed
+		self._rng = Random(seed)
+		return self._rng
+
 
 	def partialEndOfGame(self, whoLooses):
 		"""
@@ -198,16 +290,23 @@ class Game(BaseClass):
 		Parameters:
 			- whoLooses: (RegularPlayer) player that looses
 		The game is not fully ended, since we need to wait the other player to call GET_MOVE or PLAY_MOVE
+		(the opponent is woken up if it is waiting for a move)
 		"""
 		nWhoLooses = 0 if self._players[0] is whoLooses else 1
-		# end of the game if the opponent is not regular or if it has already disconnected
-		if not self._players[1 - nWhoLooses].isRegular:
-			self.endOfGame(1 - nWhoLooses, "Opponent has disconnected")
-		elif self._players[1 - nWhoLooses].game is None:
-			# the opponent has disconnected first, so we win
-			self.endOfGame(nWhoLooses, "Opponent has disconnected")
-		else:
-			whoLooses.game = None
+		if self._whoWins is None:
+			# end of the game if the opponent is not regular or if it has already disconnected
+			if not self._players[1 - nWhoLooses].isRegular:
+				self.endOfGame(1 - nWhoLooses, "Opponent has disconnected")
+			elif self._players[1 - nWhoLooses].game is not self:
+				# the opponent has disconnected first, so we win
+				self.endOfGame(nWhoLooses, "Opponent has disconnected")
+			else:
+				with self._moveReady:
+					whoLooses.game = None
+					self._moveReady.notify_all()
+				return
+		# the game is over (the player may not have read the last move)
+		self._leaveGame(nWhoLooses)
 
 
 	def manageNextTurn(self, return_code, msg):
@@ -220,10 +319,12 @@ class Game(BaseClass):
 		"""
 		# check if the player wins
 		if return_code == NORMAL_MOVE:
-			# Wait for the delay time
-			timemod.sleep(self._delay/1000)
-			# change who plays
+			# the move will be given to the opponent after the delay
+			self._nextMoveTime = monotonic() + self._delay / 1000
+			# change who plays (it has the timeout of the game to play, from the time it gets the move)
 			self._whoPlays = self.getNextPlayer()
+			with self._moveReady:
+				self._armDeadline(self._whoPlays)
 		elif return_code == WINNING_MOVE:
 			# Game won by the opponent, end of the game
 			self.endOfGame(self._whoPlays, msg)
@@ -237,30 +338,207 @@ class Game(BaseClass):
 		Manage the end of the game:
 		The game is removed from the allGames dictionary, the players do not play to that game anymore
 		Is called when the game is over (after a wining/losing move)
+		The opponent of the player who has played the last move stays in the game until it has read that move
+		(see getLastMove and _leaveGame)
 		Parameters:
 			- whoWins: (int) number of the player who wins the game
 			- msg: (sting) message explaining why it's the end of the game
 		"""
-		# log it
-		self.logger.message("The game '%s' is now finished, %s won against %s (%s)",
-		                    self.name, self._players[whoWins].name, self._players[1-whoWins].name, msg)
-		self._players[whoWins].logger.info("We won the game (%s) !" % msg)
-		self._players[1 - whoWins].logger.info("We loose the game (%s) !" % msg)
+		with self._moveReady:
+			if self._whoWins is not None:
+				# the game is already over
+				return
+			self._whoWins = whoWins
+			self._endMessage = msg
+			self._disarmDeadline()
+			# only the move that ends the game is kept in the mailbox
+			if self._mailbox is not None and self._mailbox[2] == NORMAL_MOVE:
+				self._mailbox = None
+			self._moveReady.notify_all()
+
+		# log it (a game played by a worker process has already been logged by the worker)
+		if self.remote is None:
+			self.logger.message("The game '%s' is now finished, %s won against %s (%s)",
+			                    self.name, self._players[whoWins].name, self._players[1-whoWins].name, msg)
+			self._players[whoWins].logger.info("We won the game (%s) !" % msg)
+			self._players[1 - whoWins].logger.info("We loose the game (%s) !" % msg)
+
+		# the players do not play anymore (except if they still have to read the last move)
+		for n in (0, 1):
+			if not self._hasMoveFor(n):
+				self._leaveGame(n)
 
-		# the players do not play anymore
-		if self._players[0].game is not None:
-			self._players[0].game = None
-		if self._players[1].game is not None:
-			self._players[1].game = None
+
+	def _leaveGame(self, nPlayer):
+		"""
+		The player #nPlayer leaves the game (that is over)
+		When both players have left, the tournament is told the result of the game, and the game is removed from the
+		allGames dictionary
+		"""
+		with self._moveReady:
+			if self._players[nPlayer].game is self:
+				self._players[nPlayer].game = None
+			if self._finished or any(p.game is self for p in self._players):
+				return
+			self._finished = True
+
+		# record the game (see server/Archive.py)
+		archive.record(self)
 
 		# tell the tournament the result of the game
 		if self._tournament:
-			self._tournament.endOfGame(self._players[whoWins], self._players[1 - whoWins])
+			self._tournament.endOfGame(self._players[self._whoWins], self._players[1 - self._whoWins])
 
 		# remove from the list of Games
 		Game.removeInstance(self.name)
 
 
+	def _armDeadline(self, nPlayer, timeout=None):
+		"""
+		Arm the timer of the move of the player #nPlayer (if it is a regular player), in place of the previous one
+		The player has the timeout of the game (or the time left on its clock) to play, from the time it gets the last
+		move (after the delay): its clock starts then; the timer wheel ends the game when the timer expires (see _timeUp)
+		(the lock of _moveReady should be acquired)
+		Parameters:
+		- timeout: time (in s) given to the player instead (its clock does not start), used when it has to read a move
+		"""
+		self._disarmDeadline()
+		start = max(self._nextMoveTime, monotonic())
+		if timeout is None:
+			self._turnStart = start
+			timeout = self._timeout if self._clock is None else self._clock[nPlayer]
+		if self._players[nPlayer].isRegular and self.remote is None:
+			self._deadline = timerWheel.schedule(start - monotonic() + timeout, self._timeUp, nPlayer)
+
+
+	def _disarmDeadline(self):
+		"""Cancel the timer of the move (the lock of _moveReady should be acquired)"""
+		if self._deadline is not None:
+			self._deadline.cancel()
+			self._deadline = None
+
+
+	def _chargeClock(self, nPlayer):
+		"""
+		Stop the clock of the player #nPlayer, that has just played: the time since it got the move is taken from its
+		clock, and the increment is added (nothing to do when the game has no clock)
+		(the lock of _moveReady should be acquired)
+		"""
+		if self._clock is not None:
+			spent = max(monotonic() - self._turnStart, 0)
+			self._clock[nPlayer] = max(self._clock[nPlayer] - spent, 0) + self._increment
+
+
+	def _timesLeft(self):
+		"""
+		Returns the list of the time (in s) left to each player, now: the time left on its clock (the clock of the player
+		who plays runs), or the timeout of the game when the game has no clock
+		(the lock of _moveReady should be acquired)
+		"""
+		if self._clock is None:
+			return [self._timeout, self._timeout]
+		left = list(self._clock)
+		if self._whoWins is None:
+			left[self._whoPlays] = max(left[self._whoPlays] - max(monotonic() - self._turnStart, 0), 0)
+		return left
+
+
+	def _timeUp(self, nPlayer):
+		"""
+		Called by the timer wheel when the player #nPlayer has not played in time: it loses the game
+		(or wins it, if its opponent has already left the game)
+		"""
+		with self._moveReady:
+			# the timer may have been cancelled (or armed again) in the meantime
+			if self._deadline is None or self._deadline.pending or self._whoWins is not None:
+				return
+			self._deadline = None
+			if self._players[1 - nPlayer].game is not self and self._players[1 - nPlayer].isRegular:
+				self.endOfGame(nPlayer, "Opponent has disconnected")
+			else:
+				self.endOfGame(1 - nPlayer, "Timeout")
+
+
+	def _hasMoveFor(self, nPlayer):
+		"""
+		Returns True if the mailbox contains a move that the player #nPlayer has not read (a move of its opponent)
+		"""
+		return self._mailbox is not None and self._mailbox[0] != nPlayer
+
+
+	def __getstate__(self):
+		"""
+		Returns the state of the game to pickle (used to send a game to a worker process, see server/Player/Worker.py)
+		The players, the tournament, the logger and the synchronization objects are not pickled (see restore)
+		"""
+		state = self.__dict__.copy()
+		for attr in ('_players', '_tournament', '_logger', '_moveReady', '_deadline', '_lwsocks', 'remote'):
+			state.pop(attr, None)
+		return state
+
+
+	def restore(self, players, tournament=None):
+		"""
+		Restore an unpickled game (in a worker process, or from its snapshot, see loadSnapshot), with its players
+		Parameters:
+		- players: tuple of the two players (in the same order as in the pickled game)
+		- tournament: the object that is told the result of the game (see endOfGame), or None
+		"""
+		self._players = tuple(players)
+		self._tournament = tournament
+		self._moveReady = Condition()
+		self._deadline = None
+		self.remote = None
+		BaseClass.__init__(self, self._name)
+		for p in self._players:
+			p.game = self
+		with self._moveReady:
+			self._armDeadline(self._whoPlays)
+
+
+	def playRemotely(self, remote):
+		"""
+		The game is played by another process (a worker process, see server/Player/Worker.py): the timer of the move is
+		cancelled (the timeouts are managed by the other process), and the changes of the delay are sent to it
+		Parameters:
+		- remote: (WorkerPool) the worker pool
+		"""
+		with self._moveReady:
+			self.remote = remote
+			self._disarmDeadline()
+
+
+	def getSnapshot(self):
+		"""
+		Returns the snapshot of the game (see server/Checkpoint.py), as a tuple (version, data), where data is the
+		pickled state of the game (board, positions, who plays, comments, moves, random generator, etc., see
+		__getstate__), with the names of its regular players and its training players
+		The state is pickled while the lock of the game is acquired, so a move is fully played, or not at all
+		"""
+		players = [p.name if p.isRegular else p for p in self._players]
+		with self._moveReady:
+			elapsed = int(1000 * (monotonic() - self._startClock))
+			return self._version, pickle.dumps((self, players, elapsed), pickle.HIGHEST_PROTOCOL)
+
+
+	@staticmethod
+	def loadSnapshot(data):
+		"""
+		Create a game from its snapshot (see getSnapshot); it should then be restored with its players (see restore)
+		The move not yet read by the opponent is dropped (the board already contains it, and the players get the game
+		data again when they are connected again)
+		Returns the game and the list of its players (the name of a regular player, or the training player)
+		"""
+		game, players, elapsed = pickle.loads(data)
+		# (the monotonic clock of the new process has another origin)
+		game._startClock = monotonic() - elapsed / 1000
+		game._nextMoveTime = 0
+		game._mailbox = None
+		# (the game continues with the player who was playing)
+		game._whoStarts = game._whoPlays
+		return game, players
+
+
 	@property
 	def playerWhoPlays(self):
 		"""
@@ -269,6 +547,24 @@ class Game(BaseClass):
 		return self._players[self._whoPlays]
 
 
+	@property
+	def playerWhoStarts(self):
+		"""
+		Returns the player who plays first (player0, or the player who was playing for a game restored from its snapshot)
+		"""
+		return self._players[self._whoStarts]
+
+
+	def hasToPlay(self, player):
+		"""
+		Returns True if it's the turn of the player (it is the player who plays, and it has read the last move of its
+		opponent)
+		"""
+		nPlayer = 0 if player is self._players[0] else 1
+		with self._moveReady:
+			return self._whoPlays == nPlayer and not self._hasMoveFor(nPlayer)
+
+
 	@property
 	def players(self):
 		"""
@@ -277,58 +573,277 @@ class Game(BaseClass):
 		return self._players
 
 
-	def getLastMove(self):
+	@property
+	def isOver(self):
+		"""
+		Returns True when the game is over (there is a winner)
+		"""
+		return self._whoWins is not None
+
+
+	@property
+	def version(self):
+		"""
+		Returns the number of changes of the game (moves, comments and delay), see getSnapshot
+		"""
+		return self._version
+
+
+	@property
+	def seed(self):
+		"""
+		Returns the seed of the game
+		"""
+		return self._seed
+
+
+	@property
+	def rng(self):
+		"""
+		Returns the random generator of the game (see initRandom)
+		"""
+		return self._rng
+
+
+	@property
+	def delay(self):
+		"""
+		Returns the delay (in ms) between two moves
+		"""
+		return self._delay
+
+
+	def setDelay(self, delay):
+		"""
+		Change the delay between two moves (from the web page of the game), while the game is played
+		The move that is not yet given to the opponent (see getLastMove) is given according to the new delay
+		Parameters:
+		- delay: (int) new delay (in ms)
+		"""
+		if delay < 0:
+			raise ValueError("The delay must be positive")
+		with self._moveReady:
+			hidden = self._nextMoveTime > monotonic()
+			self._nextMoveTime += (delay - self._delay) / 1000
+			self._delay = delay
+			self._version += 1
+			if hidden and self._whoWins is None:
+				# the timeout of the player starts when it gets the move
+				self._armDeadline(self._whoPlays)
+			self._moveReady.notify_all()
+		self.logger.info("The delay is set to %dms", delay)
+		# the game may be played by a worker process
+		if self.remote is not None:
+			self.remote.setDelay(self.name, delay)
+
+
+	@property
+	def timeout(self):
+		"""
+		Returns the timeout of the game (time, in seconds, given to a player to play its move)
+		(when the game has a clock, the largest time left on the clocks)
+		"""
+		if self._clock is None:
+			return self._timeout
+		return max(self._clock)
+
+
+	def getTimesLeft(self, player):
+		"""
+		Returns the time (in ms) left to the player and to its opponent (see _timesLeft), as a tuple of integers
+		"""
+		nPlayer = 0 if player is self._players[0] else 1
+		with self._moveReady:
+			left = self._timesLeft()
+		return int(1000 * left[nPlayer]), int(1000 * left[1 - nPlayer])
+
+
+	def getWebSocketInformations(self):
+		"""
+		Returns the informations sent to the websockets of the web page of the game (see BaseClass._sendUpdate):
+		the informations of the game (see getDictInformations), and the time (in ms) left on the clocks, with the number
+		of the player whose clock runs (None when the game is over), when the game has a clock
+		"""
+		informations = self.getDictInformations()
+		if self._clock is not None:
+			with self._moveReady:
+				left = self._timesLeft()
+				running = self._whoPlays if self._whoWins is None else None
+			informations['clock'] = {'left': [int(1000 * t) for t in left], 'running': running}
+		return informations
+
+
+	@property
+	def moves(self):
+		"""
+		Returns the list of the moves played (tuple (move, return_code, time), time in ms since the start of the game)
 		"""
-		Wait for the move of the player playerWhoPlays (and sync with it)
-		If it doesn't answer in TIMEOUT_TURN seconds, then he losts the game
+		return self._moves
+
+	@property
+	def comments(self):
+		"""
+		Returns the comments of the players (CommentQueue)
+		"""
+		return self._comments
+
+
+	def getRemoteUpdate(self, nbMoves):
+		"""
+		Returns the changes of the game played by this process (a worker process, see server/Player/Worker.py), to send
+		to the copy of the game of the front process (see updateRemotely), as a tuple (moves, comments, clock):
+		- moves: list of the moves played after the first nbMoves moves (see moves)
+		- comments: (CommentQueue) a copy of the comments of the players
+		- clock: None if the game has no clock, otherwise a tuple with the list of the time (in s) left to each player,
+		now, and the time (in s) before the clock of the player who plays starts (the delay of the game)
+		"""
+		with self._moveReady:
+			clock = None
+			if self._clock is not None:
+				clock = (self._timesLeft(), max(self._turnStart - monotonic(), 0))
+			return self._moves[nbMoves:], deepcopy(self._comments), clock
+
+
+	def updateRemotely(self, moves, comments, clock=None):
+		"""
+		Update the game with the changes sent by the process that plays it (a worker process, see
+		server/Player/Worker.py and getRemoteUpdate): the new moves are played again (see replayMove), so that the board
+		shown by the web pages, the player who plays, its clock and the record of the game are up to date
+		Parameters:
+		- moves: list of the moves played since the last update (see moves)
+		- comments: (CommentQueue) the comments of the players
+		- clock: times left and time before the clock of the player who plays starts (see getRemoteUpdate), or None
+		"""
+		with self._moveReady:
+			for move, _, _ in moves:
+				self.replayMove(move)
+			self._moves.extend(moves)
+			self._comments = comments
+			if clock is not None:
+				left, wait = clock
+				self._clock = list(left)
+				self._turnStart = monotonic() + wait
+			self._version += 1
+		self.sendUpdateToWebSocket()
+
+
+	@property
+	def endMessage(self):
+		"""
+		Returns the message explaining why it's the end of the game ('' until the end of the game)
+		"""
+		return self._endMessage
+
+
+	def getRecord(self):
+		"""
+		Returns the record of the game (see server/Archive.py)
+		"""
+		return Record(self.__class__.__name__, self.name, self._tournament.name if self._tournament else '',
+		              self._seed, self._startTime, self._options, tuple(p.name for p in self._players),
+		              list(self._moves),
+		              self._whoWins, self._endMessage)
+
+
+	def replayMove(self, move):
+		"""
+		Play again a recorded move (see server/Archive.py): the game is only updated (there is no player to wake up, no
+		timeout and no end of game)
+		Returns the return code of the move
+		"""
+		return_code, _ = self.updateGame(move)
+		if return_code == NORMAL_MOVE:
+			self._whoPlays = self.getNextPlayer()
+		return return_code
+
+
+	def getLastMove(self, player=None):
+		"""
+		Wait for the move of the opponent (posted in the mailbox by playMove), and take it
+		The move is taken when the delay of the game is elapsed (the thread waits on the condition until then)
+		If it doesn't answer in time (the timeout of the game, from the time it gets our move), then he losts the game
+		(the timer of its move, see _armDeadline, ends the game and wakes us up)
+		Parameters:
+			- player: player who waits for the move (the opponent of playerWhoPlays if not given)
 		Returns:
 			- last move: (string) string describing the opponent last move (exactly the string it sends)
 			- last return_code: (int) code (NORMAL_MOVE, WINNING_MOVE or LOSING_MOVE) describing the last move
 		"""
-
-		# check if the opponent doesn't have disconnected
-		if self._players[self._whoPlays].game is None:
-			self.endOfGame(1-self._whoPlays, "Opponent has disconnected")
-			return "", LOSING_MOVE
+		nPlayer = 1 - self._whoPlays if player is None else (0 if player is self._players[0] else 1)
+		opponent = self._players[1 - nPlayer]
 
 		# wait for the move of the opponent if the opponent is a regular player
-		if self._players[self._whoPlays].isRegular:
-			try:
-				# 1st synchronization with the opponent (with playMove)
-				self._sync.wait()
-				# now the opponent has played, we wait now for self._whoPlays to be updated
-				self._sync.wait()
-				return self._lastMove, self._lastReturn_code
-			except BrokenBarrierError:
-				# Timeout !!
-				# the opponent has lost the game
-				self.endOfGame(1 - self._whoPlays, "Timeout")
-				return self._lastMove, LOSING_MOVE
+		if opponent.isRegular:
+			with self._moveReady:
+				# wait for a move (and its delay), the disconnection of the opponent or the end of the game (timeout)
+				# (monotonic clock; the delay is computed again when it is changed)
+				while self._whoWins is None and opponent.game is self:
+					if not self._hasMoveFor(nPlayer):
+						self._moveReady.wait()
+					else:
+						remaining = self._nextMoveTime - monotonic()
+						if remaining <= 0:
+							break
+						self._moveReady.wait(remaining)
+
+				if self._hasMoveFor(nPlayer):
+					_, move, return_code = self._mailbox
+					self._mailbox = None
+					if self._whoWins is not None:
+						# that was the last move of the game
+						self._leaveGame(nPlayer)
+					return move, return_code
+
+			# the opponent has disconnected (or the game has been stopped, or the opponent has not played in time)
+			self.endOfGame(nPlayer, "Opponent has disconnected")
+			self._leaveGame(nPlayer)
+			return "", LOSING_MOVE
 
 		else:
 			# the opponent is a training player
-			# so we call its playMove method
+			# so we call its playMove method (when the delay after our move is elapsed)
+			self._waitNextMoveTime()
 			move = self._players[self._whoPlays].playMove()
 			self.logger.info("'%s' plays %s" % (self._players[self._whoPlays].name, move))
 			self._players[1 - self._whoPlays].logger.info("%s plays %s" % (self._players[self._whoPlays].name, move))
 
-			# and update the game
-			return_code, msg = self.updateGame(move)
+			# and update the game (with the lock, so that a snapshot contains the whole move, see getSnapshot)
+			with self._moveReady:
+				self._chargeClock(self._whoPlays)
+				return_code, msg = self.updateGame(move)
+				self._moves.append((move, return_code, int(1000 * (monotonic() - self._startClock))))
+				self._version += 1
 
-			# update who plays next and check for the end of the game
-			self.manageNextTurn(return_code, msg)
+				# update who plays next and check for the end of the game
+				self.manageNextTurn(return_code, msg)
 
 			self.sendUpdateToWebSocket()
 
+			# give the move after the delay (the timeout of the player starts then)
+			self._waitNextMoveTime()
+
 			return move, return_code
 
 
+	def _waitNextMoveTime(self):
+		"""
+		Wait until the next move can be given (when the delay after the last move is elapsed)
+		(wait on the condition, so that a change of the delay is taken into account)
+		"""
+		with self._moveReady:
+			while self._whoWins is None:
+				remaining = self._nextMoveTime - monotonic()
+				if remaining <= 0:
+					break
+				self._moveReady.wait(remaining)
+
+
 
 	def playMove(self, move):
 		"""
 		Play a move we just received (from PlayerSocket)
-		Do all the synchronization stuff (between the two players)
-		The move is really played in the method updateGame (that tells if the move is legal or not)
+		The move is really played in the method updateGame (that tells if the move is legal or not), and then posted in
+		the mailbox, for the opponent (see getLastMove); we do not wait for the opponent to read it
 
 		Parameters:
 		- move: a string corresponding to the move
@@ -336,8 +851,15 @@ class Game(BaseClass):
 		- move_code: (integer) 0 if the game continues after this move, >0 if it's a winning move, -1 otherwise (illegal move)
 		- msg: a message to send to the player, explaining why the game is ending
 		"""
+		opponent = self._players[1 - self._whoPlays]
+		with self._moveReady:
+			# the game may have just been ended by the timer of the move
+			if self._whoWins is not None:
+				return LOSING_MOVE, "Timeout !"
+			self._disarmDeadline()
+			self._chargeClock(self._whoPlays)
 		# check if the opponent doesn't have disconnected
-		if self._players[self._whoPlays].game is None:
+		if opponent.game is not self:
 			self.endOfGame(self._whoPlays, "Opponent has disconnected")
 			return WINNING_MOVE, "Opponent has disconnected"
 
@@ -345,50 +867,50 @@ class Game(BaseClass):
 		self.logger.info("'%s' plays %s" % (self.players[self._whoPlays].name, move))
 		if self._players[self._whoPlays].isRegular:
 			self._players[self._whoPlays].logger.info("I play %s" % move)
-		if self._players[1 - self._whoPlays].isRegular:
-			self._players[1 - self._whoPlays].logger.info("%s plays %s" % (self.players[self._whoPlays].name, move))
+		if opponent.isRegular:
+			opponent.logger.info("%s plays %s" % (self.players[self._whoPlays].name, move))
 
 
 		# if the opponent is a regular player
-		if self._players[1 - self._whoPlays].isRegular:
-			# play that move, update the game and keep the last move
-			return_code, msg = self.updateGame(move)
-			self._lastMove = move
-			self._lastReturn_code = return_code
-
-			try:
-				# 1st synchronization with the opponent
-				self._sync.wait()
-			except BrokenBarrierError:
-				# Timeout !
-				self.endOfGame(self._whoPlays, "Timeout")
-				return WINNING_MOVE, "Timeout of the opponent!"
-
-			# update who plays next and check for the end of the game
-			self.manageNextTurn(return_code, msg)
-
-			# 2nd synchronization with the opponent
-			self._sync.wait()
+		if opponent.isRegular:
+			with self._moveReady:
+				# our previous move should have been read by the opponent (when a player plays several times in a row)
+				# (the opponent has the timeout of the game to read it)
+				if self._mailbox is not None:
+					self._armDeadline(1 - self._whoPlays, self._timeout)
+					self._moveReady.wait_for(lambda: self._mailbox is None or opponent.game is not self or
+					                         self._whoWins is not None)
+					self._disarmDeadline()
+					if self._whoWins is not None:
+						# Timeout !
+						return WINNING_MOVE, "Timeout of the opponent!"
+
+				# play that move, update the game and keep the last move
+				return_code, msg = self.updateGame(move)
+				self._lastMove = move
+				self._lastReturn_code = return_code
+				self._moves.append((move, return_code, int(1000 * (monotonic() - self._startClock))))
+				self._version += 1
+
+				# post it for the opponent (and wake it up)
+				self._mailbox = (self._whoPlays, move, return_code)
+				self._moveReady.notify_all()
+
+				# update who plays next and check for the end of the game
+				self.manageNextTurn(return_code, msg)
 
 
 		else:   # when the opponent is a training player
-			# check for timeout
-			if (datetime.now()-self._lastMoveTime).total_seconds() > self._timeout:
-				# Timeout !!
-				# the player has lost the game
-				self.endOfGame(1 - self._whoPlays, "Timeout")
-				return LOSING_MOVE, "Timeout !"
-
-			# play that move, update the game and keep the last move
-			return_code, msg = self.updateGame(move)
-			self._lastMove = move
-			self._lastReturn_code = return_code
+			with self._moveReady:
+				# play that move, update the game and keep the last move
+				return_code, msg = self.updateGame(move)
+				self._lastMove = move
+				self._lastReturn_code = return_code
+				self._moves.append((move, return_code, int(1000 * (monotonic() - self._startClock))))
+				self._version += 1
 
-			#  we store the time (to compute the timeout)
-			self._lastMoveTime = datetime.now()
-
-			# update who plays next and check for the end of the game
-			self.manageNextTurn(return_code, msg)
+				# update who plays next and check for the end of the game
+				self.manageNextTurn(return_code, msg)
 
 
 
@@ -410,7 +932,9 @@ class Game(BaseClass):
 
 		# append comment
 		nPlayer = 0 if player is self._players[0] else 1
-		self._comments.append(comment, nPlayer)
+		with self._moveReady:
+			self._comments.append(comment, nPlayer)
+			self._version += 1
 
 
 
@@ -503,6 +1027,15 @@ class Game(BaseClass):
 		       (self.name, self.name, self.players[0].name, self.players[1].name)
 
 
+	def getCutename(self):
+		"""
+		Returns the cutename of the game (to display in html views)
+
+		CAN BE OVERLOADED BY THE CHILD CLASS (otherwise the name of the game is used)
+		"""
+		return self.name
+
+
 
 
 	def updateGame(self, move):
@@ -22,11 +22,12 @@ from socket import gethostname      # get name of the machine
 from email.utils import parseaddr   # parse email to validate it (can validate wrong emails)
 from colorlog import ColoredFormatter  # logging with colors
 from colorama import Fore
-from os import makedirs, remove, listdir
-from os.path import getmtime, getsize, join, splitext
+from os import makedirs, remove, scandir
+from os.path import join, splitext
 from smtplib import SMTP, SMTPAuthenticationError
 from operator import itemgetter
 from threading import Lock
+from time import monotonic
 from jinja2 import Template
 
 
@@ -34,6 +35,9 @@ from jinja2 import Template
 MAX_ACTIVITY_SIZE = 1e6     # 1Mo for the activity.log file
 MAX_BASECLASS_SIZE = {'Game':  10e3, 'Player': 100e3, 'Tournament': 1e6}  # 10ko per game and player, 1Mo per tournament
 MAX_BASECLASS_FOLDER = {'Game':  1e6, 'Player': 5e6, 'Tournament': 1e6}   # 5Mo per game, player and tournament folders
+# the size of a folder is checked at most every FOLDER_CHECK_PERIOD seconds (and not for every new game, player or
+# tournament: checking it takes one stat per file of the folder)
+FOLDER_CHECK_PERIOD = 10
 
 
 # logging levels (see 'Logging.md'), depending on the mode
@@ -49,13 +53,16 @@ baseclass_level = {'prod': logging.INFO, 'dev': logging.DEBUG, 'debug': LOW_DEBU
 
 # dictionary of Lockes, used for removeOldestWithLock (to that removeOldestFilePlayer is only run once a time)
 lockDict = {}
+# dictionary path -> time (monotonic) of the last check of the size of the folder (see removeOldestWithLock)
+lastCheckDict = {}
 
 
 # global variables used as configuration variables
 class Config:
 	"""Simple class to store the configuration parameters"""
 	mode = ''       # default mode, set by configureRootLogger
-	logPath = ''    # path where to store the log
+	logPath = ''    # path where to store the log (None when nothing is logged in files, see configureSimulationLogger)
+	logFiles = True     # False in a worker process, whose logs are written by the front process (see configureWorkerLogger)
 	webPort = ''    # port of the web server
 	host = ''       # name of the host
 
@@ -73,6 +80,14 @@ def message(self, msg, *args, **kws):
 		self._log(MESSAGE_LEVEL, msg, args, **kws)
 
 
+def addLoggingLevels():
+	"""Add the LOW_DEBUG and MESSAGE logging levels (and the associated methods of the loggers)"""
+	logging.addLevelName(LOW_DEBUG_LEVEL, "COM_DEBUG")
+	logging.Logger.low_debug = low_debug
+	logging.addLevelName(MESSAGE_LEVEL, "MESSAGE")
+	logging.Logger.message = message
+
+
 def configureRootLogger(args):
 	"""
 	Configure the main logger
@@ -89,10 +104,7 @@ def configureRootLogger(args):
 	Config.host = args['--host']
 
 	# add the LOW_DEBUG and MESSAGE logging levels
-	logging.addLevelName(LOW_DEBUG_LEVEL, "COM_DEBUG")
-	logging.Logger.low_debug = low_debug
-	logging.addLevelName(MESSAGE_LEVEL, "MESSAGE")
-	logging.Logger.message = message
+	addLoggingLevels()
 
 	# Create and setup the logger
 	logger = logging.getLogger()
@@ -172,6 +184,56 @@ def configureRootLogger(args):
 	return logger
 
 
+def configureSimulationLogger():
+	"""
+	Configure the main logger for the simulations (`runCGS.py simulate`): only the errors are displayed (on the
+	console), and the games and players do not have log files (they all share a disabled logger)
+
+	Returns the logger
+	"""
+	Config.mode = 'prod'
+	Config.logPath = None
+	addLoggingLevels()
+
+	logger = logging.getLogger()
+	logger.setLevel(logging.ERROR)
+	steam_handler = logging.StreamHandler()
+	LOGFORMAT = "  %(log_color)s[%(name)s]%(reset)s | %(log_color)s%(message)s%(reset)s"
+	steam_handler.setFormatter(ColoredFormatter(LOGFORMAT))
+	logger.addHandler(steam_handler)
+
+	return logger
+
+
+
+def configureWorkerLogger(handler):
+	"""
+	Configure the main logger of a worker process (see server/Player/Worker.py): the log files are only written by the
+	front process, so the handlers inherited from the front process are replaced by handler (that sends the records to
+	the front process), and the games and players of the worker do not open their log files (their records go to the
+	main logger, see configureBaseClassLogger)
+	Parameters:
+	- handler: (logging.Handler) the handler that sends the records to the front process
+
+	Returns the logger
+	"""
+	Config.logFiles = False
+
+	logger = logging.getLogger()
+	for h in list(logger.handlers):
+		logger.removeHandler(h)
+	for other in list(logging.Logger.manager.loggerDict.values()):
+		if isinstance(other, logging.Logger):
+			for h in list(other.handlers):
+				other.removeHandler(h)
+	logger.addHandler(handler)
+	# (only the records that are written somewhere are sent)
+	if Config.mode in baseclass_level:
+		logger.setLevel(min(activity_level[Config.mode][:2] + (error_level[Config.mode], baseclass_level[Config.mode])))
+
+	return logger
+
+
 
 
 def removeOldestFiles(cls, path, maxSize):
@@ -183,27 +245,23 @@ def removeOldestFiles(cls, path, maxSize):
 	- path: (string) path where to look for .log files
 	- maxSize: (int) maximum size (in octets) of the folder
 
-	Remark: it uses listdir, but can be based on scandir (Python 3.5+) for efficiency
+	The folder is scanned once (one stat per file): the log files that are not used anymore are removed, the oldest
+	first, until the size of the folder is lower than maxSize
 	"""
-
-	# while sum(f.stat().st_size for f in scandir(path)) > (MAX_SIZE):     # -> for Python 3.5 (fastest!)
-	while sum(getsize(path+f) for f in listdir(path)) > maxSize:
-
-		# build the list (iterator) of log files that are not yet used (not in cls.allInstances dictionary)
-		# files = ((f.name, f.stat().st_mtime) for f in scandir(path) if '.log' in f.name)      # -> for Python 3.5 (fastest!)
-		files = ((f, getmtime(path + f)) for f in listdir(path) if
-		         '.log' in f and splitext(f)[0] not in cls.allInstances)
-		# remove the oldest file
-		try:
-			oldest = min(files, key=itemgetter(1))[0]
-		except ValueError:
-			# the list is empty, nothing to remove...
+	entries = [(f.name, f.stat()) for f in scandir(path) if f.is_file()]
+	excess = sum(st.st_size for _, st in entries) - maxSize
+	if excess <= 0:
+		return
+
+	# list of the log files that are not yet used (not in cls.allInstances dictionary), the oldest first
+	files = sorted(((name, st.st_size, st.st_mtime) for name, st in entries if
+	                '.log' in name and splitext(name)[0] not in cls.allInstances), key=itemgetter(2))
+	for name, size, _ in files:
+		if excess <= 0:
 			break
-		logging.getLogger().info("Remove the file `%s`" % (path+oldest))
-		remove(path+oldest)
-
-	# FIXME: this is not efficient. It should be better to i) build the list of log files that can be removed
-	# and ii) in a loop, remove the oldest while the size of the deleted files is lower than the excedent
+		logging.getLogger().info("Remove the file `%s`" % (path + name))
+		remove(path + name)
+		excess -= size
 
 
 def removeOldestWithLock(cls, path, maxSize):
@@ -224,7 +282,11 @@ def removeOldestWithLock(cls, path, maxSize):
 	# check if the call of removeOldestFiles is locked (for a given path)
 	if lock.acquire(False):
 		try:
-			removeOldestFiles(cls, path, maxSize)
+			# (the size of the folder is only checked every FOLDER_CHECK_PERIOD seconds)
+			now = monotonic()
+			if now - lastCheckDict.get(path, -FOLDER_CHECK_PERIOD) >= FOLDER_CHECK_PERIOD:
+				lastCheckDict[path] = now
+				removeOldestFiles(cls, path, maxSize)
 		finally:
 			lock.release()
 	else:
@@ -242,13 +304,23 @@ def configureBaseClassLogger(cls, objName):
 
 	Returns the logger
 	"""
+	# nothing is logged (simulations)
+	if Config.logPath is None:
+		logger = logging.getLogger("disable-logger")
+		logger.disabled = True
+		return logger
+
 	# get the name of the class, or its parents
 	className = cls.__name__
 	if className not in MAX_BASECLASS_FOLDER:
 		className = cls.__base__.__name__
 
-	# create the logger and the associated folder
+	# create the logger (in a worker process, its records are written in the log file by the front process)
 	logger = logging.getLogger(className + '-' + objName)
+	if not Config.logFiles:
+		return logger
+
+	# and the associated folder
 	path = join(Config.logPath, className + 's/')     # add a 's' at the end (Game -> Games)
 	makedirs(path, exist_ok=True)
 
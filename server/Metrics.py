@@ -0,0 +1,252 @@
+"""
+* --------------------- *
+|                       |
+|   Coding Game Server  |
+|                       |
+* --------------------- *
+
+Authors: T. Hilaire, J. Brajard
+Licence: GPL
+
+File: Metrics.py
+	Contains the classes Histogram and CommandMetrics
+	-> histogram of durations (latencies), used to measure the performance of the server (see the /stats page)
+	-> number and latencies of the commands of the clients, per kind of command (see the /stats/commands page)
+
+Copyright 2016-2017 T. Hilaire, J. Brajard
+"""
+
+from threading import Lock
+
+
+NB_BUCKETS = 32         # number of buckets of the histograms (the last one is for durations >2^30 us, ie ~18 min.)
+
+
+
+class Histogram:
+	"""
+	Histogram of durations, with logarithmic buckets
+	the bucket i counts the durations between 2^(i-1) and 2^i microseconds
+	(it can be updated from any thread)
+
+	Class attributes:
+	- allHistograms: (dict) all the histograms, indexed by their name
+
+	Attributes:
+	- _name: (string) name of the histogram
+	- _description: (string) what is measured
+	- _buckets: (list of int) number of durations in each bucket
+	- _count, _total, _max: number of durations, sum and max of the durations (in seconds)
+	"""
+
+	allHistograms = {}
+
+	def __init__(self, name, description, register=True):
+		"""
+		Create a histogram, and register it
+		Parameters:
+		- name: (string) name of the histogram (unique)
+		- description: (string) what is measured
+		- register: (bool) False if the histogram is not registered in allHistograms (and not shown in /stats)
+		"""
+		self._name = name
+		self._description = description
+		self._lock = Lock()
+		self._buckets = [0] * NB_BUCKETS
+		self._count = 0
+		self._total = 0.
+		self._max = 0.
+		if register:
+			Histogram.allHistograms[name] = self
+
+
+	def __getstate__(self):
+		"""Returns the state of the histogram (without the lock), to be pickled (see server/Player/Worker.py)"""
+		with self._lock:
+			state = dict(self.__dict__)
+		del state['_lock']
+		return state
+
+
+	def __setstate__(self, state):
+		"""Restore the histogram from its state"""
+		self.__dict__.update(state)
+		self._lock = Lock()
+
+
+	def record(self, duration):
+		"""
+		Add a duration in the histogram
+		Parameters:
+		- duration: (float) duration, in seconds
+		"""
+		i = min(int(duration * 1e6).bit_length(), NB_BUCKETS - 1)
+		with self._lock:
+			self._buckets[i] += 1
+			self._count += 1
+			self._total += duration
+			self._max = max(self._max, duration)
+
+
+	def merge(self, other):
+		"""Add the durations of another histogram in the histogram"""
+		state = other.__getstate__()
+		with self._lock:
+			self._buckets = [a + b for a, b in zip(self._buckets, state['_buckets'])]
+			self._count += state['_count']
+			self._total += state['_total']
+			self._max = max(self._max, state['_max'])
+
+
+	def take(self):
+		"""
+		Returns a copy of the histogram (not registered), and reset the histogram
+		(used by a worker process to send its durations to the front process, see server/Player/Worker.py)
+		"""
+		copy = Histogram(self._name, self._description, register=False)
+		with self._lock:
+			copy.__setstate__({key: value for key, value in self.__dict__.items() if key != '_lock'})
+			self._buckets = [0] * NB_BUCKETS
+			self._count = 0
+			self._total = 0.
+			self._max = 0.
+		return copy
+
+
+	def reset(self):
+		"""Reset the histogram"""
+		with self._lock:
+			self._buckets = [0] * NB_BUCKETS
+			self._count = 0
+			self._total = 0.
+			self._max = 0.
+
+
+	def percentile(self, p):
+		"""
+		Returns (an upper bound of) the p-th percentile, in seconds
+		(the upper bound of the bucket that contains it), or None if the histogram is empty
+		"""
+		with self._lock:
+			if self._count == 0:
+				return None
+			rank = p / 100 * self._count
+			cumul = 0
+			for i, n in enumerate(self._buckets):
+				cumul += n
+				if cumul >= rank:
+					return min(2 ** i / 1e6, self._max)
+			return self._max
+
+
+	def getDictInformations(self):
+		"""
+		Returns a dictionary with the informations about the histogram (durations in milliseconds)
+		"""
+		percentiles = {'p%d' % p: self.percentile(p) for p in (50, 90, 99)}
+		with self._lock:
+			return {
+				'description': self._description,
+				'count': self._count,
+				'mean_ms': 1000 * self._total / self._count if self._count else None,
+				'max_ms': 1000 * self._max,
+				'percentiles_ms': {k: v and 1000 * v for k, v in percentiles.items()},
+				'buckets': {'<%gms' % (2 ** i / 1000): n for i, n in enumerate(self._buckets) if n}
+			}
+
+
+	@classmethod
+	def getStatistics(cls):
+		"""
+		Returns a dictionary with the informations about all the histograms
+		"""
+		return {name: h.getDictInformations() for name, h in cls.allHistograms.items()}
+
+
+
+
+class CommandMetrics:
+	"""
+	Number of commands and latency histograms for each kind of command (the first word of the command),
+	with one histogram per phase of the command:
+	- parse: decode the command and find how to answer it
+	- game: the game logic (including the wait for the opponent, for GET_MOVE or PLAY_AND_WAIT)
+	- send: send the answer to the client
+	(it can be updated from any thread)
+
+	Attributes:
+	- _histograms: (dict) kind of command -> (dict) phase -> Histogram
+	"""
+
+	phases = {'parse': "time to decode and parse the command", 'game': "time spent in the game logic",
+	          'send': "time to send the answer"}
+
+	def __init__(self):
+		self._lock = Lock()
+		self._histograms = {}
+
+
+	def __getstate__(self):
+		"""Returns the state (without the lock), to be pickled (the metrics of a worker are sent to the front process)"""
+		with self._lock:
+			return {'_histograms': dict(self._histograms)}
+
+
+	def __setstate__(self, state):
+		"""Restore the metrics from its state"""
+		self.__dict__.update(state)
+		self._lock = Lock()
+
+
+	def getHistograms(self, command):
+		"""Returns the histograms (dict phase -> Histogram) of a kind of command (created if necessary)"""
+		histograms = self._histograms.get(command)
+		if histograms is None:
+			with self._lock:
+				histograms = self._histograms.setdefault(command, {
+					phase: Histogram(command + "." + phase, description, register=False)
+					for phase, description in self.phases.items()})
+		return histograms
+
+
+	def record(self, command, **durations):
+		"""
+		Add the durations of the phases of a command
+		Parameters:
+		- command: (string) kind of command (like "GET_MOVE")
+		- durations: durations (float, in seconds) of the phases measured (like parse=0.0001, game=0.002, send=0.0001)
+		"""
+		histograms = self.getHistograms(command)
+		for phase, duration in durations.items():
+			histograms[phase].record(duration)
+
+
+	def merge(self, other):
+		"""Add the commands of another CommandMetrics (the metrics of a game played in a worker process)"""
+		for command, histograms in other.__getstate__()['_histograms'].items():
+			mine = self.getHistograms(command)
+			for phase, h in histograms.items():
+				mine[phase].merge(h)
+
+
+	def getDictInformations(self):
+		"""
+		Returns a dictionary with the number of commands and the informations about the histograms,
+		for each kind of command
+		"""
+		with self._lock:
+			allHistograms = dict(self._histograms)
+		infos = {}
+		for command, histograms in sorted(allHistograms.items()):
+			phases = {phase: h.getDictInformations() for phase, h in histograms.items()}
+			infos[command] = dict(phases, count=max(p['count'] for p in phases.values()))
+		return infos
+
+
+
+# histogram of the time taken by the server to answer a move (see PlayerSocket.playGame)
+moveLatency = Histogram('move', "time to answer PLAY_MOVE, from the reception of the command to the sending of the "
+                                "whole answer")
+
+# number and latencies of the commands of the clients (in this process)
+commandMetrics = CommandMetrics()
@@ -0,0 +1,296 @@
+"""
+* --------------------- *
+|                       |
+|   Coding Game Server  |
+|                       |
+* --------------------- *
+
+Authors: T. Hilaire, J. Brajard
+Licence: GPL
+
+File: AsyncPlayerSocket.py
+	Contains the asyncio server for the players (alternative to the ThreadingTCPServer)
+	-> the connections are managed by a single event loop while the players are not in a game
+	(CLIENT_NAME, WAIT_GAME and the waiting for the game), so an idle player costs no thread
+	-> when the game starts, the connection is handed to a thread of a pool, that plays the game
+	(with the blocking methods of PlayerSocketHandler), and it is given back to the event loop at the end of the game
+
+Copyright 2016-2017 T. Hilaire, J. Brajard
+"""
+
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from socket import socket, create_server, SHUT_RDWR, IPPROTO_TCP, TCP_NODELAY, AF_UNIX
+
+from server.Player.CommandReader import CommandReader
+from server.Player.Protocol import protocols
+from server.Player.PlayerSocket import PlayerSocketHandler, DisconnectionError, ProtocolError
+from server.Player.RateLimiter import RateLimiter
+from server.Player.Reaper import reaper, setKeepAlive
+from server.Player.RegularPlayer import RegularPlayer
+
+logger = logging.getLogger()  # general logger ('root')
+
+
+# maximum number of threads used to play the games (two per game between two regular players)
+MAX_GAME_THREADS = 2048
+
+
+
+class AsyncPlayerSocketHandler(PlayerSocketHandler):
+	"""
+	The request handler used by the asyncio server
+	It is instantiated once per connection to the server, ie one per player
+
+	The same protocol as PlayerSocketHandler is used (see doc/Protocol.md), but
+	- the lobby (name, WAIT_GAME and waiting for a game) is run as a coroutine in the event loop
+	- the game itself is played in a thread (playGame), with a blocking socket
+	"""
+
+	def __init__(self, request, client_address, server):
+		"""
+		Do not call the constructor of BaseRequestHandler (that directly handles the connection)
+		Parameters:
+		- request: (socket) the socket of the connection (non-blocking)
+		- client_address: address of the client
+		- server: (AsyncPlayerServer) the server
+		"""
+		# noinspection PyMissingConstructor
+		self.request = request
+		self.client_address = client_address
+		self.server = server
+		self._player = None
+		self._loop = server.loop
+		self._reader = CommandReader(request)
+		if request.family != AF_UNIX:
+			self.request.setsockopt(IPPROTO_TCP, TCP_NODELAY, 1)
+			setKeepAlive(self.request)
+		self._gameEvent = asyncio.Event()   # set when a game is set to the player
+		self._outbox = []                   # messages waiting to be sent (see flush and aflush)
+		self._protocol = protocols[1]       # protocol used (text protocol, until the client asks for another one)
+		self._inThread = False              # True when the connection is handled by a thread (during a game)
+		self._parked = False                # (the waiting room of the threaded server is not used)
+		self._limiter = RateLimiter()       # limits the rate of the commands of the client
+		self._lastFrame = None              # lines of the last display sent with "DISP_GAME DIFF" (see sendDisplay)
+		self._compressor = None             # compression of the game data and display (None if not asked by the client)
+		self._sendClock = False             # True if the client asks for the time left with the moves (see sendClock)
+
+
+	async def run(self):
+		"""
+		Coroutine that handle the connection with the client (player)
+		Same as PlayerSocketHandler.handle, but the waiting steps are done asynchronously
+		"""
+		try:
+			# get the name from the client and create the player
+			name = self.parsePlayerName(await self.areceiveData())
+			await self.aflush()
+			self._player = RegularPlayer(name, self.client_address[0], self)
+
+			while True:
+				# then, wait for a (new) game
+				self.parseWaitGame(await self.areceiveData())
+				await self.aflush()
+				await self.awaitGame()
+				self.sendGameStart()
+				await self.aflush()
+
+				# and play it in a thread (with a blocking socket)
+				self._inThread = True
+				self.request.setblocking(True)
+				try:
+					await self._loop.run_in_executor(self.server.executor, self.playGame)
+				finally:
+					self.request.setblocking(False)
+					self._inThread = False
+
+		except Exception as err:
+			self.manageError(err)
+			try:
+				await self.aflush()
+			except (OSError, DisconnectionError):
+				pass
+
+		finally:
+			self.finish()
+			self.request.close()
+
+
+
+	async def areceiveData(self):
+		"""
+		Send the messages waiting to be sent, and then
+		receive the next command (from the event loop) and log it
+		(the command is delayed if the client sends too many commands, and the connection is closed by the reaper if
+		the command does not come before the deadline, see PlayerSocketHandler.receiveData)
+		"""
+		while True:
+			await self.aflush()
+			self.watchDeadline()
+			try:
+				data = await self._reader.areadCommand(self._loop)
+			except ConnectionResetError:
+				raise DisconnectionError()
+			except ValueError as err:
+				raise ProtocolError(str(err))
+			finally:
+				reaper.release(self)
+			data = self.decodeData(data)
+			delay = self.limitRate(data)
+			if delay is not None:
+				if delay:
+					await asyncio.sleep(delay)
+				return data
+
+
+	def flush(self):
+		"""
+		Send the messages stored by sendData
+		(only in a game, in the thread; otherwise they are sent by the event loop with aflush)
+		"""
+		if self._inThread:
+			super().flush()
+
+
+	async def aflush(self):
+		"""
+		Send (from the event loop) the messages stored by sendData
+		(when in a game, the messages are sent by flush, in the thread)
+		"""
+		if not self._outbox:
+			return
+		data = b"".join(self._outbox)
+		self._outbox = []
+		try:
+			await self._loop.sock_sendall(self.request, data)
+		except (BrokenPipeError, ConnectionResetError):
+			raise DisconnectionError()
+
+
+	async def awaitGame(self):
+		"""
+		Wait (asynchronously) for a game
+		A "NOT_READY" message is sent if the game do not start after 5 seconds, and then every 3 seconds
+		(old clients use it to detect a disconnected server);
+		the disconnection of the client is directly detected by reading the socket
+		(the commands sent in advance by the client are kept in the reader)
+		"""
+		timeout = 5
+		watcher = self._loop.create_task(self._reader.afill(self._loop))
+		try:
+			while not self._player.waitForGame(0):
+				waiter = self._loop.create_task(self._gameEvent.wait())
+				done, _ = await asyncio.wait((waiter, watcher), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+				waiter.cancel()
+				if watcher in done:
+					# the client has sent something (or has closed the connection) while waiting
+					if isinstance(watcher.exception(), ValueError):
+						raise ProtocolError(str(watcher.exception()))
+					if watcher.exception() or not watcher.result():
+						raise DisconnectionError()
+					watcher = self._loop.create_task(self._reader.afill(self._loop))
+					continue
+				if not done:
+					self.sendData("NOT_READY")
+					await self.aflush()
+					timeout = 3
+				self._gameEvent.clear()
+		finally:
+			watcher.cancel()
+
+
+	def notifyGame(self):
+		"""
+		Called by the player when a game is set (from any thread)
+		-> wake up the coroutine waiting for the game
+		"""
+		self._loop.call_soon_threadsafe(self._gameEvent.set)
+
+
+	def disconnect(self):
+		"""
+		Close the connection (used to force the player to disconnect)
+		The socket is only shut down, the event loop (or the thread) will close it
+		"""
+		self.request.shutdown(SHUT_RDWR)
+
+
+
+class AsyncPlayerServer:
+	"""
+	asyncio server for the players
+	(same interface as the socketserver's servers: the server is run with serve_forever)
+	"""
+
+	def __init__(self, server_address, maxThreads=MAX_GAME_THREADS, unixPath=None):
+		"""
+		Parameters:
+		- server_address: tuple (host, port)
+		- maxThreads: maximum number of threads used to play the games
+		- unixPath: (string) path of a Unix domain socket to listen to (in addition to the TCP port), or None
+		"""
+		self.server_address = server_address
+		self.unixPath = unixPath
+		self.executor = ThreadPoolExecutor(max_workers=maxThreads)
+		self.loop = None
+		self._handlers = set()      # running handlers (keep a reference of their task)
+
+
+	def serve_forever(self):
+		"""
+		Run the event loop (and accept the connections)
+		"""
+		raiseFileLimit()
+		asyncio.run(self._serve())
+
+
+	async def _serve(self):
+		"""
+		Accept the connections and run a handler for each of them
+		"""
+		self.loop = asyncio.get_running_loop()
+		lsock = create_server(self.server_address, backlog=1024)
+		if self.unixPath:
+			# listen to the Unix domain socket too
+			if os.path.exists(self.unixPath):
+				os.unlink(self.unixPath)
+			usock = socket(AF_UNIX)
+			usock.bind(self.unixPath)
+			usock.listen(1024)
+			await asyncio.gather(self._accept(lsock), self._accept(usock, "unix:" + self.unixPath))
+		else:
+			await self._accept(lsock)
+
+
+	async def _accept(self, lsock, address=None):
+		"""
+		Accept the connections of a listening socket
+		Parameters:
+		- lsock: the listening socket
+		- address: address given to the clients (None to use the address of the client)
+		"""
+		lsock.setblocking(False)
+		while True:
+			sock, clientAddress = await self.loop.sock_accept(lsock)
+			sock.setblocking(False)
+			handler = AsyncPlayerSocketHandler(sock, (address, 0) if address else clientAddress, self)
+			task = self.loop.create_task(handler.run())
+			self._handlers.add(task)
+			task.add_done_callback(self._handlers.discard)
+
+
+
+def raiseFileLimit():
+	"""
+	Raise the limit of open files to its maximum (each player needs a file descriptor)
+	"""
+	try:
+		import resource
+		soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+		if soft < hard:
+			resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+	except (ImportError, ValueError, OSError):
+		# not available on every OS...
+		pass
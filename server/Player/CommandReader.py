@@ -0,0 +1,224 @@
+"""
+* --------------------- *
+|                       |
+|   Coding Game Server  |
+|                       |
+* --------------------- *
+
+Authors: T. Hilaire, J. Brajard
+Licence: GPL
+
+File: CommandReader.py
+	Contains the class CommandReader
+	-> reads the stream sent by a client, and cuts it in commands
+
+Copyright 2016-2017 T. Hilaire, J. Brajard
+"""
+
+from server.Constants import SIZE_FMT
+from server.Player.Protocol import decodeVarint
+
+
+HEAD_SIZE = len(SIZE_FMT % 0)   # size of the header of a framed command
+MAX_COMMAND_SIZE = 65536        # maximum size of a command (the buffer will not grow more)
+
+
+
+class CommandReader:
+	"""
+	Per-connection reader of the commands sent by the client
+	The data are received (with recv_into) in a buffer, that is reused for all the commands;
+	the data that are read ahead stay in the buffer, for the next commands
+	(so a client can send several commands in a row, without waiting for the answers)
+
+	Two kinds of commands are accepted:
+	- framed commands: the command is preceded by its length (same header as the messages sent by the server,
+	ie 4 digits, see SIZE_FMT), like "0008GET_MOVE"
+	- non-framed commands (old clients): the command ends with a newline, or with the end of the received data
+	(a command never starts with a digit, so it cannot be confused with a framed command); once the client has ended
+	a command with a newline, the next non-framed commands are only taken when their newline is received (so they
+	may be split); a command without newline cannot be told apart from a split command, so it may be truncated
+	With the binary protocol (varint=True), all the commands are preceded by their length, encoded as a varint
+
+	Attributes:
+	- _sock: the socket
+	- _buffer: (bytearray) buffer of received data, and _view its memoryview
+	- _start, _end: position of the unread data in the buffer
+	- varint: (bool) True when the commands are preceded by a varint (binary protocol)
+	- _newlines: (bool) True when the client ends its non-framed commands with a newline
+	"""
+
+	def __init__(self, sock, size=4096):
+		"""
+		Parameters:
+		- sock: (socket) socket to read
+		- size: (int) initial size of the buffer
+		"""
+		self._sock = sock
+		self._buffer = bytearray(size)
+		self._view = memoryview(self._buffer)
+		self._start = 0
+		self._end = 0
+		self.varint = False
+		self._newlines = False
+
+
+	@property
+	def pending(self):
+		"""Returns the number of bytes received but not yet read"""
+		return self._end - self._start
+
+
+	def takeData(self):
+		"""
+		Returns the data received but not yet read (bytes), and remove them from the buffer
+		(used to give the connection to another process, see server/Player/Worker.py)
+		"""
+		data = bytes(self._view[self._start:self._end])
+		self._start = self._end = 0
+		return data
+
+
+	def feed(self, data):
+		"""
+		Add some data (bytes) to the unread data, as if they were received from the socket
+		(used when a connection comes back from another process, see takeData)
+		"""
+		data = self.takeData() + data
+		if len(data) > len(self._buffer):
+			self._view.release()
+			self._buffer = bytearray(len(data))
+			self._view = memoryview(self._buffer)
+		self._buffer[:len(data)] = data
+		self._end = len(data)
+
+
+	def nextCommand(self):
+		"""
+		Extract the next (whole) command from the received data
+		Returns the command (bytes) or None if there is no whole command in the buffer
+		Raises a ValueError if the command is too long
+		"""
+		start, end = self._start, self._end
+		if self.varint:
+			return self._nextVarintCommand(start, end)
+
+		# skip the blanks between two commands
+		while start < end and self._buffer[start] in b" \t\r\n":
+			start += 1
+		self._start = start
+		if start == end:
+			return None
+
+		if 48 <= self._buffer[start] <= 57:
+			# framed command (start with its length)
+			if end - start < HEAD_SIZE:
+				return None
+			try:
+				size = int(self._view[start:start + HEAD_SIZE])
+			except ValueError:
+				raise ValueError("Invalid header '%s'" % bytes(self._view[start:start + HEAD_SIZE]))
+			if size + HEAD_SIZE > MAX_COMMAND_SIZE:
+				raise ValueError("The command is too long (%d bytes)" % size)
+			if end - start < HEAD_SIZE + size:
+				return None
+			self._start = start + HEAD_SIZE + size
+			return bytes(self._view[start + HEAD_SIZE:self._start])
+
+		else:
+			# non-framed command (ends with a newline, or with the data if the client does not use newlines)
+			stop = self._buffer.find(b"\n", start, end)
+			if stop < 0:
+				if self._newlines:
+					return None
+				self._start = end
+				return bytes(self._view[start:end])
+			self._newlines = True
+			self._start = stop + 1
+			return bytes(self._view[start:stop])
+
+
+	def _nextVarintCommand(self, start, end):
+		"""
+		Extract the next (whole) command from the received data, when the commands are preceded by a varint
+		Returns the command (bytes) or None if there is no whole command in the buffer
+		"""
+		header = decodeVarint(self._buffer, start, end)
+		if header is None:
+			return None
+		size, pos = header
+		if size + pos - start > MAX_COMMAND_SIZE:
+			raise ValueError("The command is too long (%d bytes)" % size)
+		if end - pos < size:
+			return None
+		self._start = pos + size
+		return bytes(self._view[pos:self._start])
+
+
+	def _freeSpace(self):
+		"""
+		Make some free space at the end of the buffer (move the unread data at the beginning, or grow the buffer)
+		Returns the memoryview where the data can be received
+		"""
+		if self._start == self._end:
+			self._start = self._end = 0
+		elif self._end == len(self._buffer):
+			if self._start > 0:
+				# move the unread data at the beginning
+				n = self._end - self._start
+				self._buffer[:n] = self._view[self._start:self._end]
+				self._start, self._end = 0, n
+			elif len(self._buffer) < MAX_COMMAND_SIZE:
+				# grow the buffer (the memoryview should be released before)
+				self._view.release()
+				self._buffer.extend(bytes(len(self._buffer)))
+				self._view = memoryview(self._buffer)
+			else:
+				raise ValueError("Too much data received")
+		return self._view[self._end:]
+
+
+	def fill(self):
+		"""
+		Receive some data (blocking) in the buffer
+		Returns the number of bytes received (0 when the connection is closed)
+		"""
+		n = self._sock.recv_into(self._freeSpace())
+		self._end += n
+		return n
+
+
+	async def afill(self, loop):
+		"""
+		Receive some data (from the event loop loop) in the buffer
+		Returns the number of bytes received (0 when the connection is closed)
+		"""
+		n = await loop.sock_recv_into(self._sock, self._freeSpace())
+		self._end += n
+		return n
+
+
+	def readCommand(self):
+		"""
+		Returns the next command (bytes), and wait (blocking) for it if necessary
+		Returns None if the connection is closed
+		"""
+		command = self.nextCommand()
+		while command is None:
+			if not self.fill():
+				return None
+			command = self.nextCommand()
+		return command
+
+
+	async def areadCommand(self, loop):
+		"""
+		Returns the next command (bytes), and wait (from the event loop) for it if necessary
+		Returns None if the connection is closed
+		"""
+		command = self.nextCommand()
+		while command is None:
+			if not await self.afill(loop):
+				return None
+			command = self.nextCommand()
+		return command
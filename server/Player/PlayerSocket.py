@@ -19,16 +19,25 @@ Copyright 2016-2017 T. Hilaire, J. Brajard
 import logging
 import shlex
 from re import sub
+from socket import SHUT_RDWR, IPPROTO_TCP, TCP_NODELAY, AF_UNIX
 from socketserver import BaseRequestHandler
+from time import sleep, perf_counter
 
-from server.Constants import LOSING_MOVE
-from server.Constants import SIZE_FMT
+from server.Checkpoint import checkpointer
+from server.Constants import LOSING_MOVE, NORMAL_MOVE, IDLE_TIMEOUT, REAP_MARGIN
 from server.Game import Game
+from server.Metrics import commandMetrics, moveLatency
+from server.Player.CommandReader import CommandReader
+from server.Player.Protocol import protocols, Compressor
+from server.Player.RateLimiter import RateLimiter
+from server.Player.Reaper import reaper, setKeepAlive
 from server.Player.RegularPlayer import RegularPlayer
 from server.Tournament import Tournament
 
 logger = logging.getLogger()  # general logger ('root')
 
+MAX_BUFFERS = 1024      # maximum number of buffers given to sendmsg (IOV_MAX)
+
 
 
 class ProtocolError(Exception):
@@ -42,18 +51,55 @@ class DisconnectionError(Exception):
 
 
 
+def splitTerms(data):
+	"""
+	Split a string in terms (separated by spaces), as shlex.split
+	shlex is only used when the string has quotes or backslashes (the usual commands do not have)
+	"""
+	if '"' in data or "'" in data or "\\" in data:
+		return shlex.split(data)
+	return data.split()
+
+
+
 class PlayerSocketHandler(BaseRequestHandler):
 	"""
 	The request handler class for our server.
 	It is instantiated once per connection to the server, ie one per player
 	"""
 
+	# commands accepted during a game: name of the command -> method that answers it (called with the arguments)
+	gameCommands = {"GET_MOVE": "answerGetMove", "PLAY_MOVE": "playMove", "PLAY_AND_WAIT": "answerPlayAndWait",
+	                "DISP_GAME": "answerDispGame", "SEND_COMMENT": "answerSendComment"}
+
+	# number and latencies of the commands (see server/Metrics.py)
+	metrics = commandMetrics
+
 	def __init__(self, request, client_address, server):
 		"""
-		Call the constructor of the based class, but add an attribute
+		Call the constructor of the based class, but add some attributes
 		"""
-		super().__init__(request, client_address, server)
 		self._player = None
+		self._outbox = []       # messages waiting to be sent (see flush)
+		self._protocol = protocols[1]   # protocol used (text protocol, until the client asks for another one)
+		self._parked = False            # True when the handler waits for a game in the waiting room (see waitForGame)
+		self._limiter = RateLimiter()   # limits the rate of the commands of the client
+		self._lastFrame = None          # lines of the last display sent with "DISP_GAME DIFF" (see sendDisplay)
+		self._compressor = None         # compression of the game data and display (None if not asked by the client)
+		self._sendClock = False         # True if the client asks for the time left with the moves (see sendClock)
+		super().__init__(request, client_address, server)
+
+
+	def setup(self):
+		"""
+		Called before handle: create the reader of the commands
+		and disable the Nagle algorithm (the answers are sent in one write, see flush) and enable the keepalive,
+		except for a Unix socket
+		"""
+		self._reader = CommandReader(self.request)
+		if self.request.family != AF_UNIX:
+			self.request.setsockopt(IPPROTO_TCP, TCP_NODELAY, 1)
+			setKeepAlive(self.request)
 
 
 	def handle(self):
@@ -61,6 +107,7 @@ class PlayerSocketHandler(BaseRequestHandler):
 		Function that handle the connection with the client (player)
 		All the connection protocol is managed here (see doc/Protocol.md)
 		After identifying the player, there is an endless loop, following the protocol (waitForGame, sendDataGame, etc.)
+		that stops when the handler is parked in the waiting room (it is resumed in another thread, see resume)
 		"""
 		try:
 			# get the name from the client and create the player
@@ -68,71 +115,228 @@ class PlayerSocketHandler(BaseRequestHandler):
 			name = self.getPlayerName()
 			self._player = RegularPlayer(name, self.client_address[0], self)
 
-			while True:
-				# then, wait for a (new) game
-				self.waitForGame()
-
-				# and finally send the data for the game
-				self.sendGameData()
-
-				# repeat until we're still in the game
-				while self.game is not None:
-					data = self.receiveData()
-
-					if data.startswith("GET_MOVE"):
-						# get move of the opponent
-						if self._player is not self.game.playerWhoPlays:
-							self.sendData("OK")
-							# get the last move
-							move, return_code = self.game.getLastMove()
-							# send the move and the return code
-							self.sendData(move)
-							self.sendData(str(return_code))
-						else:
-							# we cannot ask for a move, since it's our turn to play
-							self.sendData("It's our turn to play, so we cannot ask for a move!")
-
-					elif data.startswith("PLAY_MOVE "):
-						# check if it's not too late (timeout)
-						if self.game is None:   # the game is already finished due to TIMEOUT
-							# Timeout !
-							self.sendData("OK")
-							return_code, msg = LOSING_MOVE, "Timeout !"
-							self.sendData(str(return_code))
-							self.sendData(msg)
-						# play move
-						elif self._player is self.game.playerWhoPlays:
-							self.sendData("OK")
-							# play that move to see if it's a winning/losing/normal move
-							return_code, msg = self.game.playMove(data[10:])
-							# now, send the result of the move and the associated message
-							self.sendData(str(return_code))
-							self.sendData(msg)
-						else:
-							self.sendData("It's not our turn to play, so we cannot play a move!")
-
-					elif data.startswith("DISP_GAME"):
-						# returns a (long) string describing the labyrinth
-						self.sendData("OK")
-						# we do not use sendData here, because we do not want to log the full message...
-						msg = self.game.display(self._player).encode()
-						head = SIZE_FMT % len(msg)
-						try:
-							self.request.sendall(str(head).encode('utf-8'))
-							self.request.sendall(msg)
-						except BrokenPipeError:
-							raise DisconnectionError()
-						self.logger.low_debug("Send string to display to player %s (%s)", self._player.name, self.client_address[0])
-
-					elif data.startswith("SEND_COMMENT "):
-						# receive comment
-						self.sendData("OK")
-						self.game.sendComment(self._player, data[13:])
-
-					else:
-						raise ProtocolError("Bad protocol, command should not start with '" + data + "'")
-
-		except ProtocolError as err:
+			# then, wait for a (new) game and play it
+			self.playGames()
+
+		except Exception as err:
+			self.manageError(err)
+
+
+	def playGames(self):
+		"""
+		Wait for a (new) game and play it, until the handler is parked in the waiting room
+		"""
+		while self.waitForGame():
+			self.playGame()
+
+
+	def resume(self, err=None, played=False):
+		"""
+		Called (in a new thread) by the waiting room, when the game has started or when an error occurs
+		while the handler was parked (disconnection of the client, etc.)
+		Parameters:
+		- err: (Exception) the error (or None if the game has started)
+		- played: (bool) True if the game has already been played (by a worker process, see server/Player/Worker.py)
+		"""
+		self._parked = False
+		try:
+			if err is not None:
+				raise err
+			# send the game name and sizes, and play the game (and then the next ones)
+			if not played:
+				self.sendGameStart()
+				self.playGame()
+			self.playGames()
+
+		except Exception as err:
+			self.manageError(err)
+
+		finally:
+			self.finish()
+
+
+
+	def playGame(self):
+		"""
+		Send the data of the game, and then answer to the commands of the client
+		until the game is over (see doc/Protocol.md)
+		"""
+		# send the data for the game
+		self.sendGameData()
+
+		# repeat until we're still in the game
+		# (each command is parsed once, and answered by its method, see gameCommands)
+		# (the time to answer a move, from the reception of PLAY_MOVE to the sending of the whole answer, is measured)
+		while self.game is not None:
+			data = self.receiveData()
+			start = perf_counter()
+			command, _, args = data.partition(" ")
+			method = self.gameCommands.get(command)
+			if method is None:
+				raise ProtocolError("Bad protocol, command should not start with '" + data + "'")
+			parsed = perf_counter()
+			getattr(self, method)(args)
+			played = perf_counter()
+			self.flush()
+			sent = perf_counter()
+			self.metrics.record(command, parse=self._decodeTime + parsed - start, game=played - parsed,
+			                    send=sent - played)
+			if command == "PLAY_MOVE":
+				moveLatency.record(self._decodeTime + sent - start)
+
+
+	def answerGetMove(self, _):
+		"""
+		Answer to GET_MOVE: get the move of the opponent
+		"""
+		if self.game is None:
+			# the game has been stopped in the meantime
+			self.sendData("OK")
+			self.sendMove("")
+			self.sendReturnCode(LOSING_MOVE)
+			self.sendClock(None)
+		elif not self.game.hasToPlay(self._player):
+			self.sendData("OK")
+			self.sendOpponentMove()
+		else:
+			# we cannot ask for a move, since it's our turn to play
+			self.sendData("It's our turn to play, so we cannot ask for a move!")
+
+
+	def answerPlayAndWait(self, move):
+		"""
+		Answer to PLAY_AND_WAIT: play a move and then wait for the opponent's move (PLAY_MOVE and GET_MOVE in one
+		command); the display of the game is also sent if the command is "PLAY_AND_WAIT DISP <move>"
+		Parameters:
+		- move: (string) the move (preceded by "DISP ")
+		"""
+		display = move.startswith("DISP ")
+		if display:
+			move = move[5:]
+		game = self.game
+		return_code = self.playMove(move)
+		if return_code is not None:
+			if return_code == NORMAL_MOVE:
+				if self.game is not None:
+					self.sendOpponentMove()
+				else:
+					# the game has been stopped in the meantime
+					self.sendMove("")
+					self.sendReturnCode(LOSING_MOVE)
+					self.sendClock(None)
+			if display:
+				if game is not None:
+					self.sendDisplay(game)
+				else:
+					# the game was already over (timeout): an empty display is sent
+					self.sendMessage(b"", compress=True)
+
+
+	def answerDispGame(self, option):
+		"""
+		Answer to DISP_GAME: send a (long) string describing the game
+		(or only the lines that have changed, with "DISP_GAME DIFF")
+		"""
+		self.sendData("OK")
+		self.sendDisplay(self.game, option == "DIFF")
+		self.logger.low_debug("Send string to display to player %s (%s)", self._player.name, self.client_address[0])
+
+
+	def answerSendComment(self, comment):
+		"""
+		Answer to SEND_COMMENT: receive a comment
+		"""
+		self.sendData("OK")
+		self.game.sendComment(self._player, comment)
+
+
+
+	def playMove(self, move):
+		"""
+		Answer to PLAY_MOVE: play the move, and send the return code and the associated message
+		Parameters:
+		- move: (string) the move
+		Returns the return code of the move, or None if it's not our turn to play
+		"""
+		# check if it's not too late (timeout)
+		if self.game is None:   # the game is already finished due to TIMEOUT
+			# Timeout !
+			self.sendData("OK")
+			return_code, msg = LOSING_MOVE, "Timeout !"
+		# play move
+		elif self.game.hasToPlay(self._player):
+			self.sendData("OK")
+			# play that move to see if it's a winning/losing/normal move
+			return_code, msg = self.game.playMove(move)
+		else:
+			self.sendData("It's not our turn to play, so we cannot play a move!")
+			return None
+		# now, send the result of the move and the associated message
+		self.sendReturnCode(return_code)
+		self.sendData(msg)
+		return return_code
+
+
+	def sendOpponentMove(self):
+		"""
+		Wait for the move of the opponent, and send it with its return code (and the time left, see sendClock)
+		"""
+		game = self.game
+		move, return_code = game.getLastMove(self._player)
+		self.sendMove(move)
+		self.sendReturnCode(return_code)
+		self.sendClock(game)
+
+
+	def sendClock(self, game):
+		"""
+		Send the time (in ms) left to the player and to its opponent ("%d %d"), after the move of the opponent, if the
+		client has asked for it ("CLIENT_NAME <name> CLOCK=1")
+		It is the time left on their clocks when the game has a clock (see the 'clock' option of Game), the timeout of
+		the game otherwise (and "0 0" when the game has been stopped)
+		Parameters:
+		- game: the game (None if it has been stopped)
+		"""
+		if self._sendClock:
+			left = game.getTimesLeft(self._player) if game is not None else (0, 0)
+			self.sendData("%d %d" % left)
+
+
+
+	def sendDisplay(self, game, diff=False):
+		"""
+		Send the display of the game (see Game.display)
+		Parameters:
+		- game: (Game) the game
+		- diff: (bool) if True, only the lines that have changed since the last display sent with diff=True are sent;
+		the message is then "D<number of lines>\n" followed by "<index> <line>\n" for each line that has changed,
+		or "F<display>" when the whole display is sent (first display, or when most of the lines have changed)
+		"""
+		display = game.display(self._player)
+		if diff:
+			lines = display.split("\n")
+			last, self._lastFrame = self._lastFrame, lines
+			if last is not None:
+				changes = "".join("%d %s\n" % (i, line) for i, line in enumerate(lines) if i >= len(last) or line != last[i])
+				if len(changes) < len(display):
+					display = "D%d\n%s" % (len(lines), changes)
+				else:
+					display = "F" + display
+			else:
+				display = "F" + display
+		# we do not log the full message...
+		self.sendMessage(display.encode('utf-8'), compress=True)
+
+
+
+	def manageError(self, err):
+		"""
+		Manage an exception raised during the protocol
+		(log it, end the current game and answer to the client if possible)
+		Parameters:
+		- err: (Exception) the exception raised
+		"""
+		if isinstance(err, ProtocolError):
 			# log the protocol error
 			if self._player is None:
 				logger.info("Error with client (%s): '%s'", self.client_address[0], err)
@@ -144,18 +348,18 @@ class PlayerSocketHandler(BaseRequestHandler):
 			# answers the client about the error
 			try:
 				self.sendData(str(err))
+				self.flush()
 			except ConnectionError:
 				pass
 			except DisconnectionError:
 				pass
 
-		except DisconnectionError:
+		elif isinstance(err, DisconnectionError):
 			# ends the game
 			if self.game is not None:
 				self.game.partialEndOfGame(self._player)
 
-
-		except Exception as err:
+		else:
 			# log all the other errors
 			self.logger.error(err, exc_info=True)
 
@@ -164,7 +368,11 @@ class PlayerSocketHandler(BaseRequestHandler):
 	def finish(self):
 		"""
 		Call when the connection is closed
+		(or when the handler is parked in the waiting room, and then nothing is done)
 		"""
+		reaper.release(self)
+		if self._parked:
+			return
 		try:
 			if self._player is not None:
 				self.logger.info("Connection closed with player %s (%s)", self._player.name, self.client_address[0])
@@ -180,21 +388,76 @@ class PlayerSocketHandler(BaseRequestHandler):
 
 
 
-	def receiveData(self, size=1024):
+	def receiveData(self):
 		"""
-		Receive data (from self.request.recv)
+		Send the messages waiting to be sent, and then
+		receive the next command (from the command reader, that reads self.request)
 		and log it
+		The command is delayed if the client sends too many commands (and the rejected commands are skipped)
+		The connection is closed by the reaper if the command does not come before the deadline (see watchDeadline)
+		"""
+		while True:
+			self.flush()
+			self.watchDeadline()
+			try:
+				data = self._reader.readCommand()
+			except ConnectionResetError:
+				raise DisconnectionError()
+			except ValueError as err:
+				raise ProtocolError(str(err))
+			finally:
+				reaper.release(self)
+			data = self.decodeData(data)
+			delay = self.limitRate(data)
+			if delay is not None:
+				if delay:
+					sleep(delay)
+				return data
+
+
+	def watchDeadline(self):
+		"""
+		Set the deadline of the next command of the client (see server/Player/Reaper.py):
+		the timeout of the game (plus REAP_MARGIN) during a game, IDLE_TIMEOUT otherwise
+		"""
+		game = self.game
+		if game is not None:
+			reaper.watch(self, game.timeout + REAP_MARGIN, 'game')
+		else:
+			reaper.watch(self, IDLE_TIMEOUT, 'idle')
+
+
+	def reap(self, reason):
+		"""
+		Called by the reaper when the client has not sent a command before its deadline
+		-> shut the connection down (the thread waiting for the command gets a disconnection, and does the cleanup)
+		Parameters:
+		- reason: (string) 'idle' (outside a game) or 'game' (during a game)
 		"""
+		self.logger.info("No command from %s (%s) %s, the connection is closed",
+		                 self._player.name if self._player else "client", self.client_address[0],
+		                 "in time during the game" if reason == 'game' else "for %d seconds" % IDLE_TIMEOUT)
 		try:
-			data = str(self.request.recv(size).strip(), "utf-8")
-		except ConnectionResetError:
-			raise DisconnectionError()
+			self.request.shutdown(SHUT_RDWR)
+		except OSError:
+			# already closed
+			pass
+
 
-		# check if the client has closed the connection
-		# (don't know why, but when the connection is cloded by the client when the server wait with recv, we cannot
-		# use the self.server._closed attribute...)
-		if data == '':
+	def decodeData(self, data):
+		"""
+		Decode the command received from the client (bytes) as a text command, and log it
+		Raises DisconnectionError if the client has closed the connection (data is None)
+		The time spent to decode it is stored in _decodeTime (for the metrics, see playGame)
+		"""
+		if data is None:
 			raise DisconnectionError()
+		start = perf_counter()
+		try:
+			data = self._protocol.decodeCommand(data)
+		except ValueError as err:
+			raise ProtocolError(str(err))
+		self._decodeTime = perf_counter() - start
 		# log it
 		if self._player:
 			self.logger.low_debug("Receive: '%s' from %s (%s) ", data, self._player.name, self.client_address[0])
@@ -203,26 +466,182 @@ class PlayerSocketHandler(BaseRequestHandler):
 		return data
 
 
-	def sendData(self, data):
+	def limitRate(self, data):
 		"""
-		Send data (with self.request.sendall) and log it
+		Account for the command received in the rate limiter (see server/Player/RateLimiter.py)
+		Returns the time (in seconds) the command should be delayed,
+		or None if the command is rejected (the answer is then already stored in the messages to be sent)
+		"""
+		state = self._limiter.state
+		delay = self._limiter.acquire(data, self._reader.pending > 0)
+		if delay is None:
+			self.sendData("Too many commands, the command '%s' is rejected" % data.split(" ", 1)[0][:20])
+		if self._limiter.state != state:
+			self.logger.info("Too many commands from %s (%s): %s", self._player.name if self._player else "client",
+			                 self.client_address[0], self._limiter.state or "back to normal")
+			if self._player:
+				self._player.sendUpdateToWebSocket()
+		return delay
+
+
+	def sendData(self, data, log=True):
+		"""
+		Store data (with its size) in the messages to be sent, and log it
+		The messages are really sent by flush (all the messages of an answer are sent in one write)
 		:param data: (str) data to send
+		:param log: (bool) True if the message should be logged
 		"""
+		self.sendMessage(data.encode('utf-8'), data if log else None)
 
-		try:
-			head = SIZE_FMT % len(data.encode("utf-8"))
-			self.request.sendall(str(head).encode('utf-8'))
-			if data:
-				self.request.sendall(data.encode('utf-8'))
-			else:
-				# that's a trick when we want to send an empty message...
-				self.request.sendall(''.encode('utf-8'))
+
+	def sendMessage(self, msg, text=None, compress=False):
+		"""
+		Store a message (already encoded) with its size in the messages to be sent, and log it
+		:param msg: (bytes) message to send
+		:param text: (str) message to log (None if the message should not be logged)
+		:param compress: (bool) True if the message is compressed when the client has asked for it
+		(only for the large messages: game data and display)
+		"""
+		if compress and self._compressor:
+			self._outbox.extend(self._protocol.frameCompressed(self._compressor.compress(msg)))
+		else:
+			self._outbox.extend(self._protocol.frame(msg))
+		if text is not None:
 			if self._player:
-				self.logger.low_debug("Send '%s' to %s (%s) ", data, self._player.name, self.client_address[0])
+				self.logger.low_debug("Send '%s' to %s (%s) ", text, self._player.name, self.client_address[0])
 			else:
-				logger.low_debug("Send '%s' to %s", data, self.client_address[0])
-		except BrokenPipeError:
+				logger.low_debug("Send '%s' to %s", text, self.client_address[0])
+
+
+	def sendMove(self, move):
+		"""Send a move (string), encoded by the protocol"""
+		self.sendMessage(self._protocol.encodeMove(move), move)
+
+
+	def sendReturnCode(self, return_code):
+		"""Send a return code (int), encoded by the protocol"""
+		self.sendMessage(self._protocol.encodeReturnCode(return_code), str(return_code))
+
+
+	def setProtocol(self, version):
+		"""
+		Change the protocol used (for the next messages and commands)
+		:param version: (int) version of the protocol
+		"""
+		self._protocol = protocols[version]
+		self._reader.varint = self._protocol.varint
+
+
+	def flush(self):
+		"""
+		Send all the messages stored by sendData, in one write (with sendmsg, ie writev)
+		"""
+		buffers = self._outbox
+		self._outbox = []
+		try:
+			while buffers:
+				sent = self.request.sendmsg(buffers[:MAX_BUFFERS])
+				# remove what has been sent (sendmsg may only send a part of the data)
+				i = 0
+				while i < len(buffers) and sent >= len(buffers[i]):
+					sent -= len(buffers[i])
+					i += 1
+				buffers = buffers[i:]
+				if sent:
+					buffers[0] = buffers[0][sent:]
+		except (BrokenPipeError, ConnectionResetError):
+			raise DisconnectionError()
+
+
+	def notifyGame(self):
+		"""
+		Called by the player when a game is set
+		-> tell it to the waiting room, if the handler is parked
+		(otherwise, the handler checks the player's Event in waitForGame)
+		"""
+		if self._parked:
+			self.server.waitingRoom.notify(self)
+
+
+	def disconnect(self):
+		"""
+		Close the connection (used to force the player to disconnect)
+		When the handler is parked, the socket is only shut down (the waiting room detects it and closes it)
+		"""
+		self.request.shutdown(SHUT_RDWR)
+		if not self._parked:
+			self.request.close()
+
+
+	def handOff(self):
+		"""
+		Returns the informations needed to play the game in a worker process (see server/Player/Worker.py):
+		the name of the player, the address of the client, the version of the protocol, the data not yet read,
+		the rate limiter, if the compression is used and if the time left is sent with the moves
+		"""
+		return (self._player.name, self.client_address, self._protocol.version, self._reader.takeData(), self._limiter,
+		        self._compressor is not None, self._sendClock)
+
+
+	def handBack(self, data, limiter):
+		"""
+		Called when the game played by a worker process is over
+		Parameters:
+		- data: (bytes) data received by the worker but not yet read
+		- limiter: (RateLimiter) the rate limiter, as updated by the worker (None to keep the previous one)
+		"""
+		self._reader.feed(data)
+		if limiter is not None:
+			self._limiter = limiter
+		self._lastFrame = None      # the client has received the displays of the worker
+		if self._compressor:
+			self._compressor.reset()    # (and the messages compressed by the worker)
+
+
+	@property
+	def isParked(self):
+		"""Returns True if the handler waits for a game in the waiting room"""
+		return self._parked
+
+
+	def gameHasStarted(self):
+		"""Returns True if a game has been set for the player (used by the waiting room)"""
+		return self._player.waitForGame(0)
+
+
+	def fillReader(self):
+		"""
+		Read the data sent by the client while the handler is parked (used by the waiting room)
+		The commands are kept in the reader
+		Raises DisconnectionError if the client has closed the connection, ProtocolError if the data are too long
+		"""
+		try:
+			if not self._reader.fill():
+				raise DisconnectionError()
+		except ConnectionResetError:
 			raise DisconnectionError()
+		except ValueError as err:
+			raise ProtocolError(str(err))
+
+
+	def sendNotReady(self):
+		"""
+		Send a "NOT_READY" message (used by the waiting room, so that the old clients know the server is alive)
+		"""
+		self.sendData("NOT_READY")
+		self.flush()
+
+
+	@property
+	def rateLimiter(self):
+		"""Returns the rate limiter of the commands (used for the counters of the web page)"""
+		return self._limiter
+
+
+	@property
+	def player(self):
+		"""Returns the player (or None if the player is not yet created)"""
+		return self._player
 
 
 	@property
@@ -254,12 +673,37 @@ class PlayerSocketHandler(BaseRequestHandler):
 		or raises an exception (ProtocolError) if the request is not valid
 		"""
 
-		# get data
-		data = self.receiveData()
+		return self.parsePlayerName(self.receiveData())
+
+
+	def parsePlayerName(self, data):
+		"""
+		Treat the "CLIENT_NAME" message received from the client
+		Returns the player name
+		or raises an exception (ProtocolError) if the request is not valid
+		"""
 		if not data.startswith("CLIENT_NAME "):
 			raise ProtocolError("Bad protocol, should start with CLIENT_NAME ")
 
-		data = data[12:]
+		# the client may ask for another version of the protocol, for the compression of the large messages and/or for
+		# the time left with the moves ("CLIENT_NAME <name> PROTOCOL=<version> COMPRESS=1 CLOCK=1")
+		data, _, options = data[12:].partition(" ")
+		version, compress, clock = 1, False, False
+		for option in options.split():
+			try:
+				key, value = option.split("=")
+				if key == "PROTOCOL" and int(value) in protocols:
+					version = int(value)
+				elif key == "COMPRESS" and value in ("0", "1"):
+					compress = value == "1"
+				elif key == "CLOCK" and value in ("0", "1"):
+					clock = value == "1"
+				else:
+					raise ValueError()
+			except ValueError:
+				self.sendData("Invalid option (should be 'PROTOCOL=<version>', with version in %s, 'COMPRESS=<0|1>' or "
+				              "'CLOCK=<0|1>')" % list(protocols))
+				raise ProtocolError("Invalid option '%s' (from %s)" % (option, self.client_address[0]))
 
 		# check if the player doesn't exist yet
 		if data in RegularPlayer.allInstances:
@@ -275,8 +719,11 @@ class PlayerSocketHandler(BaseRequestHandler):
 			                    (data, self.client_address[0]))
 
 
-		# just send back OK
+		# just send back OK (with the current protocol), and then use the protocol (and compression) asked
 		self.sendData("OK")
+		self.setProtocol(version)
+		self._compressor = Compressor() if compress else None
+		self._sendClock = clock
 		return name
 
 
@@ -292,20 +739,43 @@ class PlayerSocketHandler(BaseRequestHandler):
 		- "WAIT_GAME {options}": wait for a regular game (with options)
 		- "WAIT_GAME TOURNAMENT <name> {options}": register in the tournament <name> and wait for a game
 		- "WAIT_GAME TRAINING <name> {options}": play agains a training player
-        Returns nothing
+
+		Returns True if the game has started, or False if the handler is parked in the waiting room
+		(the thread should return, and the waiting room will resume the handler when the game starts, see resume)
+		"""
+		# get the WAIT_GAME message and treat it
+		self.parseWaitGame(self.receiveData())
+		self.flush()
+
+		# the game may already be there (training game)
+		if not self._player.waitForGame(0):
+			# otherwise, park the handler in the waiting room (it sends the "NOT_READY" messages
+			# for the old clients and detects the disconnection)
+			self._parked = True
+			return False
+
+		# now send the game name and sizes
+		self.sendGameStart()
+		return True
+
+
+	def parseWaitGame(self, data):
+		"""
+		Treat the "WAIT_GAME %s" message received from the client (see waitForGame)
+		Create the training game or register the player in the tournament, and acknowledge it
+		Raises an exception (ProtocolError) if the request is not valid
 		"""
-		# get the WAIT_GAME message
-		data = self.receiveData()
 		if not data.startswith("WAIT_GAME"):
 			self.sendData("Bad protocol, should send 'WAIT_GAME %s' command")
 			raise ProtocolError("Bad protocol, should send 'WAIT_GAME %s' command")
 
 		# parse the game type (in the form "TOURNAMENT NAME key1=value1..." or "TRAINING NAME key1=value1 key2=value2")
+		start = perf_counter()
 		trainingPlayerName = ""
 		tournamentName = ""
 		options = {}
 		try:
-			terms = shlex.split(data[10:])
+			terms = splitTerms(data[10:])
 			if terms:
 				if "=" in terms[0]:
 					options = dict([token.split('=') for token in terms])
@@ -314,7 +784,7 @@ class PlayerSocketHandler(BaseRequestHandler):
 					options = dict([token.split('=') for token in terms[2:]])
 				elif terms[0] == 'TRAINING':
 					trainingPlayerName = terms[1]
-					options = dict([token.split('=') for token in terms[1:]])
+					options = dict([token.split('=') for token in terms[2:]])
 				else:
 					raise ValueError()
 		except ValueError:
@@ -322,8 +792,13 @@ class PlayerSocketHandler(BaseRequestHandler):
 			         " 'TRAINING <name> {options}' or 'TOURNAMENT <name> {options}', but is '%s' instead)"
 			self.sendData(strerr)
 			raise ProtocolError(strerr)
+		parsed = perf_counter()
 
-		if trainingPlayerName:
+		if checkpointer.rejoin(self._player):
+			# the player was playing a game when the server has stopped: it takes its place again in that game (restored
+			# from its snapshot, see server/Checkpoint.py), instead of a new game
+			self.logger.info("Rejoin the game restored from its snapshot")
+		elif trainingPlayerName:
 			# Create a particular Game
 			try:
 				# create game (no need to store it in a variable)
@@ -344,15 +819,13 @@ class PlayerSocketHandler(BaseRequestHandler):
 
 		# just send back OK
 		self.sendData("OK")
+		self.metrics.record("WAIT_GAME", parse=self._decodeTime + parsed - start, game=perf_counter() - parsed)
 
-		# wait for the Game
-		# and send every second a "NOT_READY" if the game do not start
-		# in order to know if the client has disconnected
-		gameHasStarted = self._player.waitForGame(5)
-		while not gameHasStarted:
-			self.sendData("NOT_READY")
-			gameHasStarted = self._player.waitForGame(3)
 
+	def sendGameStart(self):
+		"""
+		Send the game name and the game sizes (when the game has started)
+		"""
 		# now send the game name
 		self.sendData(self.game.name)
 
@@ -377,6 +850,10 @@ class PlayerSocketHandler(BaseRequestHandler):
 
 		# Get the labyrinth
 		self.sendData("OK")
-		self.sendData(self.game.getData())
-		self.sendData('0' if self.game.playerWhoPlays is self._player else '1')  # send '0' if we begin, '1' otherwise
+		data = self.game.getData()
+		self.sendMessage(self._protocol.encodeGameData(data), data, compress=True)
+		# send 0 if we play first, 1 otherwise (the opponent may have already played, so it is not who plays now; a
+		# restored game continues with the player who was playing)
+		who = 0 if self.game.playerWhoStarts is self._player else 1
+		self.sendMessage(self._protocol.encodeWhoPlays(who), str(who))
 
@@ -0,0 +1,259 @@
+"""
+* --------------------- *
+|                       |
+|   Coding Game Server  |
+|                       |
+* --------------------- *
+
+Authors: T. Hilaire, J. Brajard
+Licence: GPL
+
+File: Protocol.py
+	Contains the classes TextProtocol, BinaryProtocol and Compressor
+	-> encode/decode the messages exchanged with the client, for the two versions of the protocol
+	(see doc/Protocol.md)
+	-> compress the large messages (game data and display), when the client asks for it
+
+Copyright 2016-2017 T. Hilaire, J. Brajard
+"""
+
+import zlib
+from struct import pack, unpack, error as StructError
+
+from server.Constants import SIZE_FMT, LARGE_SIZE_FMT
+
+
+# opcodes of the commands in the binary protocol (v2)
+OPCODES = {
+	1: "CLIENT_NAME",
+	2: "WAIT_GAME",
+	3: "GET_GAME_DATA",
+	4: "GET_MOVE",
+	5: "PLAY_MOVE",
+	6: "DISP_GAME",
+	7: "SEND_COMMENT",
+	8: "PLAY_AND_WAIT",
+}
+PLAY_MOVE_OPCODE = 5
+PLAY_AND_WAIT_OPCODE = 8
+
+# kind of game data (first byte of the game data, in the binary protocol)
+RAW_DATA = 0        # the data are sent as they are (utf-8 string)
+BITMAP_DATA = 1     # the data (a string of '0' and '1') are sent as a bitmap
+
+
+def encodeVarint(n):
+	"""
+	Encode a positive integer as a varint (7 bits per byte, least significant group first,
+	the most significant bit of a byte is set when other bytes follow)
+	Returns the bytes
+	"""
+	out = bytearray()
+	while n >= 0x80:
+		out.append((n & 0x7F) | 0x80)
+		n >>= 7
+	out.append(n)
+	return bytes(out)
+
+
+def decodeVarint(buffer, start, end):
+	"""
+	Decode a varint from buffer[start:end]
+	Returns a tuple (value, position after the varint), or None if the varint is not complete
+	Raises a ValueError if the varint is too long (more than 4 bytes)
+	"""
+	value = 0
+	shift = 0
+	for pos in range(start, min(end, start + 4)):
+		b = buffer[pos]
+		value |= (b & 0x7F) << shift
+		if not b & 0x80:
+			return value, pos + 1
+		shift += 7
+	if end - start >= 4:
+		raise ValueError("Invalid header (varint too long)")
+	return None
+
+
+
+class TextProtocol:
+	"""
+	Text protocol (version 1)
+	Each message is a string, preceded by its size (4 digits, see SIZE_FMT)
+	The commands are text commands (like "PLAY_MOVE 2 3")
+	"""
+	version = 1
+	varint = False      # True if the messages are preceded by a varint (instead of SIZE_FMT)
+
+	def frame(self, msg):
+		"""
+		Returns the list of buffers to send a message (bytes)
+		"""
+		if msg:
+			return [(SIZE_FMT % len(msg)).encode('utf-8'), msg]
+		return [(SIZE_FMT % 0).encode('utf-8')]
+
+
+	def frameCompressed(self, msg):
+		"""
+		Returns the list of buffers to send a compressed message (bytes)
+		(its size has 8 digits, see LARGE_SIZE_FMT, so that large boards can be sent)
+		"""
+		return [(LARGE_SIZE_FMT % len(msg)).encode('utf-8'), msg]
+
+
+	def decodeCommand(self, data):
+		"""
+		Returns the text command (string) corresponding to the data (bytes) sent by the client
+		Raises a ValueError if the command is not valid
+		"""
+		try:
+			return str(data.strip(), "utf-8")
+		except UnicodeDecodeError:
+			raise ValueError("Bad protocol, the command is not a valid utf-8 string")
+
+
+	def encodeMove(self, move):
+		"""Encode a move (string like "3 5")"""
+		return move.encode('utf-8')
+
+
+	def encodeReturnCode(self, return_code):
+		"""Encode a return code (int)"""
+		return str(return_code).encode('utf-8')
+
+
+	def encodeWhoPlays(self, who):
+		"""Encode who plays (0 if the player plays, 1 otherwise)"""
+		return str(who).encode('utf-8')
+
+
+	def encodeGameData(self, data):
+		"""Encode the game data (string)"""
+		return data.encode('utf-8')
+
+
+
+class BinaryProtocol(TextProtocol):
+	"""
+	Compact binary protocol (version 2)
+	Each message (and each command) is preceded by its size, encoded as a varint
+	- the commands start with an opcode (1 byte, see OPCODES), followed by the arguments (utf-8 string), except
+	for PLAY_MOVE, where the move is a sequence of signed 16-bit integers (big endian), and for PLAY_AND_WAIT, where
+	the move follows a byte that indicates if the display is asked (1) or not (0)
+	- the moves sent to the client are sequences of signed 16-bit integers (big endian)
+	- the return code and who plays are sent as one (signed) byte
+	- the game data start by a byte that indicates their kind: RAW_DATA (followed by the string) or BITMAP_DATA
+	(followed by the number of bits, as a varint, and the bits, most significant bit first)
+	- all the other messages (acknowledgment, game name, etc.) are utf-8 strings
+	The server translates these messages to/from the text protocol (the games only know the text protocol)
+	"""
+	version = 2
+	varint = True
+
+	def frame(self, msg):
+		"""
+		Returns the list of buffers to send a message (bytes)
+		"""
+		if msg:
+			return [encodeVarint(len(msg)), msg]
+		return [b'\x00']
+
+
+	def frameCompressed(self, msg):
+		"""
+		Returns the list of buffers to send a compressed message (bytes)
+		(the varint has no limit, so it is framed as the other messages)
+		"""
+		return self.frame(msg)
+
+
+	def decodeCommand(self, data):
+		"""
+		Returns the text command (string) corresponding to the data (bytes) sent by the client
+		Raises a ValueError if the command is not valid
+		"""
+		if not data or data[0] not in OPCODES:
+			raise ValueError("Bad protocol, invalid opcode")
+		command = OPCODES[data[0]]
+		if data[0] == PLAY_AND_WAIT_OPCODE:
+			if len(data) < 2:
+				raise ValueError("Bad protocol, invalid PLAY_AND_WAIT command")
+			return command + (" DISP" if data[1] else "") + self.decodeMove(data[2:])
+		if data[0] == PLAY_MOVE_OPCODE:
+			return command + self.decodeMove(data[1:])
+		args = super().decodeCommand(data[1:])
+		return command + " " + args if args else command
+
+
+	@staticmethod
+	def decodeMove(data):
+		"""Returns the move (string like " 3 5", with a leading space) from a sequence of 16-bit integers"""
+		if len(data) % 2:
+			raise ValueError("Bad protocol, the move should be a sequence of 16-bit integers")
+		values = unpack('>%dh' % (len(data) // 2), data)
+		return "".join(" %d" % v for v in values)
+
+
+	def encodeMove(self, move):
+		"""Encode a move (string like "3 5") as a sequence of 16-bit integers (empty if the move is not valid)"""
+		try:
+			values = [int(v) for v in move.split()]
+			return pack('>%dh' % len(values), *values)
+		except (ValueError, StructError):
+			return b''
+
+
+	def encodeReturnCode(self, return_code):
+		"""Encode a return code (int) in one byte"""
+		return pack('b', return_code)
+
+
+	def encodeWhoPlays(self, who):
+		"""Encode who plays (0 if the player plays, 1 otherwise) in one byte"""
+		return pack('b', who)
+
+
+	def encodeGameData(self, data):
+		"""Encode the game data (string); a string of '0' and '1' is encoded as a bitmap"""
+		if data and not data.strip('01'):
+			bits = int(data, 2) << (-len(data) % 8)
+			return bytes([BITMAP_DATA]) + encodeVarint(len(data)) + bits.to_bytes((len(data) + 7) // 8, 'big')
+		return bytes([RAW_DATA]) + data.encode('utf-8')
+
+
+
+# the protocols, indexed by their version
+protocols = {p.version: p for p in (TextProtocol(), BinaryProtocol())}
+
+
+
+class Compressor:
+	"""
+	Compression of the large messages (game data and display) of a connection,
+	when the client asks for it ("CLIENT_NAME <name> COMPRESS=1")
+	The messages form one raw deflate stream (per connection, so a message can refer to the previous ones), and each
+	message ends with a sync flush, so that the client can inflate it as soon as it is received
+	Since the stream is raw (no zlib header), a new compression context can continue the stream (see reset)
+	"""
+
+	def __init__(self, level=6):
+		"""
+		Parameters:
+		- level: (int) compression level (1 to 9)
+		"""
+		self._level = level
+		self.reset()
+
+
+	def reset(self):
+		"""
+		Start a new compression context: the next messages do not refer to the previous ones
+		(used when some messages have been sent by another context, see server/Player/Worker.py)
+		"""
+		self._zobj = zlib.compressobj(self._level, zlib.DEFLATED, -15)
+
+
+	def compress(self, msg):
+		"""Returns the compressed message (bytes)"""
+		return self._zobj.compress(msg) + self._zobj.flush(zlib.Z_SYNC_FLUSH)
@@ -0,0 +1,142 @@
+"""
+* --------------------- *
+|                       |
+|   Coding Game Server  |
+|                       |
+* --------------------- *
+
+Authors: T. Hilaire, J. Brajard
+Licence: GPL
+
+File: RateLimiter.py
+	Contains the classes TokenBucket and RateLimiter
+	-> limits the rate of the commands sent by a client (per connection, and per kind of command),
+	so that a buggy client (that sends DISP_GAME in a tight loop, for example) cannot take the CPU of the other games
+	-> the commands over the limit are delayed (the handler does not read the socket in the meantime, so the client
+	is slowed down), and they are only rejected when the client keeps sending commands while it is slowed down, for
+	too long (a client that waits for each answer is only slowed down)
+
+Copyright 2016-2017 T. Hilaire, J. Brajard
+"""
+
+from html import escape
+from time import monotonic
+
+from server.Constants import RATE_LIMITS, ABUSE_DURATION
+
+
+class TokenBucket:
+	"""
+	Token bucket: `rate` commands per second on average, and at most `burst` commands in a row
+	The number of tokens may be negative (the commands taken on credit are delayed)
+	"""
+
+	def __init__(self, rate, burst):
+		self.rate = rate
+		self.burst = burst
+		self._tokens = burst
+		self._time = monotonic()
+
+
+	def refill(self, now):
+		"""Add the tokens earned since the last call; returns True if a token is available"""
+		self._tokens = min(self.burst, self._tokens + (now - self._time) * self.rate)
+		self._time = now
+		return self._tokens >= 1
+
+
+	def take(self):
+		"""Take a token (call refill before); returns the time to wait (in seconds) for that token"""
+		self._tokens -= 1
+		return -self._tokens / self.rate if self._tokens < 0 else 0
+
+
+
+class RateLimiter:
+	"""
+	Limits the rate of the commands of a connection (one object per connection)
+	The limits are given by RATE_LIMITS (see server/Constants.py): one bucket for all the commands ('*'),
+	and one bucket per kind of command (the first word of the command)
+
+	Attributes:
+	- _buckets: (dict) kind of command -> TokenBucket
+	- _throttled: (bool) True if the last command has been delayed
+	- _abusingSince: (float) time since the client sends its commands without waiting for the answers of the delayed
+	commands (None if it does not)
+	- counters: (dict) kind of command -> [number of commands, number of delayed commands, number of rejected commands]
+	- totalDelay: (float) total time the commands have been delayed (in seconds)
+	"""
+
+	def __init__(self, limits=RATE_LIMITS):
+		"""
+		Parameters:
+		- limits: (dict) kind of command -> (rate, burst)
+		"""
+		self._buckets = {kind: TokenBucket(rate, burst) for kind, (rate, burst) in limits.items()}
+		self._throttled = False
+		self._abusingSince = None
+		self.counters = {}
+		self.totalDelay = 0
+
+
+	@property
+	def state(self):
+		"""Returns the state of the connection: '' (normal), 'delayed' or 'rejected'"""
+		if self._abusingSince is not None and monotonic() - self._abusingSince > ABUSE_DURATION:
+			return 'rejected'
+		return 'delayed' if self._throttled else ''
+
+
+	def acquire(self, command, pipelined=False):
+		"""
+		Account for a command (string)
+		Parameters:
+		- command: (string) the command received
+		- pipelined: (bool) True if the client has already sent some data after that command (it does not wait for
+		the answer)
+		Returns the time (in seconds) the command should be delayed (0 if it is within the limits),
+		or None if the command should be rejected (the client keeps sending commands while it is slowed down, for more
+		than ABUSE_DURATION)
+		"""
+		kind = command.split(" ", 1)[0][:20]
+		counter = self.counters.setdefault(kind, [0, 0, 0])
+		counter[0] += 1
+		buckets = [b for b in (self._buckets.get('*'), self._buckets.get(kind)) if b is not None]
+
+		# the command is within the limits
+		now = monotonic()
+		if all([b.refill(now) for b in buckets]):
+			self._throttled = False
+			self._abusingSince = None
+			for b in buckets:
+				b.take()
+			return 0
+
+		# sustained abuse (the client does not wait for the answers): the command is rejected (and no token is taken)
+		# a client that waits for each answer is only slowed down
+		self._throttled = True
+		if not pipelined:
+			self._abusingSince = None
+		elif self._abusingSince is None:
+			self._abusingSince = now
+		elif now - self._abusingSince > ABUSE_DURATION:
+			counter[2] += 1
+			return None
+
+		# otherwise the command is delayed
+		delay = max(b.take() for b in buckets)
+		counter[1] += 1
+		self.totalDelay += delay
+		return delay
+
+
+	def HTMLrepr(self):
+		"""
+		Returns the counters (HTML table); may be called from another thread (web server)
+		(the kind of command is sent by the client, so it is escaped)
+		"""
+		counters = dict(self.counters)
+		rows = "".join("<tr><td>%s</td><td>%d</td><td>%d</td><td>%d</td></tr>" % (escape(kind), n, delayed, rejected)
+		               for kind, (n, delayed, rejected) in sorted(counters.items()))
+		return ("<table><tr><th>Command</th><th>Received</th><th>Delayed</th><th>Rejected</th></tr>%s</table>"
+		        "Total delay: %.1fs %s" % (rows, self.totalDelay, self.state))
@@ -0,0 +1,132 @@
+"""
+* --------------------- *
+|                       |
+|   Coding Game Server  |
+|                       |
+* --------------------- *
+
+Authors: T. Hilaire, J. Brajard
+Licence: GPL
+
+File: Reaper.py
+	Contains the class Reaper and the function setKeepAlive
+	-> a half-open connection (client gone without closing it) would keep its thread blocked in `recv` and its player
+	registered (so its name cannot be reused); each connection has a deadline when the server waits for a command
+	(a timer of the timer wheel, see server/TimerWheel.py), and the reaper shuts down the connections whose deadline
+	has passed
+	-> the TCP keepalive of the connections is tuned, so that the dead peers are also detected by the kernel
+
+Copyright 2016-2017 T. Hilaire, J. Brajard
+"""
+
+import logging
+import socket
+from threading import Lock
+
+from server.Constants import KEEPALIVE_IDLE, KEEPALIVE_INTERVAL, KEEPALIVE_COUNT
+from server.TimerWheel import timerWheel
+
+logger = logging.getLogger()  # general logger ('root')
+
+
+
+def setKeepAlive(sock):
+	"""
+	Enable the TCP keepalive on a connection (see KEEPALIVE_* in server/Constants.py), and limit the time the data sent
+	can stay unacknowledged (TCP_USER_TIMEOUT), so that a dead peer is detected even when the server sends data
+	(the options that are not available on the OS are skipped)
+	"""
+	sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+	options = [('TCP_KEEPIDLE', KEEPALIVE_IDLE), ('TCP_KEEPINTVL', KEEPALIVE_INTERVAL),
+	           ('TCP_KEEPCNT', KEEPALIVE_COUNT),
+	           ('TCP_USER_TIMEOUT', 1000 * (KEEPALIVE_IDLE + KEEPALIVE_INTERVAL * KEEPALIVE_COUNT))]
+	for name, value in options:
+		if hasattr(socket, name):
+			sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, name), value)
+
+
+
+class Reaper:
+	"""
+	Shuts down the connections whose client has not sent a command before a deadline
+	(the thread of the handler then gets a disconnection, and does the usual cleanup: end of the game, finish, etc.)
+	The deadline of a handler is a timer of the timer wheel (of the process), that reaps the handler when it expires
+
+	Attributes:
+	- _timers: (dict) handler -> timer of the handlers waiting for a command
+	- _reaped: (dict) reason -> number of connections closed
+	"""
+
+	def __init__(self):
+		self._lock = Lock()
+		self._timers = {}
+		self._reaped = {'idle': 0, 'game': 0}
+
+
+	def watch(self, handler, timeout, reason):
+		"""
+		Set the deadline of a handler (called before waiting for a command)
+		Parameters:
+		- handler: the handler (should have a `reap` method)
+		- timeout: (float) time (in seconds) given to the client to send its command
+		- reason: (string) 'idle' (outside a game) or 'game' (during a game)
+		"""
+		with self._lock:
+			timer = self._timers.pop(handler, None)
+			if timer is not None:
+				timer.cancel()
+			self._timers[handler] = timerWheel.schedule(timeout, self._reap, handler, reason)
+
+
+	def release(self, handler):
+		"""Remove the deadline of a handler (called when a command is received, or when the connection is closed)"""
+		with self._lock:
+			timer = self._timers.pop(handler, None)
+		if timer is not None:
+			timer.cancel()
+
+
+	def _reap(self, handler, reason):
+		"""
+		Reap a handler whose deadline has passed (called by the timer wheel)
+		"""
+		with self._lock:
+			# the deadline may have been released (or set again) in the meantime
+			timer = self._timers.get(handler)
+			if timer is None or timer.pending:
+				return
+			del self._timers[handler]
+			self._reaped[reason] += 1
+		try:
+			handler.reap(reason)
+		except Exception as err:
+			logger.error("Impossible to close a connection: %s", err, exc_info=True)
+
+
+	def takeCounts(self):
+		"""Returns the number of connections closed (for each reason), and reset them (see server/Player/Worker.py)"""
+		with self._lock:
+			counts = self._reaped
+			self._reaped = dict.fromkeys(counts, 0)
+		return counts
+
+
+	def merge(self, counts):
+		"""Add the number of connections closed by another reaper (the reaper of a worker process)"""
+		with self._lock:
+			for reason, n in counts.items():
+				self._reaped[reason] = self._reaped.get(reason, 0) + n
+
+
+	def getDictInformations(self):
+		"""
+		Returns a dictionary with the number of connections closed by the reaper (for each reason),
+		and the number of connections that have a deadline
+		"""
+		with self._lock:
+			return {'reaped': dict(self._reaped), 'watched': len(self._timers)}
+
+
+
+# reaper of the connections of this process
+reaper = Reaper()
@@ -15,7 +15,6 @@ File: Player.py
 Copyright 2016-2017 T. Hilaire, J. Brajard
 """
 
-from _socket import SHUT_RDWR
 from threading import Event
 
 from server.Player import Player
@@ -98,6 +97,12 @@ class RegularPlayer(Player, BaseClass):
 		return True
 
 
+	@property
+	def isWaiting(self):
+		"""Indicates if the player waits for a game (its handler is parked in the waiting room)"""
+		return self._socket.isParked
+
+
 	@property
 	def game(self):
 		"""Returns the game the player is involved in"""
@@ -108,15 +113,17 @@ class RegularPlayer(Player, BaseClass):
 		"""Setter for the player"""
 		if g is not None:
 			self.logger.info("Enter in game " + g.name)
-			# since we have a game, then we can set the Event
+			self._game = g
+			# since we have a game, then we can set the Event (and tell it to the socket)
 			self._waitingGame.set()
+			self._socket.notifyGame()
 
 		else:
 			self.logger.info("Leave the game " + self._game.name)
 			# since we do not have a game, we can clear the the Event
 			self._waitingGame.clear()
+			self._game = g
 
-		self._game = g
 		self.sendUpdateToWebSocket()
 
 	def getDictInformations(self):
@@ -129,13 +136,10 @@ class RegularPlayer(Player, BaseClass):
 		player2 = ''
 		if self._game:
 			currentGame = self._game.name
-			try:
-				currentGameDisplayName = self._game.getCutename()
-			except NotImplementedError:
-				currentGameDisplayName = currentGame
-
+			currentGameDisplayName = self._game.getCutename()
 			player1, player2 = (p.name for p in self._game.players)
-		return {'currentGame': currentGame, 'currentGameDisplayName': currentGameDisplayName, 'player1': player1, 'player2': player2}
+		return {'currentGame': currentGame, 'currentGameDisplayName': currentGameDisplayName, 'player1': player1,
+		        'player2': player2, 'commands': self._socket.rateLimiter.HTMLrepr()}
 		# return "Game %s (with players '%s' and '%s'\n<br><br>%s" % (
 		# self.name, self._players[0].name, self._players[1].name, self)
 
@@ -170,6 +174,5 @@ class RegularPlayer(Player, BaseClass):
 		Disconnect the player
 		Used to force the player to disconnect
 		"""
-		self._socket.request.shutdown(SHUT_RDWR)
-		self._socket.request.close()
+		self._socket.disconnect()
 
@@ -0,0 +1,364 @@
+"""
+* --------------------- *
+|                       |
+|   Coding Game Server  |
+|                       |
+* --------------------- *
+
+Authors: T. Hilaire, J. Brajard
+Licence: GPL
+
+File: WaitingRoom.py
+	Contains the classes WaitingRoom, PlayerServer and UnixPlayerServer
+	-> the players waiting for a game are parked in the waiting room (a single thread, with a selector),
+	instead of keeping one thread per waiting player
+	-> when the game starts (or when the client disconnects), the connection is given back to a new thread
+
+Copyright 2016-2017 T. Hilaire, J. Brajard
+"""
+
+import os
+import selectors
+from collections import deque
+from heapq import heappush, heappop
+from itertools import count
+from socket import socketpair, AF_UNIX
+from socketserver import ThreadingTCPServer
+from threading import Thread, Lock
+from time import monotonic
+
+from server.Player.PlayerSocket import DisconnectionError
+
+
+FIRST_NOT_READY_DELAY = 5       # delay (in seconds) before the first "NOT_READY" message
+NOT_READY_DELAY = 3             # delay (in seconds) between two "NOT_READY" messages
+
+
+
+class WaitingRoom:
+	"""
+	Waiting room for the players that wait for a game
+	A single thread waits (with a selector, ie epoll/kqueue/select) on the sockets of all the parked players:
+	- if a socket becomes readable, the data are read in the command reader of the handler (the commands sent
+	in advance are kept), and a closed connection is detected (EOF)
+	- the "NOT_READY" messages are sent with the same cadence as before (after 5 seconds, and then every 3 seconds),
+	for the old clients
+	- when a game is set to the player (notifyGame), the handler is resumed in a new thread
+	(or, with worker processes, the game is sent to a worker when the handlers of its two players are ready)
+
+	Attributes:
+	- _server: the PlayerServer (used to resume the handlers)
+	- _selector: the selector (the data associated to a socket is its handler)
+	- _deadlines: (dict) time of the next "NOT_READY" message, for each parked handler
+	- _heap: heap of the (time, number, handler) of the "NOT_READY" messages, to find the next one without scanning all
+	the parked handlers (an entry whose time is not the one of _deadlines is obsolete, and skipped)
+	- _requests: (deque) handlers to park or to check (added by the other threads, see park and notify)
+	- _wakeup: socketpair used to wake up the thread of the waiting room
+	- _ready: (dict) handler waiting for the handler of its opponent, for each game to send to a worker
+	(None when the opponent will never come, ie when the game should be played in the front process)
+	"""
+
+	def __init__(self, server):
+		"""
+		Create the waiting room and start its thread
+		Parameters:
+		- server: (PlayerServer) the server
+		"""
+		self._server = server
+		self._selector = selectors.DefaultSelector()
+		self._deadlines = {}
+		self._heap = []
+		self._counter = count()     # (the entries of the heap with the same time are not compared with their handler)
+		self._requests = deque()
+		self._ready = {}
+		self._lock = Lock()
+		self._wakeup, self._wakeupWriter = socketpair()
+		self._wakeup.setblocking(False)
+		self._wakeupWriter.setblocking(False)
+		self._selector.register(self._wakeup, selectors.EVENT_READ, None)
+		Thread(target=self.run, name="WaitingRoom", daemon=True).start()
+
+
+	def park(self, handler):
+		"""
+		Park a handler in the waiting room (called from the thread of the handler, when it has returned)
+		"""
+		self._post(handler, True)
+
+
+	def notify(self, handler):
+		"""
+		Tell the waiting room that a game has been set for the player of the handler (called from any thread)
+		"""
+		self._post(handler, False)
+
+
+	def _post(self, handler, park):
+		"""Add a request for the thread of the waiting room, and wake it up"""
+		with self._lock:
+			self._requests.append((handler, park))
+		try:
+			self._wakeupWriter.send(b'\0')
+		except BlockingIOError:
+			# the waiting room has already been woken up
+			pass
+
+
+	@property
+	def nbParked(self):
+		"""Returns the number of handlers parked in the waiting room"""
+		return len(self._deadlines)
+
+
+	def run(self):
+		"""
+		Thread of the waiting room
+		"""
+		while True:
+			# (the obsolete entries of the heap are dropped)
+			while self._heap and self._deadlines.get(self._heap[0][2]) != self._heap[0][0]:
+				heappop(self._heap)
+			timeout = self._heap[0][0] - monotonic() if self._heap else None
+			events = self._selector.select(None if timeout is None else max(timeout, 0))
+			for key, _ in events:
+				if key.data is None:
+					self._processRequests()
+				elif key.data in self._deadlines:
+					self._read(key.data)
+
+			# send the "NOT_READY" messages
+			now = monotonic()
+			while self._heap and self._heap[0][0] <= now:
+				t, _, handler = heappop(self._heap)
+				if self._deadlines.get(handler) != t:
+					continue
+				self._setDeadline(handler, now + NOT_READY_DELAY)
+				try:
+					handler.sendNotReady()
+				except Exception as err:
+					self._resume(handler, err)
+				else:
+					self._checkOpponent(handler)
+
+
+	def _setDeadline(self, handler, t):
+		"""Set the time of the next "NOT_READY" message of a parked handler"""
+		self._deadlines[handler] = t
+		heappush(self._heap, (t, next(self._counter), handler))
+
+
+	def _processRequests(self):
+		"""Park or check the handlers asked by the other threads"""
+		try:
+			while self._wakeup.recv(4096):
+				pass
+		except BlockingIOError:
+			pass
+		with self._lock:
+			requests = list(self._requests)
+			self._requests.clear()
+		for handler, park in requests:
+			if park:
+				try:
+					handler.request.setblocking(False)
+					self._selector.register(handler.request, selectors.EVENT_READ, handler)
+				except (ValueError, OSError):
+					# the socket has been closed in the meantime
+					self._server.resumeHandler(handler, DisconnectionError())
+					continue
+				self._setDeadline(handler, monotonic() + FIRST_NOT_READY_DELAY)
+			if handler in self._deadlines and handler.gameHasStarted():
+				# (the game may have been set before the handler is parked)
+				self._startGame(handler)
+
+
+	def _startGame(self, handler):
+		"""
+		The game of a parked handler has started: resume the handler, or send the game to a worker
+		(when the handlers of the two players are ready)
+		"""
+		workers = self._server.workers
+		game = handler.game
+		# (the opponent may already play the game in its thread, when it has joined a game restored from its snapshot,
+		# see server/Checkpoint.py)
+		if not workers or not all(p.isRegular and p.isWaiting for p in game.players):
+			self._resume(handler)
+		elif game not in self._ready:
+			# wait for the opponent
+			self._ready[game] = handler
+		else:
+			opponent = self._ready.pop(game)
+			if opponent is None:
+				# the opponent has left
+				self._resume(handler)
+			else:
+				for h in (handler, opponent):
+					self._remove(h)
+				workers.playGame(game, (handler, opponent))
+
+
+	def _read(self, handler):
+		"""
+		Read the data sent by the client of a parked handler
+		(the disconnection, or a command that is too long, stops the waiting)
+		"""
+		try:
+			handler.fillReader()
+		except BlockingIOError:
+			pass
+		except Exception as err:
+			self._resume(handler, err)
+
+
+	def _resume(self, handler, err=None):
+		"""
+		Remove a handler from the waiting room, and resume it in a new thread
+		Parameters:
+		- handler: the handler
+		- err: (Exception) the error that occurs while the handler was parked (or None if the game has started)
+		"""
+		self._remove(handler)
+		game = handler.game if err is not None else None
+		if game is not None and self._server.workers:
+			# the game cannot be sent to a worker: the opponent plays it in the front process
+			opponent = self._ready.pop(game, None)
+			if opponent is not handler:
+				if opponent is None:
+					self._ready[game] = None
+				else:
+					self._remove(opponent)
+					self._server.resumeHandler(opponent)
+		self._server.resumeHandler(handler, err)
+
+
+	def _checkOpponent(self, handler):
+		"""
+		Check that the opponent of a handler waiting for its opponent (see _startGame) is still in the game
+		(otherwise, the game is played in the front process)
+		"""
+		game = handler.game
+		if game is not None and self._ready.get(game) is handler and any(p.game is not game for p in game.players):
+			del self._ready[game]
+			self._remove(handler)
+			self._server.resumeHandler(handler)
+
+
+	def _remove(self, handler):
+		"""Remove a handler from the waiting room"""
+		del self._deadlines[handler]
+		self._selector.unregister(handler.request)
+		handler.request.setblocking(True)
+
+
+
+class PlayerServer(ThreadingTCPServer):
+	"""
+	Threaded server for the players (one thread per connection)
+	except that the connections that wait for a game are parked in a waiting room (and their thread ends)
+	"""
+	daemon_threads = True
+	request_queue_size = 1024
+	allow_reuse_address = True      # (the server can be restarted at once after a crash, see server/Checkpoint.py)
+
+	def __init__(self, server_address, RequestHandlerClass, workers=None, waitingRoom=None):
+		"""
+		Create the server and its waiting room
+		Parameters:
+		- server_address: tuple (host, port)
+		- RequestHandlerClass: the handler class (PlayerSocketHandler)
+		- workers: (WorkerPool) the worker processes that play the games between two regular players
+		(None to play all the games in this process)
+		- waitingRoom: (WaitingRoom) the waiting room of another server, to share it (None to create one)
+		"""
+		super().__init__(server_address, RequestHandlerClass)
+		self.workers = workers
+		if waitingRoom is None:
+			if workers:
+				workers.start(self)
+			waitingRoom = WaitingRoom(self)
+		self.waitingRoom = waitingRoom
+
+
+	def process_request_thread(self, request, client_address):
+		"""
+		Run the handler in the thread (as ThreadingTCPServer)
+		but do not close the connection if the handler has been parked
+		"""
+		handler = None
+		try:
+			handler = self.RequestHandlerClass(request, client_address, self)
+		except Exception:
+			self.handle_error(request, client_address)
+		finally:
+			self.releaseHandler(handler, request)
+
+
+	def resumeHandler(self, handler, err=None, played=False):
+		"""
+		Resume a parked handler in a new thread
+		Parameters:
+		- handler: the handler
+		- err: (Exception) the error that occurs while the handler was parked (or None if the game has started)
+		- played: (bool) True if the game has been played by a worker process
+		"""
+		Thread(target=self._resumeThread, args=(handler, err, played), daemon=self.daemon_threads).start()
+
+
+	def _resumeThread(self, handler, err, played):
+		"""Thread of a resumed handler"""
+		try:
+			handler.resume(err, played)
+		except Exception:
+			self.handle_error(handler.request, handler.client_address)
+		finally:
+			self.releaseHandler(handler, handler.request)
+
+
+	def releaseHandler(self, handler, request):
+		"""
+		Called when the thread of a handler ends
+		-> park the handler (if it waits for a game) or close the connection
+		"""
+		if handler is not None and handler.isParked:
+			self.waitingRoom.park(handler)
+		else:
+			self.shutdown_request(request)
+
+
+
+class UnixPlayerServer(PlayerServer):
+	"""
+	Same server as PlayerServer, but listening on a Unix domain socket (for the bots run on the same host)
+	It shares the waiting room (and the workers) of the main server
+	"""
+	address_family = AF_UNIX
+
+	def __init__(self, path, RequestHandlerClass, mainServer):
+		"""
+		Create the server (an existing file at path is removed)
+		Parameters:
+		- path: (string) path of the Unix domain socket
+		- RequestHandlerClass: the handler class (PlayerSocketHandler)
+		- mainServer: (PlayerServer) the main server
+		"""
+		if os.path.exists(path):
+			os.unlink(path)
+		super().__init__(path, RequestHandlerClass, mainServer.workers, mainServer.waitingRoom)
+
+
+	def get_request(self):
+		"""
+		Accept a connection
+		(the address of the client is replaced by the path of the socket, since a Unix socket has no address)
+		"""
+		request, _ = self.socket.accept()
+		return request, ("unix:" + self.server_address, 0)
+
+
+	def server_close(self):
+		"""Close the server and remove the socket file"""
+		super().server_close()
+		try:
+			os.unlink(self.server_address)
+		except OSError:
+			pass
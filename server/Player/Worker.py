@@ -0,0 +1,526 @@
+"""
+* --------------------- *
+|                       |
+|   Coding Game Server  |
+|                       |
+* --------------------- *
+
+Authors: T. Hilaire, J. Brajard
+Licence: GPL
+
+File: Worker.py
+	Contains the classes WorkerPool and WorkerSocketHandler
+	-> the games between two regular players can be played by worker processes (`--workers` option),
+	so that the server is not limited to one core (GIL)
+	-> the front process (the PlayerServer, the tournaments and the web server) creates the games; the game and the
+	sockets of its two players are sent to a worker (through a Unix socket, the sockets are passed with SCM_RIGHTS),
+	that plays the game until its end and reports the result (and the metrics of the commands and of the moves, and the
+	connections closed by its reaper) back to the front process
+	-> while the game is played, its changes (the new moves, the comments and the clocks) are sent to the front process
+	every WORKER_UPDATE_PERIOD seconds at most (coalesced), and as soon as the game is over: the front process plays the
+	moves again, so that its copy of the game (web pages, tournament and archive) stays up to date; and the changes of
+	the delay of the game are sent to the worker
+	-> a worker saves the snapshots of the games it plays (see server/Checkpoint.py), and sends its logs to the front
+	process, that writes all the log files
+
+Copyright 2016-2017 T. Hilaire, J. Brajard
+"""
+
+import logging
+import multiprocessing
+import pickle
+from array import array
+from errno import EMSGSIZE
+from logging.handlers import QueueHandler
+from os import close
+from socket import socket, socketpair, AF_UNIX, SOCK_SEQPACKET, SOL_SOCKET, SCM_RIGHTS, CMSG_SPACE, MSG_TRUNC
+from threading import Thread, Lock, RLock, Event
+
+from server.Archive import encodeMoves, decodeMoves
+from server.Checkpoint import checkpointer
+from server.Constants import WORKER_UPDATE_PERIOD
+from server.Game import Game
+from server.Logger import configureWorkerLogger
+from server.Metrics import CommandMetrics, commandMetrics, moveLatency
+from server.Player.CommandReader import CommandReader
+from server.Player.PlayerSocket import PlayerSocketHandler, DisconnectionError, ProtocolError
+from server.Player.Protocol import Compressor
+from server.Player.Reaper import reaper
+from server.Player.RegularPlayer import RegularPlayer
+
+logger = logging.getLogger()  # general logger ('root')
+
+
+MAX_MESSAGE_SIZE = 1 << 18      # maximum size of a message between the front process and a worker
+
+
+
+def sendMessage(sock, obj, fds=()):
+	"""
+	Send a (pickled) object and some file descriptors (with SCM_RIGHTS) through a Unix socket
+	Raises OSError (EMSGSIZE) if the message is larger than MAX_MESSAGE_SIZE
+	"""
+	data = pickle.dumps(obj)
+	if len(data) > MAX_MESSAGE_SIZE:
+		raise OSError(EMSGSIZE, "The message is too large (%d octets)" % len(data))
+	ancillary = [(SOL_SOCKET, SCM_RIGHTS, array('i', fds))] if fds else []
+	sock.sendmsg([data], ancillary)
+
+
+def receiveMessage(sock):
+	"""
+	Receive a message sent by sendMessage
+	Returns the object and the list of file descriptors, or (None, []) if the other process has closed the socket
+	Raises OSError if the socket is broken, ValueError if the message cannot be read (the file descriptors received
+	with it are closed)
+	"""
+	fds = array('i')
+	data, ancillary, flags, _ = sock.recvmsg(MAX_MESSAGE_SIZE, CMSG_SPACE(2 * fds.itemsize))
+	for level, kind, fdData in ancillary:
+		if level == SOL_SOCKET and kind == SCM_RIGHTS:
+			fds.frombytes(fdData[:len(fdData) - (len(fdData) % fds.itemsize)])
+	if not data:
+		return None, []
+	try:
+		if flags & MSG_TRUNC:
+			raise ValueError("the message is truncated")
+		return pickle.loads(data), list(fds)
+	except Exception as err:
+		for fd in fds:
+			close(fd)
+		raise ValueError("Invalid message (%s)" % err)
+
+
+
+class Worker:
+	"""
+	A worker process, seen from the front process
+	- index: (int) number of the worker
+	- sock: Unix socket connected to the worker
+	- process: the process
+	- games: (dict) games played by the worker (name -> (game, handlers))
+	"""
+
+	def __init__(self, index, sock, process):
+		self.index = index
+		self.sock = sock
+		self.process = process
+		self.games = {}
+
+
+
+class WorkerPool:
+	"""
+	Pool of worker processes, that play the games between two regular players
+	The pool should be created before any thread is run (the workers are forked)
+	"""
+
+	def __init__(self, nbWorkers):
+		"""
+		Create (fork) the worker processes
+		Parameters:
+		- nbWorkers: (int) number of workers
+		"""
+		context = multiprocessing.get_context('fork')
+		self._workers = []
+		self._lock = Lock()
+		self._server = None
+		for i in range(nbWorkers):
+			front, back = socketpair(AF_UNIX, SOCK_SEQPACKET)
+			toClose = [w.sock for w in self._workers] + [front]
+			process = context.Process(target=runWorker, args=(i, back, toClose), name="CGS-worker-%d" % i, daemon=True)
+			process.start()
+			back.close()
+			self._workers.append(Worker(i, front, process))
+
+
+	def __len__(self):
+		"""Returns the number of workers"""
+		return len(self._workers)
+
+
+	def start(self, server):
+		"""
+		Start to receive the results of the workers
+		Parameters:
+		- server: (PlayerServer) the server (used to resume the handlers at the end of the games)
+		"""
+		self._server = server
+		for worker in self._workers:
+			Thread(target=self._receiveResults, args=(worker,), name="Worker-%d" % worker.index, daemon=True).start()
+
+
+	def playGame(self, game, handlers):
+		"""
+		Send a game (and the connections of its two players) to the least busy worker
+		Parameters:
+		- game: (Game) the game (just created, not started)
+		- handlers: the handlers of the two players (removed from the waiting room)
+		"""
+		handlers = sorted(handlers, key=lambda h: game.players.index(h.player))
+		with self._lock:
+			worker = min(self._workers, key=lambda w: len(w.games))
+			worker.games[game.name] = (game, handlers)
+		message = {'game': game, 'players': [h.handOff() for h in handlers]}
+		try:
+			sendMessage(worker.sock, message, [h.request.fileno() for h in handlers])
+		except OSError as err:
+			logger.error("Impossible to send the game %s to the worker #%d (%s)", game.name, worker.index, err)
+			with self._lock:
+				del worker.games[game.name]
+			for h in handlers:
+				self._server.resumeHandler(h)
+			return
+		game.playRemotely(self)
+		game.logger.debug("The game is played by the worker #%d", worker.index)
+
+
+	def setDelay(self, gameName, delay):
+		"""
+		Send the new delay of a game (changed from the web page, see Game.setDelay) to the worker that plays it
+		"""
+		with self._lock:
+			worker = next((w for w in self._workers if gameName in w.games), None)
+		if worker is not None:
+			try:
+				sendMessage(worker.sock, {'game': gameName, 'delay': delay})
+			except OSError as err:
+				logger.error("Impossible to send the delay of the game %s to the worker #%d (%s)", gameName, worker.index, err)
+
+
+	def _receiveResults(self, worker):
+		"""
+		Receive the changes and the results of the games played by a worker (thread), and resume the handlers of the
+		players
+		(an error with a message is logged, and the next messages are received)
+		"""
+		while True:
+			try:
+				result, _ = receiveMessage(worker.sock)
+			except OSError:
+				result = None
+			except ValueError as err:
+				logger.error("Error with a message of the worker #%d: %s", worker.index, err)
+				continue
+			if result is None:
+				break
+			try:
+				self._receiveResult(worker, result)
+			except Exception as err:
+				logger.error("Error with a message of the worker #%d: %s", worker.index, err, exc_info=True)
+
+		# the worker has stopped: the games it plays are lost
+		logger.error("The worker #%d has stopped", worker.index)
+		with self._lock:
+			self._workers.remove(worker)
+			games = list(worker.games.values())
+			worker.games.clear()
+		for game, handlers in games:
+			for h in handlers:
+				self._server.resumeHandler(h, ProtocolError("The game %s has been stopped (internal error)" % game.name),
+				                           played=True)
+
+
+	def _receiveResult(self, worker, result):
+		"""
+		Manage a message of a worker: a record logged by the worker, the changes of a game (see GameResult.update), or
+		the result of a game at its end (the handlers of its players are resumed)
+		"""
+		if 'log' in result:
+			# a record logged by the worker: it is written in the log files by this process
+			record = result['log']
+			(logger if record.name == logger.name else logging.getLogger(record.name)).handle(record)
+			return
+		if 'players' not in result:
+			# the changes of the game: update the game in the front process (board, players and web pages), and end it
+			# as soon as it is over (the connections are given back later)
+			with self._lock:
+				game, _ = worker.games.get(result['game'], (None, None))
+			if game is not None:
+				game.updateRemotely(decodeMoves(result['moves']), result['comments'], result['clock'])
+				if 'winner' in result:
+					game.endOfGame(result['winner'], result['message'])
+			return
+
+		# the game is over: give the connections back (even if the result cannot be used)
+		# (if the game is not finished, the players are considered as disconnected)
+		with self._lock:
+			game, handlers = worker.games.pop(result['game'])
+		ended = result['winner'] is not None
+		try:
+			if 'metrics' in result:
+				commandMetrics.merge(result['metrics'])
+				moveLatency.merge(result['moveLatency'])
+				reaper.merge(result['reaped'])
+			# (the game is already ended, unless the last changes of the game could not be sent)
+			if ended:
+				game.endOfGame(result['winner'], result['message'])
+		finally:
+			for h, (data, alive, limiter) in zip(handlers, result['players']):
+				h.handBack(data, limiter)
+				self._server.resumeHandler(h, None if alive and ended else DisconnectionError(), played=True)
+
+
+
+class FrontLogHandler(QueueHandler):
+	"""
+	Handler of the main logger of a worker process: the records are sent to the front process, that writes them in
+	the log files (see WorkerPool._receiveResults), so that each log file is only written (and rotated) by one process
+	"""
+
+	def __init__(self, sock, lock):
+		"""
+		Parameters:
+		- sock: Unix socket connected to the front process (lock is used to send the records)
+		"""
+		super().__init__(None)
+		self._sock = sock
+		self._lock = lock
+
+	def enqueue(self, record):
+		"""Send the record (prepared by QueueHandler.prepare, so that it can be pickled)"""
+		try:
+			with self._lock:
+				sendMessage(self._sock, {'log': record})
+		except OSError:
+			# the front process has stopped
+			pass
+
+
+
+class GameResult:
+	"""
+	Send the changes of a game played in a worker to the front process (see update), and collect its result
+	The winner is sent as soon as the game is over (the players may only notice it with their next command, so the
+	connections are given back later, at the end of playGameInWorker)
+	(given to the game as its tournament, see Game.endOfGame)
+	"""
+
+	def __init__(self, game, sock, lock, reporter):
+		"""
+		Parameters:
+		- game: the game
+		- sock: Unix socket connected to the front process (lock is used to send the messages)
+		- reporter: (GameReporter) the reporter of the worker, that calls update
+		"""
+		self._game = game
+		self._sock = sock
+		self._lock = lock
+		self._reporter = reporter
+		self._updating = Lock()             # (update may be called at the end of the game, while the reporter runs)
+		self._nbMoves = len(game.moves)     # number of moves known by the front process
+		self._version = game.version        # version of the game known by the front process
+		self._winnerSent = False
+		self.name = "worker"
+		self.winner = None
+
+	def endOfGame(self, winner, looser):
+		"""
+		Called by the game at its end (maybe while the game is locked, so the winner is sent by the reporter)
+		"""
+		self.winner = self._game.players.index(winner)
+		self._reporter.wakeUp()
+
+	def update(self):
+		"""
+		Send the changes of the game since the last update (new moves, comments and clocks, see Game.getRemoteUpdate),
+		and the winner when the game is over, to the front process (if something has changed)
+		"""
+		with self._updating:
+			version = self._game.version
+			winner = self.winner if not self._winnerSent else None
+			if version == self._version and winner is None:
+				return
+			moves, comments, clock = self._game.getRemoteUpdate(self._nbMoves)
+			message = {'game': self._game.name, 'moves': encodeMoves(moves), 'comments': comments, 'clock': clock}
+			if winner is not None:
+				message.update(winner=winner, message=self._game.endMessage)
+			try:
+				with self._lock:
+					sendMessage(self._sock, message)
+			except OSError as err:
+				logger.error("Impossible to send the changes of the game %s to the front process (%s)", self._game.name,
+				             err)
+				return
+			self._nbMoves += len(moves)
+			self._version = version
+			self._winnerSent = winner is not None or self._winnerSent
+
+
+
+class GameReporter:
+	"""
+	Send the changes of the games played by the worker to the front process, from its own thread: every
+	WORKER_UPDATE_PERIOD seconds at most (the changes of a game in the meantime are coalesced in one message), and as
+	soon as a game is over
+	"""
+
+	def __init__(self):
+		self._results = set()
+		self._wake = Event()
+		self._thread = None
+
+	def add(self, result):
+		"""Add a game to report (its GameResult), and start the thread if needed"""
+		self._results.add(result)
+		if self._thread is None:
+			self._thread = Thread(target=self.run, name="Reporter", daemon=True)
+			self._thread.start()
+
+	def remove(self, result):
+		"""Remove a game (its last changes are sent by the caller, see playGameInWorker)"""
+		self._results.discard(result)
+
+	def wakeUp(self):
+		"""Send the changes now (a game is over)"""
+		self._wake.set()
+
+	def run(self):
+		"""Send the changes of the games (thread)"""
+		while True:
+			self._wake.wait(WORKER_UPDATE_PERIOD)
+			self._wake.clear()
+			for result in list(self._results):
+				try:
+					result.update()
+				except Exception as err:
+					logger.error("Error while sending the changes of a game: %s", err, exc_info=True)
+
+
+
+class WorkerSocketHandler(PlayerSocketHandler):
+	"""
+	The handler of a player, in a worker process
+	It only plays one game (the same protocol as PlayerSocketHandler is used, see doc/Protocol.md),
+	and the connection is then given back to the front process
+	"""
+
+	def __init__(self, name, sock, client_address, version, data, limiter, compress, clock, metrics):
+		"""
+		Do not call the constructor of BaseRequestHandler (that directly handles the connection)
+		Parameters:
+		- name: (string) name of the player
+		- sock: (socket) the socket of the connection
+		- client_address: address of the client
+		- version: (int) version of the protocol used by the client
+		- data: (bytes) data received by the front process but not yet read
+		- limiter: (RateLimiter) the rate limiter of the commands of the client
+		- compress: (bool) True if the large messages are compressed (a new compression context continues the stream)
+		- clock: (bool) True if the time left is sent with the moves
+		- metrics: (CommandMetrics) the metrics of the commands of the game (sent to the front process at the end)
+		"""
+		# noinspection PyMissingConstructor
+		self.request = sock
+		self.client_address = client_address
+		self.server = None
+		self._player = None
+		self._outbox = []
+		self._parked = False
+		self._limiter = limiter
+		self._lastFrame = None
+		self._compressor = Compressor() if compress else None
+		self._sendClock = clock
+		self.metrics = metrics
+		self._reader = CommandReader(sock)
+		self._reader.feed(data)
+		self.setProtocol(version)
+		self._player = RegularPlayer(name, client_address[0], self)
+
+
+	def run(self, results, i):
+		"""
+		Send the game name and sizes, and play the game
+		results[i] is set to the data not yet read (bytes), a boolean that indicates if the connection is still alive
+		and the rate limiter
+		"""
+		alive = True
+		try:
+			self.sendGameStart()
+			self.playGame()
+			self.flush()
+		except Exception as err:
+			self.manageError(err)
+			alive = False
+		results[i] = (self._reader.takeData(), alive, self._limiter)
+
+
+
+def runWorker(index, sock, toClose):
+	"""
+	Main function of a worker process
+	Receive the games (with the sockets of the players) and play them (one thread per player), and the changes of
+	the delay of the games
+	Parameters:
+	- index: (int) number of the worker
+	- sock: Unix socket connected to the front process
+	- toClose: list of sockets (of the front process) to close
+	"""
+	for s in toClose:
+		s.close()
+	lock = RLock()     # (reentrant, so that a record logged while a message is sent does not block the worker)
+	configureWorkerLogger(FrontLogHandler(sock, lock))
+	reporter = GameReporter()
+	checkpointer.start()
+	logger.info("The worker #%d is started", index)
+	while True:
+		message, fds = receiveMessage(sock)
+		if message is None:
+			# the front process has stopped
+			break
+		if 'delay' in message:
+			game = Game.getFromName(message['game'])
+			if game is not None:
+				game.setDelay(message['delay'])
+			continue
+		Thread(target=playGameInWorker, args=(sock, lock, reporter, message, fds), daemon=True).start()
+
+
+def playGameInWorker(sock, lock, reporter, message, fds):
+	"""
+	Play a game in a worker (thread), and send the result to the front process
+	Parameters:
+	- sock: Unix socket connected to the front process (lock is used to send the result)
+	- reporter: (GameReporter) the reporter that sends the changes of the game while it is played
+	- message: (dict) the game and the informations about its players (name, address, protocol version, pending data,
+	rate limiter, compression and time left with the moves)
+	- fds: file descriptors of the sockets of the two players
+	"""
+	game = message['game']
+	metrics = CommandMetrics()
+	handlers = [WorkerSocketHandler(name, socket(fileno=fd), address, version, data, limiter, compress, clock, metrics)
+	            for (name, address, version, data, limiter, compress, clock), fd in zip(message['players'], fds)]
+	result = GameResult(game, sock, lock, reporter)
+	game.restore([h.player for h in handlers], result)
+	reporter.add(result)
+
+	# play the game (one thread per player)
+	results = [None, None]
+	thread = Thread(target=handlers[1].run, args=(results, 1))
+	thread.start()
+	handlers[0].run(results, 0)
+	thread.join()
+
+	# clean and report the result (the sockets are closed in the worker, but not in the front process)
+	Game.removeInstance(game.name)
+	for h in handlers:
+		RegularPlayer.removeInstance(h.player.name)
+		h.request.close()
+	reporter.remove(result)
+	result.update()
+	message = {'game': game.name, 'winner': result.winner, 'message': game.endMessage, 'players': results,
+	           'metrics': metrics, 'reaped': reaper.takeCounts(), 'moveLatency': moveLatency.take()}
+	try:
+		with lock:
+			sendMessage(sock, message)
+	except OSError as err:
+		# (the message may be too large) the result is sent without the metrics, the data not yet read and the rate
+		# limiters (the connections with unread data are closed, since their commands would be cut)
+		logger.error("Impossible to send the result of the game %s to the front process (%s)", game.name, err)
+		message['players'] = [(b"", alive and not data, None) for data, alive, _ in results]
+		for key in ('metrics', 'reaped', 'moveLatency'):
+			del message[key]
+		try:
+			with lock:
+				sendMessage(sock, message)
+		except OSError as err:
+			logger.error("Impossible to send the result of the game %s to the front process (%s)", game.name, err)
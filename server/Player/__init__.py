@@ -1,7 +1,11 @@
 """
 Import the different classes related to a player
-(Player, TrainingPlayer, RegularPlayer and PlayerSocketHandler)
+(Player, TrainingPlayer, RegularPlayer, PlayerSocketHandler, PlayerServer, UnixPlayerServer, WorkerPool
+and AsyncPlayerServer)
 """
 from server.Player.Player import Player, TrainingPlayer
 from server.Player.PlayerSocket import PlayerSocketHandler
+from server.Player.WaitingRoom import PlayerServer, UnixPlayerServer
+from server.Player.Worker import WorkerPool
 from server.Player.RegularPlayer import RegularPlayer
+from server.Player.AsyncPlayerSocket import AsyncPlayerServer
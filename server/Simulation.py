@@ -0,0 +1,167 @@
+"""
+* --------------------- *
+|                       |
+|   Coding Game Server  |
+|                       |
+* --------------------- *
+
+Authors: T. Hilaire, J. Brajard
+Licence: GPL
+
+File: Simulation.py
+	Contains the function runSimulation (and the functions that play the games)
+	-> headless self-play (`runCGS.py simulate`): games between two training players of a game, without socket, thread,
+	websocket nor log file, spread across a pool of processes
+	-> reports the win rates, the lengths of the games and the time per move, and can save the moves of all the games
+	(used to tune the training players and to benchmark the rules of the games)
+
+Copyright 2016-2017 T. Hilaire, J. Brajard
+"""
+
+import gzip
+import multiprocessing
+from random import randint
+from statistics import mean, median
+from time import perf_counter
+
+from server.Constants import NORMAL_MOVE, WINNING_MOVE
+from server.Game import Game
+
+
+MAX_SEED = 16777215     # the seeds of the games are between 0 and 2^24-1 (see Game)
+CHUNK_SIZE = 16         # number of games given at once to a process of the pool
+
+
+
+def playGame(gameClass, names, seed, start, maxMoves, options):
+	"""
+	Play a game between two training players (in the current process)
+	Parameters:
+	- gameClass: class of the game
+	- names: (tuple) names of the two training players (keys of the type_dict of the game)
+	- seed: (int) seed of the game
+	- start: (int) 0 if the first player starts, 1 otherwise
+	- maxMoves: (int) maximum number of moves (the game is then stopped, without winner)
+	- options: (dict) options given to the game and to the training players
+	Returns a tuple (winner, moves, counts, times) where
+	- winner: 0 or 1 (index in names), or None if the game has been stopped
+	- moves: list of the moves (strings)
+	- counts: number of moves played by each player
+	- times: total time (in seconds) spent by each player to play its moves (move of the player and update of the game)
+	"""
+	# the game (its board and the training players) only draws from its own random generator, seeded with the seed,
+	# so that the game can be replayed
+	players = [gameClass.type_dict[name](**options) for name in names]
+	game = gameClass(*players, **dict(options, seed=seed, start=start))
+	moves, counts, times = [], [0, 0], [0.0, 0.0]
+	return_code = NORMAL_MOVE
+	who = 0
+	try:
+		while return_code == NORMAL_MOVE and len(moves) < maxMoves:
+			who = 0 if game.playerWhoPlays is players[0] else 1
+			t0 = perf_counter()
+			move, return_code = game.getLastMove()
+			times[who] += perf_counter() - t0
+			counts[who] += 1
+			moves.append(move)
+	finally:
+		# remove the game if it is not finished (stopped or failed)
+		Game.removeInstance(game.name)
+	if return_code == NORMAL_MOVE:
+		return None, moves, counts, times
+	return who if return_code == WINNING_MOVE else 1 - who, moves, counts, times
+
+
+def playGames(task):
+	"""
+	Play some games (in a process of the pool)
+	Parameters:
+	- task: tuple (names, games, maxMoves, options, keepMoves), where games is a list of (seed, start)
+	Returns the list of the results (seed, start, winner, moves counts, times, moves or None)
+	"""
+	names, games, maxMoves, options, keepMoves = task
+	gameClass = Game.getTheGameClass()
+	results = []
+	for seed, start in games:
+		winner, moves, counts, times = playGame(gameClass, names, seed, start, maxMoves, options)
+		results.append((seed, start, winner, counts, times, moves if keepMoves else None))
+	return results
+
+
+
+def saveMoves(fileName, names, results):
+	"""
+	Save the moves of the games in a file (compressed with gzip if the name ends with .gz)
+	The first line gives the names of the two players, then there is one line per game, with the seed, who starts
+	(0 or 1), the winner (0, 1 or - when the game has been stopped) and the moves (separated by commas), separated by
+	tabulations
+	"""
+	openFile = gzip.open if fileName.endswith('.gz') else open
+	with openFile(fileName, 'wt') as f:
+		f.write("%s\t%s\n" % names)
+		for seed, start, winner, _, _, moves in results:
+			f.write("%d\t%d\t%s\t%s\n" % (seed, start, '-' if winner is None else winner, ','.join(moves)))
+
+
+def printResults(names, results, duration):
+	"""Print the win rates, the lengths of the games and the time per move"""
+	nbGames = len(results)
+	lengths = [sum(r[3]) for r in results]
+	if names[0] == names[1]:
+		names = ("%s#1" % names[0], "%s#2" % names[1])
+	for n, name in enumerate(names):
+		wins = [sum(1 for r in results if r[2] == n and r[1] == s) for s in (n, 1 - n)]
+		starts = sum(1 for r in results if r[1] == n)
+		print("%s wins %d games (%.1f%%): %d/%d when it starts, %d/%d otherwise" %
+		      (name, sum(wins), 100 * sum(wins) / nbGames, wins[0], starts, wins[1], nbGames - starts))
+	stopped = sum(1 for r in results if r[2] is None)
+	if stopped:
+		print("%d games have been stopped (too long)" % stopped)
+	print("Length of the games (moves): mean %.1f, median %g, min %d, max %d" %
+	      (mean(lengths), median(lengths), min(lengths), max(lengths)))
+	nbMoves = [sum(r[3][n] for r in results) for n in (0, 1)]
+	print("Time per move: " + ", ".join("%s %.1f µs" % (name, 1e6 * sum(r[4][n] for r in results) / max(nbMoves[n], 1))
+	                                    for n, name in enumerate(names)))
+	print("Total: %.1fs (%.1f games/s, %.0f moves/s)" % (duration, nbGames / duration, sum(lengths) / duration))
+
+
+
+def runSimulation(gameClass, args):
+	"""
+	Run the simulation asked with `runCGS.py simulate` (see the usage in runCGS.py)
+	Parameters:
+	- gameClass: class of the game
+	- args: (dictionary) args from the command line
+	"""
+	names = (args['<player1>'], args['<player2>'])
+	for name in names:
+		if name not in gameClass.type_dict:
+			raise ValueError("The training player name '%s' is not valid (should be in %s)" %
+			                 (name, ", ".join(gameClass.type_dict)))
+	nbGames = int(args['--games'])
+	maxMoves = int(args['--max-moves'])
+	options = dict(token.split('=') for token in (args['--options'] or '').split())
+	firstSeed = randint(0, MAX_SEED) if args['--seed'] is None else int(args['--seed'])
+	processes = int(args['--processes'] or multiprocessing.cpu_count())
+	keepMoves = args['--save'] is not None
+
+	# each player starts half of the games
+	games = [((firstSeed + i) % (MAX_SEED + 1), i % 2) for i in range(nbGames)]
+	tasks = [(names, games[i:i + CHUNK_SIZE], maxMoves, options, keepMoves) for i in range(0, nbGames, CHUNK_SIZE)]
+	print("%s: %s against %s, %d games (seeds from %d), %d process(es)" %
+	      (gameClass.__name__, names[0], names[1], nbGames, firstSeed, processes))
+
+	# play the games
+	t0 = perf_counter()
+	if processes == 1:
+		chunks = [playGames(task) for task in tasks]
+	else:
+		with multiprocessing.get_context('fork').Pool(processes) as pool:
+			chunks = pool.map(playGames, tasks)
+	duration = perf_counter() - t0
+	results = [r for chunk in chunks for r in chunk]
+
+	printResults(names, results, duration)
+	if keepMoves:
+		saveMoves(args['--save'], names, results)
+		print("The moves are saved in %s" % args['--save'])
@@ -0,0 +1,219 @@
+"""
+* --------------------- *
+|                       |
+|   Coding Game Server  |
+|                       |
+* --------------------- *
+
+Authors: T. Hilaire, J. Brajard
+Licence: GPL
+
+File: TimerWheel.py
+	Contains the classes Timer and TimerWheel, and the timer wheel of the process (timerWheel)
+	-> all the deadlines of the server (the timeout of a move, see Game, and the deadline of the next command of a
+	connection, see server/Player/Reaper.py) are timers of a single hierarchical timer wheel (monotonic clock)
+	-> a timer is armed and cancelled in O(1); one thread advances the wheel (tick by tick) and fires the timers
+	as soon as they expire
+
+Copyright 2016-2017 T. Hilaire, J. Brajard
+"""
+
+import logging
+from threading import Thread, Condition
+from time import monotonic
+
+logger = logging.getLogger()  # general logger ('root')
+
+
+TICK = 0.01                     # resolution (in seconds) of the timer wheel
+LEVEL_BITS = (8, 6, 6, 6)       # number of slots (log2) of each level: 256 ticks (2.56s) for the first level, then
+                                # 64 slots per level (163.84s, 2.9 hours and 7.7 days)
+
+
+
+class Timer:
+	"""
+	A timer of the timer wheel (returned by TimerWheel.schedule)
+
+	Attributes:
+	- expires: (int) tick when the timer expires
+	- _slot: (set) slot of the wheel that contains the timer (None when the timer has expired or is cancelled)
+	- _callback, _args: function (and its arguments) called when the timer expires
+	"""
+	__slots__ = ('_wheel', 'expires', '_slot', '_callback', '_args')
+
+	def __init__(self, wheel, expires, callback, args):
+		self._wheel = wheel
+		self.expires = expires
+		self._slot = None
+		self._callback = callback
+		self._args = args
+
+
+	@property
+	def pending(self):
+		"""Returns True if the timer is armed (it has not expired, and it is not cancelled)"""
+		return self._slot is not None
+
+
+	def cancel(self):
+		"""
+		Cancel the timer (O(1))
+		Returns True if the timer was pending (False if it has already expired, or is already cancelled)
+		"""
+		return self._wheel.cancel(self)
+
+
+
+class TimerWheel:
+	"""
+	Hierarchical timer wheel (as the timers of the Linux kernel)
+	The first level has one slot per tick, and each slot of an upper level covers a whole turn of the level below;
+	when the first level has done a turn, the timers of the next slot of the upper level are cascaded in the levels
+	below (a timer is moved at most once per level)
+	The thread of the wheel is started with the first timer (so a worker process has its own thread), and it only
+	wakes up every tick when there are some timers pending
+	The callbacks are called by the thread of the wheel (outside the lock), so they should be short
+
+	Attributes:
+	- _levels: list of the levels (list of the slots, a slot is a set of timers)
+	- _geometry: list of (slots, shift, mask, limit) for each level, where limit is the number of ticks covered by the
+	level and the ones below
+	- _tick: (int) next tick to process
+	- _start: (float) time (monotonic clock) of the tick #0
+	- _pending: (int) number of timers pending
+	- _fired: (int) number of timers fired
+	- _thread: the thread of the wheel (None if not started)
+	"""
+
+	def __init__(self):
+		self._cond = Condition()
+		self._levels = [[set() for _ in range(1 << bits)] for bits in LEVEL_BITS]
+		self._shifts = [sum(LEVEL_BITS[:level]) for level in range(len(LEVEL_BITS))]
+		self._geometry = [(slots, shift, (1 << bits) - 1, 1 << (shift + bits))
+		                  for slots, shift, bits in zip(self._levels, self._shifts, LEVEL_BITS)]
+		self._start = monotonic()
+		self._tick = 0
+		self._pending = 0
+		self._fired = 0
+		self._thread = None
+
+
+	def __len__(self):
+		"""Returns the number of timers pending"""
+		return self._pending
+
+
+	def _now(self):
+		"""Returns the current tick"""
+		return int((monotonic() - self._start) / TICK)
+
+
+	def schedule(self, delay, callback, *args):
+		"""
+		Arm a timer (O(1))
+		Parameters:
+		- delay: (float) time (in seconds) before the timer expires
+		- callback: function called (by the thread of the wheel) when the timer expires, with the arguments args
+		Returns the timer (that can be cancelled)
+		"""
+		with self._cond:
+			if not self._pending:
+				# the wheel is empty, so it can directly go to the current tick
+				self._tick = max(self._tick, self._now())
+				if self._thread is None or not self._thread.is_alive():
+					self._thread = Thread(target=self.run, name="TimerWheel", daemon=True)
+					self._thread.start()
+				self._cond.notify()
+			# (rounded up, so that the timer never expires before its delay)
+			timer = Timer(self, -int(-(monotonic() + delay - self._start) // TICK), callback, args)
+			self._add(timer)
+			self._pending += 1
+		return timer
+
+
+	def cancel(self, timer):
+		"""Cancel a timer (see Timer.cancel)"""
+		with self._cond:
+			if timer._slot is None:
+				return False
+			timer._slot.discard(timer)
+			timer._slot = None
+			self._pending -= 1
+			return True
+
+
+	def _add(self, timer):
+		"""Put a timer in the slot that corresponds to its expiration tick (the lock should be acquired)"""
+		expires = max(timer.expires, self._tick)
+		delta = expires - self._tick
+		for slots, shift, mask, limit in self._geometry:
+			if delta < limit:
+				break
+		else:
+			# too far: the timer is put in the last slot of the last level, and will be cascaded again
+			expires = self._tick + limit - 1
+		timer._slot = slots[(expires >> shift) & mask]
+		timer._slot.add(timer)
+
+
+	def _step(self):
+		"""
+		Process the current tick: cascade the timers of the upper levels (when the first level has done a turn)
+		Returns the list of the timers that expire (the lock should be acquired)
+		"""
+		index = self._tick & ((1 << LEVEL_BITS[0]) - 1)
+		if index == 0:
+			for level in range(1, len(LEVEL_BITS)):
+				i = (self._tick >> self._shifts[level]) & ((1 << LEVEL_BITS[level]) - 1)
+				slot = self._levels[level][i]
+				timers = list(slot)
+				slot.clear()
+				for timer in timers:
+					self._add(timer)
+				if i != 0:
+					break
+		slot = self._levels[0][index]
+		expired = list(slot)
+		slot.clear()
+		for timer in expired:
+			timer._slot = None
+		self._pending -= len(expired)
+		self._fired += len(expired)
+		self._tick += 1
+		return expired
+
+
+	def run(self):
+		"""
+		Advance the wheel (thread), and call the callbacks of the timers that expire
+		"""
+		while True:
+			with self._cond:
+				while not self._pending:
+					self._cond.wait()
+				now = self._now()
+				expired = []
+				while self._tick <= now:
+					expired.extend(self._step())
+				if not expired:
+					self._cond.wait(self._start + self._tick * TICK - monotonic())
+			for timer in expired:
+				try:
+					timer._callback(*timer._args)
+				except Exception as err:
+					logger.error("Error in the callback of a timer: %s", err, exc_info=True)
+
+
+	def getDictInformations(self):
+		"""
+		Returns a dictionary with the number of timers pending, the number of timers fired and the resolution
+		of the wheel
+		"""
+		with self._cond:
+			return {'pending': self._pending, 'fired': self._fired, 'resolution': TICK}
+
+
+
+# timer wheel of this process
+timerWheel = TimerWheel()
@@ -40,7 +40,13 @@ class PoolKnockout(Tournament):
 	"""
 	HTMLgameoptions = """
 	<label>
-		Delay between each move : <input name="delay" type="number" value="0" required/>
+		Delay between each move (ms): <input name="delay" type="number" value="0" required/>
+	</label>
+	<label>
+		Clock of each player (s, empty for a timeout per move): <input name="clock" type="number" min="1"/>
+	</label>
+	<label>
+		Increment per move (s): <input name="increment" type="number" min="0" step="any" value="0"/>
 	</label>
 	"""
 	# !TODO: this option should be in Tournament (same option for every tournament)
@@ -29,12 +29,20 @@ from bottle import run, response, install, default_app		# webserver (bottle)
 from geventwebsocket.handler import WebSocketHandler
 from geventwebsocket import WebSocketError
 from os.path import isfile, join
+from json import dumps
+from time import localtime, strftime
 from functools import wraps										# use to wrap a logger for bottle
+from server.Archive import archive, replayGame
 from server.Game import Game
 from server.Player import RegularPlayer
 from server.Logger import Config
 from server.Tournament import Tournament
 from server.BaseClass import BaseClass
+from server.Broadcaster import broadcaster
+from server.Checkpoint import checkpointer
+from server.Metrics import Histogram, commandMetrics
+from server.Player.Reaper import reaper
+from server.TimerWheel import timerWheel
 
 # weblogger
 weblogger = getLogger('bottle')
@@ -178,16 +186,73 @@ def game(gameName):
 	g = Game.getFromName(gameName)
 
 	if g:
-		try:
-			displayName = g.getCutename()
-		except NotImplementedError:
-			displayName = gameName
 		return template('game/Game.html', host=Config.host, webPort=Config.webPort,
-		                gameName=gameName, displayName=displayName, player1=g.players[0].HTMLrepr(), player2=g.players[1].HTMLrepr())
+		                gameName=gameName, displayName=g.getCutename(), player1=g.players[0].HTMLrepr(), player2=g.players[1].HTMLrepr(),
+		                delay=g.delay)
+	else:
+		return template('noObject.html', className='game', objectName=gameName)
+
+
+@route('/game/delay/<gameName>', method='POST')
+def setGameDelay(gameName):
+	"""
+	Receive the form to change the delay (in ms) between two moves of a game (while it is played)
+	return nothing, since it is sent from ajax (an error message otherwise)
+	Parameters:
+	- gameName: name of the game
+	"""
+	g = Game.getFromName(gameName)
+	if g:
+		try:
+			g.setDelay(int(request.forms.get('delay')))
+		except (ValueError, TypeError) as e:
+			return 'Error. Impossible to change the delay of the game ' + gameName + ': "' + str(e) + '"'
 	else:
 		return template('noObject.html', className='game', objectName=gameName)
 
 
+@route('/replay/<gameName>')
+def replay(gameName):
+	"""
+	Returns the webpage of the replay of a finished game (recorded in the archive)
+	The game is played again (from its seed) and the page of the game shows its steps
+	<gameName> is the name of the game
+	If the game is not in the archive, the answer with the noObject page
+	"""
+	record = archive.getRecord(gameName)
+	if record is None:
+		return template('noObject.html', className='recorded game', objectName=gameName)
+	try:
+		g, steps = replayGame(record)
+	except ValueError as e:
+		return 'Error. Impossible to replay the game ' + gameName + ': "' + str(e) + '"'
+	# label of each step
+	names = record.players
+	labels = ["Start of the game (%s starts)" % names[0]]
+	labels.extend("Move %d/%d (%.2fs): '%s' plays %s" % (n, len(steps) - 1, t / 1000, names[who], move)
+	              for n, (_, move, who, _, t) in enumerate(steps[1:], 1))
+	if record.winner is not None:
+		result = "%s won against %s (%s)" % (names[record.winner], names[1 - record.winner], record.message)
+	else:
+		result = record.message
+	labels[-1] += " -> " + result
+	# (the steps are given to the javascript; '</' is escaped so that the HTML in the steps cannot close the script)
+	js = dumps([{'info': info, 'label': label} for (info, *_), label in zip(steps, labels)]).replace('</', '<\\/')
+	return template('game/Replay.html', host=Config.host, webPort=Config.webPort,
+	                gameName=gameName, displayName=g.getCutename(), player1=g.players[0].HTMLrepr(),
+	                player2=g.players[1].HTMLrepr(), delay=0, steps=js, seed=record.seed, result=result,
+	                date=strftime("%Y-%m-%d %H:%M:%S", localtime(record.startTime)))
+
+
+@route('/replays/<playerName>')
+def replays(playerName):
+	"""
+	Returns the list of the games of a player that are in the archive (with a link to their replay)
+	<playerName> is the name of the player
+	"""
+	return template('game/Replays.html', playerName=playerName, games=archive.getGames(playerName))
+
+
 # ============
 #  Tournament
 # ============
@@ -344,7 +409,7 @@ def classWebSocket(clsName, name):
 		try:
 			wsock.receive()
 		except WebSocketError:
-			BaseClass.removeLoIWebSocket(wsock)
+			obj.removeWebSocket(wsock)
 			break
 
 
@@ -376,6 +441,70 @@ def logG(gameName):
 	return static_file(gameName+'.log', root=join(Config.logPath, 'games'))
 
 
+# ==========
+#  metrics
+# ==========
+
+@route('/stats')
+def stats():
+	"""
+	Returns the latency histograms (in JSON)
+	"""
+	return Histogram.getStatistics()
+
+
+@route('/stats/commands')
+def statsCommands():
+	"""
+	Returns the number of commands and their latency histograms (parse, game logic and send), per kind of command
+	(in JSON)
+	"""
+	return commandMetrics.getDictInformations()
+
+
+@route('/stats/connections')
+def statsConnections():
+	"""
+	Returns the number of connections closed by the reaper (client idle for too long outside a game, or during a game),
+	and the number of connections waiting for a command (in JSON)
+	"""
+	return reaper.getDictInformations()
+
+
+@route('/stats/timers')
+def statsTimers():
+	"""
+	Returns the number of timers pending in the timer wheel (timeouts of the moves and deadlines of the connections),
+	and the number of timers fired (in JSON)
+	"""
+	return timerWheel.getDictInformations()
+
+
+@route('/stats/archive')
+def statsArchive():
+	"""
+	Returns the number of games recorded in the archive, and its size (in JSON)
+	"""
+	return archive.getDictInformations()
+
+
+@route('/stats/checkpoints')
+def statsCheckpoints():
+	"""
+	Returns the number of games saved (snapshots) and restored, and the time spent to save them (in JSON)
+	"""
+	return checkpointer.getDictInformations()
+
+
+@route('/stats/websockets')
+def statsWebsockets():
+	"""
+	Returns the number of updates published to the websockets, the number of updates really sent (the others have been
+	coalesced) and the time spent to send them (in JSON)
+	"""
+	return broadcaster.getDictInformations()
+
+
 # ================
 #   info page
 # ================